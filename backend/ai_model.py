@@ -1,22 +1,317 @@
 import os
+import threading
+import time
+from collections import Counter
+from itertools import chain
+
 import joblib
 import numpy as np
-# Qlobal dəyişən – model bir dəfə yüklənsin
-_ml_model = None
+
+try:
+    from .decision_cache import (
+        DecisionCache, canonical_track, is_mirror_safe, is_symmetric_mode,
+        mirror_result, mode_key, rules_hash
+    )
+    from .forest_engine import export_forest
+    from .linear_engine import derive_linear_scorer
+    from .model_registry import ModelRegistry
+    from .online_learning import FeedbackBuffer, OnlineLearner
+    from . import metrics
+    from .micro_batch import MicroBatcher
+    from .rule_profiles import RuleProfileRegistry, validate_custom_rules
+    from .timing import stage
+except ImportError:
+    from decision_cache import (
+        DecisionCache, canonical_track, is_mirror_safe, is_symmetric_mode,
+        mirror_result, mode_key, rules_hash
+    )
+    from forest_engine import export_forest
+    from linear_engine import derive_linear_scorer
+    from model_registry import ModelRegistry
+    from online_learning import FeedbackBuffer, OnlineLearner
+    import metrics
+    from micro_batch import MicroBatcher
+    from rule_profiles import RuleProfileRegistry, validate_custom_rules
+    from timing import stage
+
+# ML v2 inference mühərriki: "sklearn" (default), "compiled"
+# (forest_engine.py – sklearn-siz düz massiv qiymətləndiricisi) və ya "linear"
+# (linear_engine.py – generatorun qaydasından alınmış dəqiq tam ədəd skoru, bir np.dot)
+ML_ENGINE = os.environ.get("TROLLEY_ML_ENGINE", "sklearn")
+
+# Versiyalı model reyestri (model_registry.py); manifest yoxdursa,
+# köhnə qayda ilə backend/trolley_model_v2.pkl yüklənir
+MODEL_REGISTRY = ModelRegistry()
+
+# Reyestrdəki "current" versiyanın dəyişib-dəyişmədiyi neçə saniyədən bir yoxlanılsın
+MODEL_POLL_INTERVAL = float(os.environ.get("TROLLEY_MODEL_POLL_INTERVAL", "10"))
+
+
+class ModelHandle:
+    """
+    Sorğuların istifadə etdiyi model: versiya, yüklənmiş model və predict edən obyekt
+    (sklearn modeli, CompiledForest və ya LinearScorer). Dəyişməzdir – yeni model
+    yeni handle deməkdir və _ml_handle bir mənimsətmə ilə (atomik) dəyişdirilir.
+    Sorğu handle-ı bir dəfə götürür, ona görə işləyən sorğular köhnə versiya ilə bitir.
+    """
+
+    __slots__ = ("version", "model", "predictor")
+
+    def __init__(self, version: str, model, predictor):
+        self.version = version
+        self.model = model
+        self.predictor = predictor
+
+
+# Qlobal dəyişən – cari model handle-ı (bir dəfə yüklənir, sonra yalnız dəyişdirilir)
+_ml_handle = None
+_ml_handle_lock = threading.Lock()
+
+# warm_up_ml_model uğurla bitdikdən sonra True olur
+_ml_ready = False
+
+# Fon reload thread-inin vəziyyəti
+_model_watcher_pid = None
+_model_watcher_checked_at = 0.0
+_model_watcher_status = {"last_check": None, "last_error": None}
+
+# decide_scenario_v2 nəticələri üçün cache (ölçü 0 olduqda söndürülür)
+DECISION_CACHE = DecisionCache(
+    maxsize=int(os.environ.get("TROLLEY_DECISION_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("TROLLEY_DECISION_CACHE_TTL", "300"))
+)
+
+# Serverdə saxlanılan custom qayda profilləri (bütün worker-lər üçün ortaq qovluq)
+RULE_PROFILES = RuleProfileRegistry(
+    os.environ.get(
+        "TROLLEY_RULE_PROFILE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_profiles")
+    )
+)
+
+# Kompilyasiya olunmuş custom qaydalar, məzmun hash-i üzrə (müddətsiz LRU)
+COMPILED_RULES_CACHE = DecisionCache(
+    maxsize=int(os.environ.get("TROLLEY_RULES_CACHE_SIZE", "256")),
+    ttl=float("inf")
+)
+
+def _build_handle(version: str, model) -> ModelHandle:
+    """Model üçün handle qurur (ML_ENGINE == "compiled" olduqda meşəni də çevirir)."""
+    predictor = model
+    if ML_ENGINE == "compiled" and (hasattr(model, "estimators_") or hasattr(model, "tree_")):
+        predictor = export_forest(model)
+    return ModelHandle(version, model, predictor)
+
+
+def _load_handle_from_disk() -> ModelHandle | None:
+    """_read_handle_from_disk + yüklənmə müddətinin metrikası."""
+    start = time.perf_counter()
+    try:
+        return _read_handle_from_disk()
+    finally:
+        metrics.MODEL_LOAD.observe(time.perf_counter() - start)
+
+
+def _read_handle_from_disk() -> ModelHandle | None:
+    """Reyestrin current versiyasını, reyestr yoxdursa trolley_model_v2.pkl-i yükləyir."""
+    if ML_ENGINE == "linear":
+        return ModelHandle("linear", None, derive_linear_scorer(ML_V2_HEADER))
+
+    version = MODEL_REGISTRY.current_version()
+    if version is not None:
+        handle = _build_handle(version, MODEL_REGISTRY.load(version))
+        print(f"ML v2 modeli yükləndi (versiya {version}).")
+        return handle
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.join(base_dir, "trolley_model_v2.pkl")
+    if not os.path.exists(model_path):
+        print("Xəbərdarlıq: trolley_model_v2.pkl tapılmadı. Əvvəlcə train_model_v2.py-ni işə salın.")
+        return None
+    handle = _build_handle("trolley_model_v2.pkl", joblib.load(model_path))
+    print("ML v2 modeli yükləndi.")
+    return handle
+
+
+def load_ml_handle() -> ModelHandle | None:
+    """Cari model handle-ını qaytarır (ilk çağırışda diskdən yüklənir)."""
+    global _ml_handle
+    handle = _ml_handle
+    if handle is None:
+        with _ml_handle_lock:
+            if _ml_handle is None:
+                _ml_handle = _load_handle_from_disk()
+            handle = _ml_handle
+    return handle
+
 
 def load_ml_model():
-    global _ml_model
-    if _ml_model is None:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, "trolley_model_v2.pkl")
-        if not os.path.exists(model_path):
-            print("Xəbərdarlıq: trolley_model_v2.pkl tapılmadı. Əvvəlcə train_model_v2.py-ni işə salın.")
-            return None
-        _ml_model = joblib.load(model_path)
-        print("ML v2 modeli yükləndi.")
-    return _ml_model
+    handle = load_ml_handle()
+    return None if handle is None else handle.model
+
+
+def load_ml_predictor():
+    """
+    ML v2 qərarları üçün predict edən obyekti qaytarır.
+    ML_ENGINE == "compiled" olduqda model bir dəfə CompiledForest-ə çevrilir
+    (nəticələr model.predict ilə eynidir), ML_ENGINE == "linear" olduqda
+    model faylı lazım deyil – generator ağırlıqlarından xətti skor qurulur,
+    əks halda sklearn modeli qaytarılır.
+    """
+    handle = load_ml_handle()
+    return None if handle is None else handle.predictor
+
+
+def current_model_version() -> str | None:
+    handle = _ml_handle
+    return None if handle is None else handle.version
 
 
+def smoke_test_handle(handle: ModelHandle) -> None:
+    """
+    Yeni handle-ı dəyişdirməzdən əvvəl kiçik batch üzərində yoxlayır:
+    feature sayı, çıxışın ölçüsü və sinifləri. Uyğunsuzluqda ValueError.
+    """
+    n_features = len(ML_V2_HEADER)
+    n_in = getattr(handle.predictor, "n_features_in_", n_features)
+    if n_in != n_features:
+        raise ValueError(f"Model {n_in} feature gözləyir, {n_features} lazımdır.")
+
+    person = {"age": "adult", "role": "other", "flags": []}
+    child = {"age": "child", "role": "doctor", "flags": ["innocent"]}
+    batch = np.vstack([
+        np.zeros((1, n_features), dtype=np.int64),
+        FEATURE_ENCODER_V2.encode_batch([
+            ([person], [child]),
+            ([child], [person, person]),
+            ([child, person], [person]),
+        ] * 3)
+    ])
+    preds = np.asarray(handle.predictor.predict(batch))
+    if preds.shape != (len(batch),) or not set(preds.tolist()) <= {1, 2}:
+        raise ValueError("Model smoke batch-də yanlış nəticə qaytardı.")
+
+
+def _swap_handle(handle: ModelHandle) -> None:
+    """Handle-ı atomik dəyişdirir və köhnə versiyanın ML nəticələrini cache-dən silir."""
+    global _ml_handle, _ml_ready
+    _ml_handle = handle
+    _ml_ready = True
+    DECISION_CACHE.discard_where(lambda key: key[2][0] == "ml")
+
+
+def warm_up_ml_model() -> bool:
+    """
+    ML v2 modelini yükləyir və bir neçə boş predict ilə "isidir"
+    (lazy importlar, compiled massivlər, daxili cache-lər ilk sorğudan əvvəl hazır olsun).
+    Model tapılmadıqda False qaytarır.
+    """
+    global _ml_ready
+    predictor = load_ml_predictor()
+    if predictor is None:
+        return False
+
+    n_features = len(ML_V2_HEADER)
+    predictor.predict(np.zeros((1, n_features), dtype=np.int64))
+    predictor.predict(np.zeros((8, n_features), dtype=np.int64))
+
+    _ml_ready = True
+    return True
+
+
+def is_ml_ready() -> bool:
+    """ML v2 modeli yüklənib isidilibsə True qaytarır."""
+    return _ml_ready
+
+
+def reload_ml_model() -> bool:
+    """
+    ML v2 modelini diskdən (reyestrin current versiyası və ya trolley_model_v2.pkl)
+    yenidən yükləyir. Yeni model smoke batch-dən keçdikdən sonra dəyişdirilir –
+    o vaxta qədər və uğursuzluqda köhnə model işləməyə davam edir.
+    """
+    handle = _load_handle_from_disk()
+    if handle is None:
+        return False
+    smoke_test_handle(handle)
+    _swap_handle(handle)
+    return True
+
+
+def set_ml_model(model, version: str = "runtime") -> None:
+    """
+    Yaddaşdakı ML v2 modelini verilmiş modellə əvəz edir (məs. online learning).
+    Yeni handle (və lazımdırsa compiled forma) əvvəlcə tam hazırlanır, sonra
+    atomik dəyişdirilir – sorğular bloklanmır. Cache-dəki köhnə ML nəticələri silinir.
+    """
+    if ML_ENGINE == "linear":
+        return  # linear mühərrik model faylından asılı deyil
+    _swap_handle(_build_handle(version, model))
+
+
+def _watch_model_registry() -> None:
+    """Reyestrin manifestini izləyir, current versiya dəyişdikdə onu fonda yükləyir."""
+    last_mtime = MODEL_REGISTRY.manifest_mtime()
+    while True:
+        time.sleep(MODEL_POLL_INTERVAL)
+        _model_watcher_status["last_check"] = time.time()
+        try:
+            mtime = MODEL_REGISTRY.manifest_mtime()
+            if mtime is None or mtime == last_mtime:
+                continue
+            last_mtime = mtime
+
+            version = MODEL_REGISTRY.current_version()
+            if version is None or version == current_model_version():
+                continue
+
+            handle = _build_handle(version, MODEL_REGISTRY.load(version))
+            smoke_test_handle(handle)
+            _swap_handle(handle)
+            _model_watcher_status["last_error"] = None
+            print(f"ML v2 modeli versiya {version} ilə əvəz olundu.")
+        except Exception as e:  # uğursuz versiya köhnə modeli dayandırmamalıdır
+            _model_watcher_status["last_error"] = repr(e)
+
+
+def start_model_watcher() -> bool:
+    """
+    Bu prosesdə reyestr izləyicisini işə salır (reyestr varsa və hələ işləmirsə).
+    Hər gunicorn worker-ində fork-dan sonra çağırılmalıdır.
+    """
+    global _model_watcher_pid, _model_watcher_checked_at
+    if _model_watcher_pid == os.getpid():
+        return True
+    if ML_ENGINE == "linear" or MODEL_POLL_INTERVAL <= 0:
+        return False
+
+    # Reyestr yoxdursa, hər sorğuda diskə baxmırıq – poll intervalında bir dəfə
+    now = time.monotonic()
+    if now - _model_watcher_checked_at < MODEL_POLL_INTERVAL:
+        return False
+    _model_watcher_checked_at = now
+    if not MODEL_REGISTRY.exists():
+        return False
+
+    with _ml_handle_lock:
+        if _model_watcher_pid != os.getpid():
+            threading.Thread(
+                target=_watch_model_registry, name="model-watcher", daemon=True
+            ).start()
+            _model_watcher_pid = os.getpid()
+    return True
+
+
+def model_status() -> dict:
+    return {
+        "engine": ML_ENGINE,
+        "version": current_model_version(),
+        "registry": MODEL_REGISTRY.directory if MODEL_REGISTRY.exists() else None,
+        "registry_current": MODEL_REGISTRY.current_version(),
+        "watcher": dict(_model_watcher_status),
+        "batcher": None if ML_BATCHER is None else ML_BATCHER.stats()
+    }
+
 
 def decide_ml(scenario: dict) -> dict:
     """
@@ -126,79 +421,365 @@ ML_V2_HEADER = [
 ]
 
 
-def track_to_features_v2(prefix: str, persons: list[dict]) -> dict:
+# ML v2 feature-lərində tanınan yaş, rol və flag dəyərləri
+ML_V2_AGE_KEYS = ("child", "teen", "adult", "elder")
+ML_V2_ROLE_KEYS = (
+    "doctor", "nurse", "teacher", "engineer",
+    "student", "unemployed", "retired",
+    "pregnant_role", "criminal", "thief", "other"
+)
+ML_V2_FLAG_KEYS = (
+    "pregnant", "disabled", "innocent", "guilty",
+    "law_breaker", "relative", "friend", "stranger",
+    "saves_lives", "vulnerable"
+)
+
+
+class FeatureEncoder:
     """
-    Yeni data modelindəki şəxslər siyahısını ML v2 üçün feature-lərə çevirir.
-    prefix: 't1_' və ya 't2_'
+    ML v2 feature-lərini massiv əsaslı hesablayan encoder.
+
+    Sütun indeksləri ML_V2_HEADER-dən yalnız bir dəfə (konstruktorda)
+    çıxarılır. Hər şəxs üçün dict və f-string yaratmaq əvəzinə müvafiq sütun
+    indeksləri yığılır və sayğaclar birbaşa NumPy int massivinə yazılır.
+    Sütun qərarları track_to_features_v2 ilə eynidir:
+    - naməlum yaş (None, "young" və s.) → adult
+    - naməlum rol və ya None → other
+    - naməlum flag-lar nəzərə alınmır
     """
-    # Məsələn, prefix='t1_' olanda yalnız t1_ ilə başlayan sütunlara 0 yazırıq
-    feat = {col: 0 for col in ML_V2_HEADER if col.startswith(prefix)}
 
-    for p in persons:
-        age = p.get("age")
-        role = p.get("role")
-        flags = p.get("flags", [])
+    PREFIXES = ("t1_", "t2_")
+
+    def __init__(self, header: list[str]):
+        self.header = list(header)
+        self.n_features = len(self.header)
+        index = {col: i for i, col in enumerate(self.header)}
+
+        # Hər prefix üçün: (yaş→sütun, default yaş sütunu, rol→sütun,
+        # default rol sütunu, flag→sütun)
+        self._slots = {}
+        for prefix in self.PREFIXES:
+            age_cols = {age: index[f"{prefix}{age}"] for age in ML_V2_AGE_KEYS}
+            role_cols = {role: index[f"{prefix}{role}"] for role in ML_V2_ROLE_KEYS}
+            flag_cols = {flag: index[f"{prefix}{flag}_flag"] for flag in ML_V2_FLAG_KEYS}
+            self._slots[prefix] = (
+                age_cols, age_cols["adult"],
+                role_cols, role_cols["other"],
+                flag_cols
+            )
 
-        # Yaş
-        if age in ["child", "teen", "adult", "elder"]:
-            feat[f"{prefix}{age}"] += 1
-        else:
-            feat[f"{prefix}adult"] += 1
+        # Kernel kodu → sütun xəritələri (ilk istifadədə qurulur, bax _code_columns)
+        self._code_column_cache = {}
 
-        # Rol
-        role_key = role if role is not None else "other"
-        if role_key not in [
-            "doctor", "nurse", "teacher", "engineer",
-            "student", "unemployed", "retired",
-            "pregnant_role", "criminal", "thief", "other"
-        ]:
-            role_key = "other"
+        self.prefix_columns = {
+            prefix: [i for i, col in enumerate(self.header) if col.startswith(prefix)]
+            for prefix in self.PREFIXES
+        }
+
+    def _collect(self, prefix: str, persons: list[dict], offset: int, out: list) -> None:
+        """Track-dəki şəxslərin sütun indekslərini (offset ilə) out listinə əlavə edir."""
+        age_cols, default_age, role_cols, default_role, flag_cols = self._slots[prefix]
+        append = out.append
+
+        for p in persons:
+            append(offset + age_cols.get(p.get("age"), default_age))
+            append(offset + role_cols.get(p.get("role"), default_role))
+
+            for f in p.get("flags", []):
+                col = flag_cols.get(f)
+                if col is not None:
+                    append(offset + col)
+
+    def encode_track(self, prefix: str, persons: list[dict]) -> np.ndarray:
+        """
+        Tək track-in feature sayğaclarını qaytarır.
+        Massiv prefix-ə aid sütunların ML_V2_HEADER-dəki sırası ilə düzülür.
+        """
+        cols = []
+        self._collect(prefix, persons, 0, cols)
+        counts = np.bincount(np.asarray(cols, dtype=np.intp), minlength=self.n_features)
+        return counts[self.prefix_columns[prefix]]
+
+    def encode_batch(
+        self,
+        pairs: list[tuple[list[dict], list[dict]]],
+        out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Bir neçə (track1, track2) cütünü (N, n_features) ölçülü int matrisə yazır.
+        out verilibsə, nəticə həmin (sıfırlanmış) massivə yazılır.
+        """
+        n_rows = len(pairs)
+        if out is None:
+            out = np.zeros((n_rows, self.n_features), dtype=np.int64)
+
+        cols = []
+        width = self.n_features
+        for row, (track1, track2) in enumerate(pairs):
+            offset = row * width
+            self._collect("t1_", track1, offset, cols)
+            self._collect("t2_", track2, offset, cols)
+
+        if cols:
+            counts = np.bincount(np.asarray(cols, dtype=np.intp), minlength=n_rows * width)
+            out += counts.reshape(n_rows, width).astype(out.dtype, copy=False)
+        return out
+
+    def encode_analysis(self, analysis: "ScenarioAnalysis") -> np.ndarray:
+        """
+        Artıq hesablanmış ScenarioAnalysis kod saylarından (n_features,) vektor qurur –
+        şəxslər yenidən gəzilmir.
+        """
+        out = np.zeros(self.n_features, dtype=np.int64)
+        for prefix, codes in zip(self.PREFIXES, analysis.codes):
+            age_cols, role_cols, flag_cols = self._code_columns(prefix)
+            np.add.at(out, age_cols, codes.age_counts)
+            np.add.at(out, role_cols, codes.role_counts)
+            known = flag_cols >= 0
+            np.add.at(out, flag_cols[known], codes.flag_counts[known])
+        return out
+
+    def _code_columns(self, prefix: str) -> tuple:
+        """
+        Kernel kodlarından (AGE_VOCAB, ROLE_VOCAB, FLAG_VOCAB) bu prefix-in sütunlarına
+        xəritə. Qərarlar _collect ilə eynidir; flag sütunu yoxdursa -1.
+        """
+        cached = self._code_column_cache.get(prefix)
+        if cached is None:
+            age_cols, default_age, role_cols, default_role, flag_cols = self._slots[prefix]
+            cached = (
+                np.array([age_cols.get(a, default_age) for a in AGE_VOCAB] + [default_age]),
+                np.array([role_cols.get(r, default_role) for r in ROLE_VOCAB] + [default_role]),
+                np.array([flag_cols.get(f, -1) for f in FLAG_VOCAB])
+            )
+            self._code_column_cache[prefix] = cached
+        return cached
+
+
+# ML v2 üçün paylaşılan encoder – sütun xəritəsi modul yüklənəndə bir dəfə qurulur
+FEATURE_ENCODER_V2 = FeatureEncoder(ML_V2_HEADER)
+
+
+# ============== ONLINE LEARNING (manual_choice rəyləri) ==============
+
+# Söndürülübsə, rəylər yazılmır və model yalnız trolley_model_v2.pkl-dən gəlir
+ONLINE_LEARNING = os.environ.get("TROLLEY_ONLINE_LEARNING") == "1"
+
+# Rəylər istifadəçi məlumatıdır – mənbə kodunda deyil, vəziyyət qovluğunda saxlanılır:
+# TROLLEY_STATE_DIR, yoxdursa $XDG_STATE_HOME/trolley (default ~/.local/state/trolley)
+STATE_DIR = os.environ.get("TROLLEY_STATE_DIR") or os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state"),
+    "trolley"
+)
+
+_base_dir = os.path.dirname(os.path.abspath(__file__))
+FEEDBACK_BUFFER = FeedbackBuffer(
+    os.environ.get("TROLLEY_FEEDBACK_FILE", os.path.join(STATE_DIR, "feedback_v2.bin")),
+    n_features=len(ML_V2_HEADER),
+    max_bytes=int(os.environ.get("TROLLEY_FEEDBACK_MAX_BYTES", str(64 << 20)))
+)
+
+# Reyestrdə saxlanılan online versiyaların sayı (current həmişə qalır)
+ONLINE_KEEP_VERSIONS = int(os.environ.get("TROLLEY_ONLINE_KEEP_VERSIONS", "5"))
+
+# Online model yalnız hold-out dəqiqliyi cari modelinkindən bu qədərdən çox
+# aşağı olmadıqda current edilir, əks halda reyestrdə qeyri-current versiya kimi qalır
+ONLINE_ACCURACY_TOLERANCE = float(os.environ.get("TROLLEY_ONLINE_ACCURACY_TOLERANCE", "0.01"))
+_online_learner = None
+_online_learner_pid = None
+_online_learner_lock = threading.Lock()
+
+
+def _holdout_accuracy(predictor, X: np.ndarray, y: np.ndarray) -> float:
+    return float(np.mean(np.asarray(predictor.predict(X)) == y))
 
-        feat[f"{prefix}{role_key}"] += 1
 
-        # Flag-lar
-        for f in flags:
-            col_name = f"{prefix}{f}_flag"
-            if col_name in feat:
-                feat[col_name] += 1
+def _publish_online_model(model, version: str, holdout: tuple) -> bool:
+    """
+    Lider prosesin öyrəndiyi modeli reyestrə yazır və köhnə online versiyaları silir.
+    Model hold-out-da cari modeldən ONLINE_ACCURACY_TOLERANCE-dan çox pis deyilsə,
+    current edilir (digər worker-lər onu reyestr izləyicisi ilə yükləyir) və bu
+    prosesdə dərhal dəyişdirilir; əks halda qeyri-current versiya kimi qalır.
+    current edildikdə True qaytarır.
+    """
+    X, y = holdout
+    if not len(y):
+        return False  # yoxlamaq üçün məlumat yoxdur
+
+    accuracy = _holdout_accuracy(model, X, y)
+    handle = load_ml_handle()
+    current_accuracy = _holdout_accuracy(handle.predictor, X, y) if handle is not None else 0.0
+    activate = accuracy >= current_accuracy - ONLINE_ACCURACY_TOLERANCE
+    print(
+        f"Online model {version}: hold-out dəqiqliyi {accuracy:.4f} "
+        f"(cari model {current_accuracy:.4f}) – {'current edilir' if activate else 'current edilmir'}."
+    )
+    if not activate and MODEL_REGISTRY.current_version() is None:
+        return False  # boş reyestrdə ilk versiya avtomatik current olardı
+
+    os.makedirs(MODEL_REGISTRY.directory, exist_ok=True)
+    tmp_path = os.path.join(MODEL_REGISTRY.directory, f".{version}.{os.getpid()}.pkl")
+    joblib.dump(model, tmp_path)
+    try:
+        MODEL_REGISTRY.publish(tmp_path, version=version, activate=activate)
+    finally:
+        os.remove(tmp_path)
+    MODEL_REGISTRY.prune(ONLINE_KEEP_VERSIONS, prefix="online-")
+    if activate:
+        set_ml_model(model, version)
+    return activate
+
+
+def start_online_learning() -> bool:
+    """
+    Bu prosesdə online learning fon thread-ini işə salır (artıq işləyirsə, heç nə etmir).
+    Hər gunicorn worker-ində fork-dan sonra çağırılmalıdır – thread-lər fork-dan keçmir.
+    Təlim yalnız flock ilə seçilmiş bir prosesdə gedir (online_learning.py).
+    """
+    global _online_learner, _online_learner_pid
+    if not ONLINE_LEARNING or _online_learner_pid == os.getpid():
+        return ONLINE_LEARNING
+
+    with _online_learner_lock:
+        if _online_learner_pid != os.getpid():
+            _online_learner = OnlineLearner(
+                FEEDBACK_BUFFER,
+                os.environ.get(
+                    "TROLLEY_ONLINE_BASE_DATA", os.path.join(_base_dir, "trolley_data_v2.csv")
+                ),
+                publish=_publish_online_model,
+                interval=float(os.environ.get("TROLLEY_ONLINE_INTERVAL", "30"))
+            )
+            _online_learner.start()
+            _online_learner_pid = os.getpid()
+    return True
+
 
-    return feat
+def record_feedback(track1: list[dict], track2: list[dict], manual_choice: int) -> bool:
+    """İstifadəçinin seçimini (track_to_features_v2 formatında) rəy buferinə yazır."""
+    if not ONLINE_LEARNING or manual_choice not in (1, 2):
+        return False
+    features = FEATURE_ENCODER_V2.encode_batch([(track1, track2)])[0]
+    try:
+        return FEEDBACK_BUFFER.append(features, manual_choice)
+    except (OSError, ValueError) as e:  # rəy yazılmasa da /compare cavab verməlidir
+        print(f"Xəbərdarlıq: rəy yazılmadı: {e}")
+        return False
 
 
-def decide_ml_v2(track1: list[dict], track2: list[dict]) -> dict:
+def online_learning_status() -> dict:
+    status = {"enabled": ONLINE_LEARNING}
+    if _online_learner is not None and _online_learner_pid == os.getpid():
+        status.update(_online_learner.status())
+    return status
+
+
+def track_to_features_v2(prefix: str, persons: list[dict]) -> dict:
+    """
+    Yeni data modelindəki şəxslər siyahısını ML v2 üçün feature-lərə çevirir.
+    prefix: 't1_' və ya 't2_'
+    Hesablama FEATURE_ENCODER_V2 üzərindən aparılır; dict yalnız nəticə üçündür.
+    """
+    counts = FEATURE_ENCODER_V2.encode_track(prefix, persons)
+    cols = FEATURE_ENCODER_V2.prefix_columns[prefix]
+    return {ML_V2_HEADER[col]: int(value) for col, value in zip(cols, counts)}
+
+
+def _predict_matrix(handle: ModelHandle, matrix: np.ndarray) -> np.ndarray:
+    """handle.predictor.predict + predict metrikaları (müddət və sətir sayı)."""
+    start = time.perf_counter()
+    preds = handle.predictor.predict(matrix)
+    metrics.PREDICT_LATENCY.observe(time.perf_counter() - start)
+    metrics.PREDICT_BATCH_SIZE.observe(len(matrix))
+    return preds
+
+
+# TROLLEY_ML_BATCH=1 olduqda paralel sorğuların bir sətirlik ML predict-ləri
+# MicroBatcher ilə birləşdirilir (thread-li worker-lər üçün): batch
+# TROLLEY_ML_BATCH_MAX sətirə çatanda və ya TROLLEY_ML_BATCH_WAIT_MS keçəndə hesablanır
+ML_BATCHER = MicroBatcher(
+    _predict_matrix,
+    max_batch=int(os.environ.get("TROLLEY_ML_BATCH_MAX", "64")),
+    max_wait=float(os.environ.get("TROLLEY_ML_BATCH_WAIT_MS", "2")) / 1000
+) if os.environ.get("TROLLEY_ML_BATCH") == "1" else None
+
+
+def decide_ml_v2(
+    track1: list[dict],
+    track2: list[dict],
+    analysis: "ScenarioAnalysis | None" = None
+) -> dict:
     """
     Yeni ML v2 modeli ilə qərar verir.
     track1 və track2 – yeni strukturda şəxslər siyahısıdır.
+    analysis verilibsə, feature-lər onun saylarından qurulur.
+    Nəticədə qərarı verən modelin versiyası (model_version) da qaytarılır.
     """
-    model = load_ml_model()
-    if model is None:
+    handle = load_ml_handle()
+    if handle is None:
         return {
             "chosen_track": 1,
             "reason": "ML v2 modeli tapılmadı, default olaraq Track 1 seçildi."
         }
 
-    feat_t1 = track_to_features_v2("t1_", track1)
-    feat_t2 = track_to_features_v2("t2_", track2)
-
-    # ML_V2_HEADER sırasına uyğun olaraq vektoru yığırıq
-    vector = []
-    for col in ML_V2_HEADER:
-        if col.startswith("t1_"):
-            vector.append(feat_t1.get(col, 0))
+    with stage("ml_encode"):
+        if analysis is not None:
+            vector = FEATURE_ENCODER_V2.encode_analysis(analysis)[np.newaxis, :]  # shape: (1, n_features)
         else:
-            vector.append(feat_t2.get(col, 0))
-
-    vector = np.array([vector])  # shape: (1, n_features)
+            vector = FEATURE_ENCODER_V2.encode_batch([(track1, track2)])  # shape: (1, n_features)
 
-    pred = int(model.predict(vector)[0])
+    with stage("ml_predict"):
+        if ML_BATCHER is not None:
+            # Paralel sorğuların sətirləri ilə birlikdə bir predict-də hesablanır
+            pred = int(ML_BATCHER.submit(handle, vector[0]))
+        else:
+            pred = int(_predict_matrix(handle, vector)[0])
 
     reason = "Ssenari yaş, rol və atributlar əsasında ML v2 modeli ilə qiymətləndirildi."
 
     return {
         "chosen_track": pred,
-        "reason": reason
+        "reason": reason,
+        "model_version": handle.version
     }
 
+
+def decide_ml_v2_batch(pairs: list[tuple[list[dict], list[dict]]]) -> list[dict]:
+    """
+    Bir neçə (track1, track2) cütünü ML v2 modeli ilə bir dəfəyə qiymətləndirir.
+    Bütün cütlər (N, n_features) matrisinə yığılır və model.predict yalnız
+    bir dəfə çağırılır. Nəticələr giriş sırası ilə qaytarılır.
+    """
+    if not pairs:
+        return []
+
+    handle = load_ml_handle()
+    if handle is None:
+        return [
+            {
+                "chosen_track": 1,
+                "reason": "ML v2 modeli tapılmadı, default olaraq Track 1 seçildi."
+            }
+            for _ in pairs
+        ]
+
+    with stage("ml_encode"):
+        matrix = FEATURE_ENCODER_V2.encode_batch(pairs)  # shape: (N, n_features)
+
+    with stage("ml_predict"):
+        preds = _predict_matrix(handle, matrix)
+
+    reason = "Ssenari yaş, rol və atributlar əsasında ML v2 modeli ilə qiymətləndirildi."
+
+    return [
+        {
+            "chosen_track": int(pred),
+            "reason": reason,
+            "model_version": handle.version
+        }
+        for pred in preds
+    ]
+
 def decide_scenario(scenario: dict) -> dict:
     """
     Ssenariyə və seçilmiş etik rejimə əsasən qərar verən funksiya.
@@ -386,6 +967,164 @@ def merge_weights(defaults: dict, custom: dict | None) -> dict:
     return merged
 
 
+def _is_int_weights(*tables: dict) -> bool:
+    """Bütün ağırlıqlar tam ədəddirsə True (say × ağırlıq cəmi onda dəqiqdir)."""
+    return all(
+        isinstance(value, int)
+        for table in tables
+        for value in table.values()
+    )
+
+
+# ====== Vektorlaşdırılmış itki kernel-i ======
+# Şəxslər tam ədəd yaş/rol kodlarına və flag matrisinə çevrilir, ağırlıq
+# cədvəlləri isə kodlara uyğun NumPy lookup vektorlarına. Track itkisi bu
+# halda "gather + cəm" əməliyyatıdır.
+
+# Kod lüğətləri: default ağırlıq cədvəllərinin və ML v2 feature-lərinin açarları
+AGE_VOCAB = tuple(dict.fromkeys((*AGE_WEIGHTS, *ML_V2_AGE_KEYS)))
+ROLE_VOCAB = tuple(dict.fromkeys((*ROLE_WEIGHTS, *ML_V2_ROLE_KEYS)))
+FLAG_VOCAB = tuple(dict.fromkeys((*FLAG_WEIGHTS, *ML_V2_FLAG_KEYS)))
+
+AGE_CODES = {age: i for i, age in enumerate(AGE_VOCAB)}
+ROLE_CODES = {role: i for i, role in enumerate(ROLE_VOCAB)}
+FLAG_CODES = {flag: i for i, flag in enumerate(FLAG_VOCAB)}
+
+# None və lüğətdə olmayan yaş/rol üçün ortaq kod (ağırlığı həmişə 1-dir)
+UNKNOWN_AGE_CODE = len(AGE_VOCAB)
+UNKNOWN_ROLE_CODE = len(ROLE_VOCAB)
+
+# Bu aralıqdan kənar ağırlıqlar üçün int64 cəmi təhlükəsiz sayılmır
+_MAX_KERNEL_WEIGHT = 2 ** 31
+
+
+class WeightVectors:
+    """
+    Ağırlıq cədvəllərinin kod lüğətlərinə uyğun tam ədəd lookup vektorları.
+    Lüğətdə olmayan custom açarlar (məsələn, "baby" yaşı) extra_* dəstlərində
+    saxlanılır və itki hesablananda ayrıca nəzərə alınır.
+    """
+
+    __slots__ = (
+        "age", "role", "flag",
+        "age_weights", "role_weights", "flag_weights",
+        "extra_ages", "extra_roles", "extra_flags"
+    )
+
+    def __init__(self, age_weights: dict, role_weights: dict, flag_weights: dict):
+        self.age_weights = age_weights
+        self.role_weights = role_weights
+        self.flag_weights = flag_weights
+
+        # Naməlum/None yaş və rol həmişə 1, naməlum flag 0 ağırlıq alır
+        self.age = np.array([age_weights.get(a, 1) for a in AGE_VOCAB] + [1], dtype=np.int64)
+        self.role = np.array([role_weights.get(r, 1) for r in ROLE_VOCAB] + [1], dtype=np.int64)
+        self.flag = np.array([flag_weights.get(f, 0) for f in FLAG_VOCAB], dtype=np.int64)
+
+        self.extra_ages = [a for a in age_weights if a not in AGE_CODES]
+        self.extra_roles = [r for r in role_weights if r not in ROLE_CODES]
+        self.extra_flags = [f for f in flag_weights if f not in FLAG_CODES]
+
+    @classmethod
+    def compile(cls, age_weights: dict, role_weights: dict, flag_weights: dict) -> "WeightVectors | None":
+        """
+        Cədvəlləri vektorlara çevirir. Ağırlıqlar tam ədəd deyilsə (və ya çox böyükdürsə)
+        None qaytarır – onda çağıran şəxs-şəxs hesablamaya qayıtmalıdır.
+        """
+        tables = (age_weights, role_weights, flag_weights)
+        if not _is_int_weights(*tables):
+            return None
+        if any(abs(v) >= _MAX_KERNEL_WEIGHT for table in tables for v in table.values()):
+            return None
+        return cls(*tables)
+
+
+def _code_counts(raw_counts: Counter, codes: dict, size: int, default: int | None) -> np.ndarray:
+    """
+    Xam dəyər sayğacını kod lüğəti üzrə say vektoruna çevirir.
+    default None olduqda lüğətdə olmayan dəyərlər atılır.
+    """
+    counts = np.zeros(size, dtype=np.int64)
+    for value, n in raw_counts.items():
+        code = codes.get(value, default)
+        if code is not None:
+            counts[code] += n
+    return counts
+
+
+class TrackCodes:
+    """
+    Track-in kompakt kodlaşdırılması.
+
+    Şəxslərdən yaş, rol və flag-lar bir dəfə oxunur və C səviyyəsində
+    (Counter, chain) sayılır; nəticə kod lüğətləri üzrə say vektorlarıdır:
+    age_counts, role_counts (son element – naməlum/None), flag_counts.
+    Track itkisi bu vektorların lookup vektorları ilə skalyar hasilidir.
+    Lüğətdə olmayan flag-lar extra_flags sayğacında saxlanılır.
+
+    Tək şəxsin dəyəri (compute_person_value) lüğət lookup-ları ilə daha ucuz
+    hesablanır – kernel yalnız bütöv track-lər üçündür.
+    """
+
+    __slots__ = (
+        "count", "age_counts", "role_counts", "flag_counts",
+        "raw_age_counts", "raw_role_counts", "extra_flags"
+    )
+
+    def __init__(self, track: list):
+        ages = [p.get("age") for p in track]
+        roles = [p.get("role") for p in track]
+        flag_lists = [p.get("flags") or () for p in track]
+
+        self.count = len(track)
+        self.raw_age_counts = Counter(ages)
+        self.raw_role_counts = Counter(roles)
+        raw_flag_counts = Counter(chain.from_iterable(flag_lists))
+
+        self.age_counts = _code_counts(
+            self.raw_age_counts, AGE_CODES, len(AGE_VOCAB) + 1, UNKNOWN_AGE_CODE
+        )
+        self.role_counts = _code_counts(
+            self.raw_role_counts, ROLE_CODES, len(ROLE_VOCAB) + 1, UNKNOWN_ROLE_CODE
+        )
+        self.flag_counts = _code_counts(raw_flag_counts, FLAG_CODES, len(FLAG_VOCAB), None)
+        self.extra_flags = Counter({
+            flag: n for flag, n in raw_flag_counts.items() if flag not in FLAG_CODES
+        })
+
+    def age_count(self, age) -> int:
+        """Verilən yaş dəyərinə (xam, kodlaşdırılmamış) malik şəxslərin sayı."""
+        return self.raw_age_counts.get(age, 0)
+
+    def flag_count(self, flag) -> int:
+        """Verilən flag-in track-dəki ümumi sayı."""
+        code = FLAG_CODES.get(flag)
+        if code is not None:
+            return int(self.flag_counts[code])
+        return self.extra_flags.get(flag, 0)
+
+    def loss(self, weights: "WeightVectors") -> int:
+        """Track itkisi: kod saylarının lookup vektorları ilə skalyar hasilləri."""
+        total = int(
+            self.age_counts @ weights.age
+            + self.role_counts @ weights.role
+            + self.flag_counts @ weights.flag
+        )
+
+        # Lüğətdə olmayan custom açarlar: bu şəxslər yuxarıda 1 (və ya 0) ilə sayılıb
+        for age in weights.extra_ages:
+            total += (weights.age_weights[age] - 1) * self.raw_age_counts.get(age, 0)
+        for role in weights.extra_roles:
+            total += (weights.role_weights[role] - 1) * self.raw_role_counts.get(role, 0)
+        for flag, n in self.extra_flags.items():
+            total += n * weights.flag_weights.get(flag, 0)
+        return total
+
+
+# Default ağırlıq cədvəllərinin kompilyasiya olunmuş vektorları
+DEFAULT_WEIGHT_VECTORS = WeightVectors(AGE_WEIGHTS, ROLE_WEIGHTS, FLAG_WEIGHTS)
+
+
 def compute_person_value(person: dict) -> int:
     """
     Bir şəxsin etik dəyərini hesablayır:
@@ -407,7 +1146,7 @@ def compute_track_loss(track: list) -> int:
     Verilən relsdəki bütün şəxslərin dəyərlərinin cəmini qaytarır.
     Bu cəmi 'itirilən dəyər' kimi interpretasiya edirik.
     """
-    return sum(compute_person_value(p) for p in track)
+    return TrackCodes(track).loss(DEFAULT_WEIGHT_VECTORS)
 
 def compute_person_value_with_rules(
     person: dict,
@@ -434,6 +1173,19 @@ def compute_track_loss_with_rules(
     age_weights: dict,
     role_weights: dict,
     flag_weights: dict
+) -> int:
+    weights = WeightVectors.compile(age_weights, role_weights, flag_weights)
+    if weights is None:
+        # Tam ədəd olmayan ağırlıqlar – cəmləmə sırası qorunsun deyə şəxs-şəxs
+        return _track_loss_per_person(track, age_weights, role_weights, flag_weights)
+    return TrackCodes(track).loss(weights)
+
+
+def _track_loss_per_person(
+    track: list,
+    age_weights: dict,
+    role_weights: dict,
+    flag_weights: dict
 ) -> int:
     return sum(
         compute_person_value_with_rules(p, age_weights, role_weights, flag_weights)
@@ -460,6 +1212,67 @@ def track_count_any_flag(track: list, flags: list) -> int:
         if f in flags
     )
 
+class ScenarioAnalysis:
+    """
+    Ssenarinin hər iki track-ini yalnız bir dəfə gəzərək bütün modlar üçün
+    lazım olan məlumatı toplayır: saylar, yaş/rol/flag sayları və default
+    ağırlıqlarla itkilər. Utilitarian, deontoloji variantlar, custom və ML
+    qərarları bu bir analizdən verilə bilər.
+    """
+
+    def __init__(self, track1: list, track2: list):
+        self.track1 = track1
+        self.track2 = track2
+        self.codes = (TrackCodes(track1), TrackCodes(track2))
+
+        self.t1_count = self.codes[0].count
+        self.t2_count = self.codes[1].count
+
+        self.t1_loss = self.codes[0].loss(DEFAULT_WEIGHT_VECTORS)
+        self.t2_loss = self.codes[1].loss(DEFAULT_WEIGHT_VECTORS)
+
+    def has_age(self, track_no: int, age: str) -> bool:
+        """track_has_age ekvivalenti (track_no: 1 və ya 2)."""
+        return self.codes[track_no - 1].age_count(age) > 0
+
+    def count_any_flag(self, track_no: int, flags: list) -> int:
+        """track_count_any_flag ekvivalenti (track_no: 1 və ya 2)."""
+        codes = self.codes[track_no - 1]
+        return sum(codes.flag_count(flag) for flag in dict.fromkeys(flags))
+
+    def losses_with_compiled(self, compiled: "CompiledRules") -> tuple[int, int]:
+        """Kompilyasiya olunmuş custom qaydalarla (t1_loss, t2_loss)."""
+        if compiled.vectors is None:
+            return (
+                _track_loss_per_person(
+                    self.track1, compiled.age_weights, compiled.role_weights, compiled.flag_weights
+                ),
+                _track_loss_per_person(
+                    self.track2, compiled.age_weights, compiled.role_weights, compiled.flag_weights
+                )
+            )
+        return self.codes[0].loss(compiled.vectors), self.codes[1].loss(compiled.vectors)
+
+    def losses_with_rules(
+        self,
+        age_weights: dict,
+        role_weights: dict,
+        flag_weights: dict
+    ) -> tuple[int, int]:
+        """
+        Verilən ağırlıq cədvəlləri ilə (t1_loss, t2_loss).
+        Tam ədəd olmayan ağırlıqlarda cəmləmə sırası nəticəyə təsir edə bildiyi üçün
+        şəxs-şəxs hesablamaya qayıdırıq.
+        """
+        weights = WeightVectors.compile(age_weights, role_weights, flag_weights)
+        if weights is None:
+            return (
+                _track_loss_per_person(self.track1, age_weights, role_weights, flag_weights),
+                _track_loss_per_person(self.track2, age_weights, role_weights, flag_weights)
+            )
+        return self.codes[0].loss(weights), self.codes[1].loss(weights)
+
+
 def decide_deontological(
     track1: list,
     track2: list,
@@ -467,12 +1280,14 @@ def decide_deontological(
     t1_loss: int,
     t2_loss: int,
     t1_count: int,
-    t2_count: int
+    t2_count: int,
+    analysis: ScenarioAnalysis | None = None
 ) -> tuple[int, str]:
     """
     Deontoloji etik variantlara əsasən qərar verir.
     Qayıdır: (chosen_track, reason)
     chosen_track = qurban verilən rels (1 və ya 2).
+    analysis verilibsə, yaş və flag sayları track-ləri yenidən gəzmədən oradan götürülür.
     """
 
     # Variant 1: Non-intervention – müdaxilə etmə
@@ -487,8 +1302,12 @@ def decide_deontological(
 
     # Variant 2: Uşaqları qorumaq (protect_children)
     if variant == "protect_children":
-        has_child1 = track_has_age(track1, "child")
-        has_child2 = track_has_age(track2, "child")
+        if analysis is not None:
+            has_child1 = analysis.has_age(1, "child")
+            has_child2 = analysis.has_age(2, "child")
+        else:
+            has_child1 = track_has_age(track1, "child")
+            has_child2 = track_has_age(track2, "child")
 
         if has_child1 and not has_child2:
             # Track 1-də uşaq var, Track 2-də yoxdur → Track 2 qurban verilsin
@@ -533,8 +1352,12 @@ def decide_deontological(
     if variant == "protect_innocent":
         guilty_flags = ["guilty", "law_breaker"]
 
-        guilty_t1 = track_count_any_flag(track1, guilty_flags)
-        guilty_t2 = track_count_any_flag(track2, guilty_flags)
+        if analysis is not None:
+            guilty_t1 = analysis.count_any_flag(1, guilty_flags)
+            guilty_t2 = analysis.count_any_flag(2, guilty_flags)
+        else:
+            guilty_t1 = track_count_any_flag(track1, guilty_flags)
+            guilty_t2 = track_count_any_flag(track2, guilty_flags)
 
         if guilty_t1 > guilty_t2:
             # Track 1-də daha çox günahkar var → onu qurban vermək "etik" sayılır
@@ -579,8 +1402,12 @@ def decide_deontological(
     if variant == "protect_vulnerable":
         vulnerable_flags = ["pregnant", "disabled", "vulnerable"]
 
-        v1 = track_count_any_flag(track1, vulnerable_flags)
-        v2 = track_count_any_flag(track2, vulnerable_flags)
+        if analysis is not None:
+            v1 = analysis.count_any_flag(1, vulnerable_flags)
+            v2 = analysis.count_any_flag(2, vulnerable_flags)
+        else:
+            v1 = track_count_any_flag(track1, vulnerable_flags)
+            v2 = track_count_any_flag(track2, vulnerable_flags)
 
         if v1 > 0 and v2 == 0:
             # Track 1-də zəif qrup var, Track 2-də yoxdur → Track 2 qurban verilsin
@@ -629,32 +1456,79 @@ def decide_deontological(
     )
     return chosen_track, reason
 
+class CompiledRules:
+    """
+    Custom qaydaların bir dəfə hazırlanmış forması: default cədvəllərlə
+    birləşdirilmiş ağırlıqlar və onların kernel vektorları (tam ədəd
+    olmayan ağırlıqlarda vectors None-dur).
+    """
+
+    __slots__ = ("rules_hash", "age_weights", "role_weights", "flag_weights", "vectors")
+
+    def __init__(self, custom_rules: dict, rules_hash: str):
+        self.rules_hash = rules_hash
+        self.age_weights = merge_weights(AGE_WEIGHTS, custom_rules.get("age_weights"))
+        self.role_weights = merge_weights(ROLE_WEIGHTS, custom_rules.get("role_weights"))
+        self.flag_weights = merge_weights(FLAG_WEIGHTS, custom_rules.get("flag_weights"))
+        self.vectors = WeightVectors.compile(
+            self.age_weights, self.role_weights, self.flag_weights
+        )
+
+
+def compile_custom_rules(custom_rules: dict, content_hash: str | None = None) -> CompiledRules:
+    """
+    custom_rules-u CompiledRules-a çevirir. Nəticə məzmun hash-i üzrə cache-lənir,
+    ona görə eyni qaydaların təkrar göndərilməsi yenidən birləşdirmə tələb etmir.
+    """
+    if content_hash is None:
+        content_hash = rules_hash(custom_rules)
+
+    compiled = COMPILED_RULES_CACHE.get(content_hash)
+    if compiled is None:
+        compiled = CompiledRules(custom_rules, content_hash)
+        COMPILED_RULES_CACHE.put(content_hash, compiled)
+    return compiled
+
+
+def resolve_custom_rules(scenario: dict) -> CompiledRules:
+    """
+    Ssenarinin custom qaydalarını qaytarır: custom_profile_id verilibsə, serverdəki
+    profil (custom_rules-dan üstündür), əks halda inline custom_rules.
+    Inline qaydalar da validate_custom_rules-dan keçir, amma naməlum cədvəllər
+    (köhnə klientlərin əlavə açarları) xəta deyil – atılır.
+    Profil tapılmadıqda və ya qaydalar yanlış olduqda ValueError atır.
+    """
+    profile_id = scenario.get("custom_profile_id")
+    if profile_id is not None:
+        profile = RULE_PROFILES.get(profile_id)
+        if profile is None:
+            raise ValueError(f"Custom qayda profili tapılmadı: {profile_id}")
+        return compile_custom_rules(profile["custom_rules"], profile["rules_hash"])
+    return compile_custom_rules(
+        validate_custom_rules(scenario.get("custom_rules") or {}, ignore_unknown=True)
+    )
+
+
 def decide_custom(
     track1: list,
     track2: list,
-    custom_rules: dict,
+    compiled: CompiledRules,
     t1_count: int,
-    t2_count: int
+    t2_count: int,
+    analysis: ScenarioAnalysis | None = None
 ) -> tuple[int, str, int, int]:
     """
     Custom utilitarian qaydalar əsasında qərar verir.
-    custom_rules formatı:
-    {
-      "age_weights": {...},
-      "role_weights": {...},
-      "flag_weights": {...}
-    }
+    compiled – default cədvəllərlə birləşdirilmiş custom qaydalar
+    (resolve_custom_rules və ya compile_custom_rules nəticəsi).
     Qayıdır: (chosen_track, reason, t1_loss, t2_loss)
+    analysis verilibsə, itkilər track-ləri yenidən gəzmədən onun saylarından hesablanır.
     """
 
-    # Default cədvəlləri istifadəçi qaydaları ilə birləşdiririk
-    age_w = merge_weights(AGE_WEIGHTS, custom_rules.get("age_weights"))
-    role_w = merge_weights(ROLE_WEIGHTS, custom_rules.get("role_weights"))
-    flag_w = merge_weights(FLAG_WEIGHTS, custom_rules.get("flag_weights"))
-
     # Hər track üçün itirilən etik dəyəri hesablayırıq
-    t1_loss = compute_track_loss_with_rules(track1, age_w, role_w, flag_w)
-    t2_loss = compute_track_loss_with_rules(track2, age_w, role_w, flag_w)
+    if analysis is None:
+        analysis = ScenarioAnalysis(track1, track2)
+    t1_loss, t2_loss = analysis.losses_with_compiled(compiled)
 
     if t1_loss < t2_loss:
         chosen_track = 1
@@ -698,7 +1572,11 @@ def decide_custom(
 
 
 
-def decide_scenario_v2(scenario: dict) -> dict:
+def decide_scenario_v2(
+    scenario: dict,
+    ml_result: dict | None = None,
+    analysis: ScenarioAnalysis | None = None
+) -> dict:
     """
     Yeni data modeli üçün qərar verən funksiya.
     scenario formatı:
@@ -713,18 +1591,26 @@ def decide_scenario_v2(scenario: dict) -> dict:
           "flag_weights": {...}
       }
     }
+    ml_result: ML modunda əvvəlcədən (məsələn, batch ilə) hesablanmış
+    decide_ml_v2 nəticəsi. Verilibsə, model yenidən çağırılmır.
+    analysis: eyni track-lər üçün əvvəlcədən qurulmuş ScenarioAnalysis
+    (məsələn, /compare bir analizi bütün modlar arasında paylaşır).
     """
 
     track1 = scenario.get("track1", [])
     track2 = scenario.get("track2", [])
     mode = scenario.get("mode", "utilitarian")
 
-    t1_count = len(track1)
-    t2_count = len(track2)
+    # Track-lər bir dəfə gəzilir; saylar və default utilitarian itkisi
+    # (deontoloji və s. üçün də istifadə olunur) analizdən götürülür
+    if analysis is None:
+        with stage("analysis"):
+            analysis = ScenarioAnalysis(track1, track2)
 
-    # Default utilitarian itkisini əvvəlcədən hesablayaq (deontoloji və s. üçün də istifadə olunur)
-    t1_loss = compute_track_loss(track1)
-    t2_loss = compute_track_loss(track2)
+    t1_count = analysis.t1_count
+    t2_count = analysis.t2_count
+    t1_loss = analysis.t1_loss
+    t2_loss = analysis.t2_loss
 
     # 1) Utilitarian mod (default ağırlıqlarla)
     if mode == "utilitarian":
@@ -765,14 +1651,15 @@ def decide_scenario_v2(scenario: dict) -> dict:
     elif mode == "deontological":
         deon_variant = scenario.get("deon_variant", "non_intervention")
         chosen_track, reason = decide_deontological(
-            track1, track2, deon_variant, t1_loss, t2_loss, t1_count, t2_count
+            track1, track2, deon_variant, t1_loss, t2_loss, t1_count, t2_count,
+            analysis=analysis
         )
 
     # 3) Custom utilitarian mod (sənin verdiyin ağırlıq cədvəlinə əsasən)
     elif mode == "custom":
-        custom_rules = scenario.get("custom_rules", {})
         chosen_track, reason, t1_loss_custom, t2_loss_custom = decide_custom(
-            track1, track2, custom_rules, t1_count, t2_count
+            track1, track2, resolve_custom_rules(scenario), t1_count, t2_count,
+            analysis=analysis
         )
         # Cavabda custom loss-ları göstərmək üçün default loss-ları override edirik
         t1_loss = t1_loss_custom
@@ -780,7 +1667,10 @@ def decide_scenario_v2(scenario: dict) -> dict:
 
     # 4) ML mode – mövcud ML modelini yeni dataya map edərək istifadə edirik
     elif mode == "ml":
-        result = decide_ml_v2(track1, track2)
+        if ml_result is not None:
+            result = ml_result
+        else:
+            result = decide_ml_v2(track1, track2, analysis=analysis)
         chosen_track = result["chosen_track"]
         reason = "ML v2: " + result["reason"]
     # 5) Digər modlar (manual, compare və s.) – hələ implement olunmayıb
@@ -791,7 +1681,7 @@ def decide_scenario_v2(scenario: dict) -> dict:
             "Default olaraq Track 1 seçildi."
         )
 
-    return {
+    response = {
         "chosen_track": chosen_track,
         "reason": reason,
         "track1_count": t1_count,
@@ -799,3 +1689,161 @@ def decide_scenario_v2(scenario: dict) -> dict:
         "track1_loss": t1_loss,
         "track2_loss": t2_loss
     }
+    if mode == "ml" and "model_version" in result:
+        # Qərarı hansı model versiyasının verdiyi
+        response["model_version"] = result["model_version"]
+    return response
+
+
+def decide_scenarios_v2(scenarios: list[dict]) -> list[dict]:
+    """
+    Bir neçə ssenarini (müxtəlif modlarla) bir dəfəyə qiymətləndirir.
+    ML modundakı ssenarilər qruplaşdırılır və model.predict (N, n_features)
+    matrisi üzərində yalnız bir dəfə çağırılır. Digər modlar adi qaydada
+    decide_scenario_v2 ilə hesablanır. Nəticələr giriş sırası ilə qaytarılır.
+    """
+    results = [None] * len(scenarios)
+    ml_indices = []
+    metrics.DECISION_BATCH_SIZE.observe(len(scenarios))
+
+    for i, scenario in enumerate(scenarios):
+        _observe_track_lengths(scenario.get("track1", []), scenario.get("track2", []))
+        if scenario.get("mode", "utilitarian") == "ml":
+            ml_indices.append(i)
+        else:
+            results[i] = _decide_observed(scenario)
+
+    ml_results = decide_ml_v2_batch([
+        (scenarios[i].get("track1", []), scenarios[i].get("track2", []))
+        for i in ml_indices
+    ])
+
+    # ML-in predict müddəti batch üzrə ayrıca ölçülür (trolley_model_predict_duration_seconds)
+    for i, ml_result in zip(ml_indices, ml_results):
+        results[i] = _decide_observed(scenarios[i], ml_result=ml_result)
+
+    return results
+
+
+def _observe_track_lengths(track1, track2) -> None:
+    metrics.TRACK_LENGTH.observe(len(track1) if isinstance(track1, list) else 0)
+    metrics.TRACK_LENGTH.observe(len(track2) if isinstance(track2, list) else 0)
+
+
+def _decide_observed(scenario: dict, **kwargs) -> dict:
+    """decide_scenario_v2 + mod/variant üzrə qərar müddətinin metrikası."""
+    start = time.perf_counter()
+    result = decide_scenario_v2(scenario, **kwargs)
+    metrics.DECISION_LATENCY.observe(time.perf_counter() - start, metrics.decision_labels(scenario))
+    return result
+
+
+# Server-Timing mərhələ adları üçün tanınan modlar (klientin mod sətri başlığa düşmür)
+_TIMED_MODES = ("utilitarian", "deontological", "custom", "ml")
+
+
+def _mode_stage_name(scenario: dict) -> str:
+    mode = scenario.get("mode", "utilitarian")
+    return f"mode_{mode}" if isinstance(mode, str) and mode in _TIMED_MODES else "mode_other"
+
+
+def _cache_mode_key(scenario: dict) -> tuple | None:
+    """
+    Ssenarinin cache açarındakı mod hissəsi; cache-lənməməlidirsə None.
+    Custom modda açar birləşdirilmiş qaydaların məzmun hash-idir – eyni qaydalar
+    inline və ya profil ilə gəlsə də eyni açarı alır. Yalnız tam ədəd ağırlıqlar
+    cache-lənir: onda itki şəxslərin sırasından asılı deyil.
+    """
+    mode = scenario.get("mode", "utilitarian")
+    if not isinstance(mode, str) or not isinstance(scenario.get("deon_variant", ""), str):
+        # Məsələn, list tipli mode – hash olunmur; cache-siz hesablanır ("tanınmadı" nəticəsi)
+        return None
+    if mode == "ml":
+        # Model versiyası açara daxildir – köhnə versiyanın nəticəsi yeni versiyaya verilmir.
+        # Model hələ yüklənməyibsə (versiya None), "model tapılmadı" nəticəsi cache-lənmir
+        version = current_model_version()
+        return None if version is None else ("ml", version)
+    if mode != "custom":
+        return mode_key(scenario)
+
+    compiled = resolve_custom_rules(scenario)
+    if compiled.vectors is None:
+        return None
+    return ("custom", compiled.rules_hash)
+
+
+def _cache_lookup(canonical: tuple, mkey: tuple) -> dict | None:
+    """
+    Cache-də nəticəni axtarır. Tapılmadıqda, simmetrik modlarda track-ləri
+    yeri dəyişmiş açar da yoxlanılır və nəticə güzgülənir.
+    """
+    t1_key, t2_key = canonical
+
+    entry = DECISION_CACHE.get((t1_key, t2_key, mkey))
+    if entry is not None:
+        DECISION_CACHE.record(hit=True)
+        return dict(entry[0])
+
+    if t1_key != t2_key and is_symmetric_mode(mkey):
+        entry = DECISION_CACHE.get((t2_key, t1_key, mkey))
+        if entry is not None and entry[1]:
+            DECISION_CACHE.record(hit=True, mirrored=True)
+            return mirror_result(entry[0])
+
+    DECISION_CACHE.record(hit=False)
+    return None
+
+
+def decide_modes_v2(track1: list, track2: list, scenarios: dict) -> dict:
+    """
+    Eyni track-lər üçün bir neçə modu (məsələn, /compare) cache vasitəsilə qiymətləndirir.
+    scenarios: { ad: ssenari }, qayıdır: { ad: nəticə } (eyni sıra ilə).
+    Track-lərin kanonik forması bir dəfə hesablanır; ScenarioAnalysis yalnız
+    cache-də tapılmayan modlar olduqda (yenə bir dəfə) qurulur.
+    """
+    canonical = None
+    results = {}
+    misses = []
+    _observe_track_lengths(track1, track2)
+
+    with stage("cache"):
+        if DECISION_CACHE.enabled:
+            try:
+                canonical = (canonical_track(track1), canonical_track(track2))
+            except TypeError:
+                # Hash olunmayan dəyərlər (məsələn, list tipli age) – cache-siz hesablayırıq
+                canonical = None
+
+        for name, scenario in scenarios.items():
+            mkey = _cache_mode_key(scenario) if canonical is not None else None
+            if mkey is not None:
+                cached = _cache_lookup(canonical, mkey)
+                if cached is not None:
+                    results[name] = cached
+                    continue
+            misses.append((name, scenario, mkey))
+
+    analysis = None
+    for name, scenario, mkey in misses:
+        if analysis is None:
+            # Track-lərin gəzilməsi və default itkilər (compute_track_loss ekvivalenti)
+            with stage("analysis"):
+                analysis = ScenarioAnalysis(track1, track2)
+
+        with stage(_mode_stage_name(scenario)):
+            result = _decide_observed(scenario, analysis=analysis)
+        if mkey is not None:
+            DECISION_CACHE.put(
+                (canonical[0], canonical[1], mkey),
+                (dict(result), is_mirror_safe(mkey, result))
+            )
+        results[name] = result
+
+    return {name: results[name] for name in scenarios}
+
+
+def decide_scenario_v2_cached(scenario: dict) -> dict:
+    """decide_scenario_v2-nin cache-li variantı (/decide_v2 üçün)."""
+    track1 = scenario.get("track1", [])
+    track2 = scenario.get("track2", [])
+    return decide_modes_v2(track1, track2, {"result": scenario})["result"]
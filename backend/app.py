@@ -1,20 +1,100 @@
+import gc
+import hmac
 import os
-from flask import Flask, jsonify, request
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 
 # Lokalda və serverdə işləmək üçün dual import:
 # - Lokalda: python app.py (backend qovluğundan işlədirsən)
 # - Serverdə: gunicorn backend.app:app (backend package kimi)
 try:
-    from .ai_model import decide_scenario, decide_scenario_v2
+    from .ai_model import (
+        DECISION_CACHE, RULE_PROFILES, decide_modes_v2, decide_scenario,
+        decide_scenario_v2, decide_scenario_v2_cached, decide_scenarios_v2,
+        is_ml_ready, model_status, online_learning_status, record_feedback,
+        reload_ml_model, start_model_watcher, start_online_learning, warm_up_ml_model
+    )
+    from . import metrics, timing
+    from .ndjson_stream import decide_ndjson
+    from .profiling import AggregateProfiler, ProfileStore, StackSampler
+    from .request_log import (
+        DEFAULT_SAMPLE_RATES, RequestLogger, parse_sample_rates, summarize_payload
+    )
+    from .shared_stats import SharedCounters
 except ImportError:
-    from ai_model import decide_scenario, decide_scenario_v2
+    from ai_model import (
+        DECISION_CACHE, RULE_PROFILES, decide_modes_v2, decide_scenario,
+        decide_scenario_v2, decide_scenario_v2_cached, decide_scenarios_v2,
+        is_ml_ready, model_status, online_learning_status, record_feedback,
+        reload_ml_model, start_model_watcher, start_online_learning, warm_up_ml_model
+    )
+    import metrics
+    import timing
+    from ndjson_stream import decide_ndjson
+    from profiling import AggregateProfiler, ProfileStore, StackSampler
+    from request_log import (
+        DEFAULT_SAMPLE_RATES, RequestLogger, parse_sample_rates, summarize_payload
+    )
+    from shared_stats import SharedCounters
+
+# /compare-də manual seçimlə müqayisə olunan modlar
+STATS_MODES = ("utilitarian", "deontological", "custom", "ml")
+
+# Bütün worker-lər üçün ortaq statistika (paylaşılan yaddaşda, hər prosesin öz slotu)
+STATS = SharedCounters(
+    ["total_manual_decisions", "total_ai_agreements"]
+    + [f"{mode}_{kind}" for mode in STATS_MODES for kind in ("decisions", "agreements")],
+    slots=int(os.environ.get("TROLLEY_STATS_SLOTS", "64"))
+)
+
+# Model start zamanı (gunicorn --preload ilə master prosesdə, fork-dan əvvəl) yüklənsin?
+PRELOAD_MODEL = os.environ.get("TROLLEY_PRELOAD_MODEL") == "1"
+
+# Admin endpoint-ləri üçün token (X-Admin-Token başlığı). Təyin olunmayıbsa,
+# admin endpoint-ləri söndürülür – heç bir sorğu admin sayılmır
+ADMIN_TOKEN = os.environ.get("TROLLEY_ADMIN_TOKEN")
+
+# Bir batch sorğusunda qəbul olunan maksimum ssenari sayı
+MAX_BATCH_SIZE = int(os.environ.get("TROLLEY_MAX_BATCH_SIZE", "5000"))
+
+# NDJSON axınında decide_scenarios_v2-yə bir dəfəyə ötürülən ssenari sayı
+STREAM_BATCH_SIZE = int(os.environ.get("TROLLEY_STREAM_BATCH_SIZE", "256"))
+
+# Strukturlaşdırılmış sorğu loqu: fon thread-i ilə yazılır, route üzrə sampling
+# (default yalnız qərar route-ları), tam payload əvəzinə xülasə; son sorğular
+# /debug/recent_requests-də
+REQUEST_LOG = RequestLogger(
+    enabled=os.environ.get("TROLLEY_REQUEST_LOG", "1") != "0",
+    sample_rates=parse_sample_rates(
+        os.environ.get("TROLLEY_LOG_SAMPLE_RATES", DEFAULT_SAMPLE_RATES)
+    ),
+    queue_size=int(os.environ.get("TROLLEY_LOG_QUEUE_SIZE", "10000")),
+    recent_size=int(os.environ.get("TROLLEY_RECENT_REQUESTS", "200"))
+)
 
-# Sadə yaddaşdaxili statistika
-STATS = {
-    "total_manual_decisions": 0,
-    "total_ai_agreements": 0
-}
+# Sorğu profili: admin ?profile=1 / X-Trolley-Profile başlığı ilə və ya sorğuların
+# TROLLEY_PROFILE_SAMPLE_RATE hissəsi üçün; nəticə collapsed stack formatındadır.
+# Admin tokeni təyin olunmayıbsa, profilləmə (aqreqat sampler daxil) tam söndürülür
+PROFILE_MODES = ("1", "collapsed")
+PROFILE_SAMPLE_RATE = float(os.environ.get("TROLLEY_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.environ.get("TROLLEY_PROFILE_INTERVAL", "0.001"))
+PROFILES = ProfileStore(
+    maxlen=int(os.environ.get("TROLLEY_PROFILE_KEEP", "20")),
+    directory=os.environ.get("TROLLEY_PROFILE_DIR") or None
+)
+
+# Həmişə aktiv, aşağı tezlikli sampler (0 – söndürülüb); /debug/profile/summary
+AGGREGATE_PROFILER = AggregateProfiler(
+    interval=float(os.environ.get("TROLLEY_PROFILE_AGGREGATE_INTERVAL", "0.05"))
+)
+
+# Bütün sorğular üçün Server-Timing başlığı (sorğu ?timings=1 ilə də açıla bilər)
+SERVER_TIMING = os.environ.get("TROLLEY_SERVER_TIMING") == "1"
 
 # FRONTEND qovluğunun yolu (../frontend)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,6 +109,156 @@ app = Flask(
 CORS(app)  # Enable CORS for frontend requests
 
 
+def preload_ml_model() -> bool:
+    """
+    ML modelini yükləyib isidir və GC-ni dondurur.
+    gunicorn --preload rejimində bu master prosesdə fork-dan əvvəl işləyir:
+    yüklənmə zamanı GC söndürülür ki, yaddaşda "deşiklər" yaranmasın,
+    sonra gc.freeze() bütün obyektləri daimi nəslə köçürür ki, worker-lərdəki
+    GC onlara toxunmasın və səhifələr copy-on-write ilə paylaşılı qalsın.
+    """
+    gc.disable()
+    try:
+        ready = warm_up_ml_model()
+    finally:
+        gc.freeze()
+        gc.enable()
+    return ready
+
+
+if PRELOAD_MODEL:
+    preload_ml_model()
+
+
+@app.before_request
+def ensure_background_workers():
+    """
+    Fon thread-lərini (online learning, model reyestri izləyicisi, loq yazıcısı,
+    aqreqat profiler) bu worker-də işə salır (yalnız ilk sorğuda iş görür).
+    Master prosesdə deyil, worker-də başladılır – thread-lər fork-dan keçmir.
+    """
+    start_online_learning()
+    start_model_watcher()
+    REQUEST_LOG.start()
+    if ADMIN_TOKEN:
+        AGGREGATE_PROFILER.start()
+
+
+@app.before_request
+def start_request_profiling():
+    """
+    Aqreqat profiler üçün thread-i aktiv sorğular siyahısına əlavə edir və lazım
+    olduqda bu sorğunun ayrıca profilini başladır: admin ?profile=1|collapsed və ya
+    X-Trolley-Profile başlığı, yaxud PROFILE_SAMPLE_RATE ehtimalı ilə.
+    Admin tokeni təyin olunmayıbsa, heç nə etmir.
+    """
+    if not ADMIN_TOKEN:
+        return
+    thread_id = threading.get_ident()
+    AGGREGATE_PROFILER.register(thread_id)
+
+    requested = request.args.get("profile") or request.headers.get("X-Trolley-Profile")
+    # Yalnız "1" və "collapsed" profili açır; "0", "false" və s. – söndürülüb
+    g.profile_mode = requested if requested in PROFILE_MODES and is_admin_request() else None
+    if g.profile_mode or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        g.profiler = StackSampler(thread_id, PROFILE_INTERVAL).start()
+
+
+@app.after_request
+def finish_request_profiling(response):
+    sampler = g.pop("profiler", None)
+    if sampler is None:
+        return response
+
+    sampler.stop()
+    profile_id = PROFILES.save(sampler, {
+        "route": request.url_rule.rule if request.url_rule else request.path,
+        "method": request.method,
+        "status": response.status_code,
+        "ts": time.time()
+    })
+    if g.get("profile_mode") == "collapsed":
+        # Cavab body-si əvəzinə birbaşa flamegraph aləti üçün mətn
+        response = Response(sampler.collapsed(), mimetype="text/plain")
+    response.headers["X-Trolley-Profile-Id"] = profile_id
+    return response
+
+
+@app.teardown_request
+def stop_request_profiling(exc):
+    AGGREGATE_PROFILER.unregister(threading.get_ident())
+    sampler = g.pop("profiler", None)
+    if sampler is not None:
+        sampler.stop()
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Route üzrə sorğu sayı və müddəti (axın cavablarında – başlıqlara qədər olan müddət)."""
+    started = g.get("request_started")
+    if started is not None:
+        route = metrics.route_label(request.url_rule.rule if request.url_rule else None)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, (route,))
+        metrics.HTTP_REQUESTS.inc((route, metrics.status_class(response.status_code)))
+    return response
+
+
+@app.after_request
+def log_request(response):
+    """Sorğunu loqa yazır (növbəyə qoyur – I/O fon thread-indədir)."""
+    started = g.get("request_started")
+    route = request.url_rule.rule if request.url_rule else request.path
+    if started is None or not REQUEST_LOG.is_logged(route):
+        return response
+
+    # View body-ni artıq oxuyubsa, get_json cache-dən qaytarır; axın sorğuları JSON deyil
+    summary = summarize_payload(request.get_json(silent=True)) if request.is_json else None
+    REQUEST_LOG.record(
+        route,
+        request.method,
+        response.status_code,
+        (time.perf_counter() - started) * 1000,
+        summary
+    )
+    return response
+
+
+@app.before_request
+def start_request_timing():
+    """
+    Mərhələ ölçməsini başladır: TROLLEY_SERVER_TIMING=1 olduqda hər sorğu üçün,
+    əks halda yalnız ?timings=1 ilə gələn sorğu üçün (onda JSON-a "timings" də əlavə olunur).
+    """
+    g.timings_in_body = request.args.get("timings") == "1"
+    if SERVER_TIMING or g.timings_in_body:
+        timing.start()
+
+
+@app.after_request
+def emit_request_timing(response):
+    recorder = timing.current()
+    if recorder is None:
+        return response
+
+    response.headers["Server-Timing"] = timing.server_timing_header(recorder)
+    if g.get("timings_in_body") and response.is_json:
+        data = response.get_json(silent=True)
+        if isinstance(data, dict):
+            data["timings"] = recorder.as_dict()
+            response.set_data(app.json.dumps(data))
+    return response
+
+
+@app.teardown_request
+def stop_request_timing(exc):
+    timing.stop()
+
+
 # ============== FRONTEND ROUTE ==============
 
 @app.route("/")
@@ -39,15 +269,44 @@ def index():
     return app.send_static_file("index.html")
 
 
+@app.route("/ready")
+def ready():
+    """
+    Readiness yoxlaması: preload rejimində model yüklənib isidilməyibsə 503 qaytarır.
+    """
+    if PRELOAD_MODEL and not is_ml_ready():
+        return jsonify({"status": "warming_up"}), 503
+    return jsonify({"status": "ready", "ml_ready": is_ml_ready()})
+
+
 # ============== API ENDPOINT-LƏRİ ==============
 
+def is_admin_request() -> bool:
+    """Sorğu düzgün admin tokeni ilə gəlibsə True (token təyin olunmayıbsa, həmişə False)."""
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+
+def admin_only(view):
+    """Endpoint-i yalnız admin tokeni ilə gələn sorğulara açır, qalanlarına 403."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Admin endpoint-ləri söndürülüb (TROLLEY_ADMIN_TOKEN təyin olunmayıb)."}), 403
+        if not is_admin_request():
+            return jsonify({"error": "İcazə yoxdur."}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
 @app.route('/decide', methods=['POST'])
 def decide():
     """
     Köhnə data modelinə əsasən qərar verən endpoint.
     """
     data = request.get_json()
-    print("Gələn data:", data)
 
     if not data:
         return jsonify({"error": "JSON body boşdur və ya yanlışdır."}), 400
@@ -63,15 +322,77 @@ def decide_v2():
     Yeni data modelinə əsasən qərar verən endpoint.
     Burada track1 və track2 şəxs obyektlərinin listi kimi gəlir.
     """
-    data = request.get_json()
-    print("V2 ssenari gəldi:", data)
+    with timing.stage("parse"):
+        data = request.get_json()
 
     if not data:
         return jsonify({"error": "JSON body boşdur və ya yanlışdır."}), 400
 
-    result = decide_scenario_v2(data)
+    try:
+        result = decide_scenario_v2_cached(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     result["received"] = data
-    return jsonify(result)
+    with timing.stage("serialize"):
+        return jsonify(result)
+
+
+@app.route('/decide_v2/batch', methods=['POST'])
+def decide_v2_batch():
+    """
+    Bir neçə V2 ssenarisini bir sorğuda qiymətləndirən endpoint.
+    Request formatı: ssenarilər listi və ya { "scenarios": [ ... ] }.
+    Hər ssenari /decide_v2 ilə eyni formatdadır (modlar qarışıq ola bilər).
+    ML modundakı ssenarilər modelə bir batch kimi göndərilir.
+    """
+    with timing.stage("parse"):
+        data = request.get_json(silent=True)
+
+    if isinstance(data, dict):
+        scenarios = data.get("scenarios")
+    else:
+        scenarios = data
+
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({"error": "Ssenarilər listi boşdur və ya yanlışdır."}), 400
+
+    if len(scenarios) > MAX_BATCH_SIZE:
+        return jsonify({
+            "error": f"Bir sorğuda ən çox {MAX_BATCH_SIZE} ssenari göndərilə bilər."
+        }), 400
+
+    if not all(isinstance(s, dict) for s in scenarios):
+        return jsonify({"error": "Hər ssenari JSON obyekt olmalıdır."}), 400
+
+    try:
+        results = decide_scenarios_v2(scenarios)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with timing.stage("serialize"):
+        return jsonify({
+            "count": len(results),
+            "results": results
+        })
+
+
+@app.route('/decide_v2/stream', methods=['POST'])
+def decide_v2_stream():
+    """
+    Çox böyük ssenari faylları üçün axın endpoint-i.
+    Request body NDJSON-dur (hər sətirdə /decide_v2 formatında bir ssenari),
+    cavab da NDJSON-dur: { "line": N, "result": {...} } və ya { "line": N, "error": "..." }.
+    Body hissə-hissə oxunur və kiçik batch-lərlə hesablanır, ona görə yaddaş
+    faylın ölçüsündən asılı olmadan sabit qalır. Xətalı sətirlər axını dayandırmır.
+    """
+    return Response(
+        stream_with_context(decide_ndjson(
+            request.stream,
+            decide_scenarios_v2,
+            decide_scenario_v2,
+            batch_size=STREAM_BATCH_SIZE
+        )),
+        mimetype="application/x-ndjson"
+    )
 
 
 @app.route('/compare', methods=['POST'])
@@ -85,59 +406,67 @@ def compare_decisions():
 
       "deon_variant": "protect_children" (optional),
       "custom_rules": { ... } (optional),
+      "custom_profile_id": "..." (optional – serverdəki profil, custom_rules-dan üstündür),
       "include_ml": true/false (optional, default true),
 
       "manual_choice": 1 və ya 2 (optional – istifadəçinin öz qərarı)
     }
     """
-    data = request.get_json() or {}
+    with timing.stage("parse"):
+        data = request.get_json() or {}
 
     track1 = data.get("track1", [])
     track2 = data.get("track2", [])
 
     deon_variant = data.get("deon_variant", "protect_children")
     custom_rules = data.get("custom_rules", {})
+    custom_profile_id = data.get("custom_profile_id")
     include_ml = data.get("include_ml", True)
 
     manual_choice = data.get("manual_choice", None)
 
-    results = {}
+    # Hər mod üçün ssenari; nəticələr decide_modes_v2 ilə cache-dən və ya
+    # bir ScenarioAnalysis əsasında (track-lər bir dəfə gəzilir) hesablanır
+    scenarios = {}
 
     # 1) Utilitarian
-    util_scenario = {
+    scenarios["utilitarian"] = {
         "track1": track1,
         "track2": track2,
         "mode": "utilitarian"
     }
-    results["utilitarian"] = decide_scenario_v2(util_scenario)
 
     # 2) Deontological
-    deon_scenario = {
+    scenarios["deontological"] = {
         "track1": track1,
         "track2": track2,
         "mode": "deontological",
         "deon_variant": deon_variant
     }
-    results["deontological"] = decide_scenario_v2(deon_scenario)
 
-    # 3) Custom (əgər qaydalar verilibsə)
-    if custom_rules:
-        custom_scenario = {
+    # 3) Custom (əgər qaydalar və ya profil verilibsə)
+    if custom_rules or custom_profile_id is not None:
+        scenarios["custom"] = {
             "track1": track1,
             "track2": track2,
             "mode": "custom",
             "custom_rules": custom_rules
         }
-        results["custom"] = decide_scenario_v2(custom_scenario)
+        if custom_profile_id is not None:
+            scenarios["custom"]["custom_profile_id"] = custom_profile_id
 
     # 4) ML v2
     if include_ml:
-        ml_scenario = {
+        scenarios["ml"] = {
             "track1": track1,
             "track2": track2,
             "mode": "ml"
         }
-        results["ml"] = decide_scenario_v2(ml_scenario)
+
+    try:
+        results = decide_modes_v2(track1, track2, scenarios)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # 5) Manual seçimi statistikaya əlavə edək (əgər göndərilibsə)
     manual_info = {
@@ -146,7 +475,7 @@ def compare_decisions():
     }
 
     if manual_choice in [1, 2]:
-        STATS["total_manual_decisions"] += 1
+        updates = {"total_manual_decisions": 1}
 
         any_agree = False
 
@@ -154,29 +483,193 @@ def compare_decisions():
             ai_choice = res.get("chosen_track")
             is_agree = (ai_choice == manual_choice)
             manual_info["agreements"][mode_name] = is_agree
+            updates[f"{mode_name}_decisions"] = 1
             if is_agree:
+                updates[f"{mode_name}_agreements"] = 1
                 any_agree = True
 
         if any_agree:
-            STATS["total_ai_agreements"] += 1
+            updates["total_ai_agreements"] = 1
 
-    # Ümumi uyğunluq faizi
-    if STATS["total_manual_decisions"] > 0:
-        agreement_rate = STATS["total_ai_agreements"] / STATS["total_manual_decisions"]
-    else:
-        agreement_rate = None
+        with timing.stage("stats"):
+            STATS.add(updates)
 
-    return jsonify({
-        "results": results,
-        "manual": manual_info,
-        "stats": {
-            "total_manual_decisions": STATS["total_manual_decisions"],
-            "total_ai_agreements": STATS["total_ai_agreements"],
-            "agreement_rate": agreement_rate
+        # Online learning aktivdirsə, seçim modelin növbəti yenilənməsi üçün yazılır
+        with timing.stage("feedback"):
+            record_feedback(track1, track2, manual_choice)
+
+    # Ümumi və mod üzrə uyğunluq faizi (bütün worker-lərin cəmi)
+    with timing.stage("stats"):
+        totals = STATS.snapshot()
+
+    def rate(agreements, decisions):
+        return agreements / decisions if decisions > 0 else None
+
+    per_mode = {
+        mode: {
+            "decisions": totals[f"{mode}_decisions"],
+            "agreements": totals[f"{mode}_agreements"],
+            "agreement_rate": rate(totals[f"{mode}_agreements"], totals[f"{mode}_decisions"])
         }
+        for mode in STATS_MODES
+    }
+
+    with timing.stage("serialize"):
+        return jsonify({
+            "results": results,
+            "manual": manual_info,
+            "stats": {
+                "total_manual_decisions": totals["total_manual_decisions"],
+                "total_ai_agreements": totals["total_ai_agreements"],
+                "agreement_rate": rate(
+                    totals["total_ai_agreements"], totals["total_manual_decisions"]
+                ),
+                "per_mode": per_mode
+            }
+        })
+
+
+# ============== CUSTOM QAYDA PROFİLLƏRİ ==============
+
+@app.route('/rule_profiles', methods=['POST'])
+@admin_only
+def rule_profile_save():
+    """
+    Custom qayda profilini serverdə saxlayır (eyni adla yenidən göndərmək onu yeniləyir; yalnız admin).
+    Request formatı: { "id": "...", "custom_rules": { ... }, "description": "..." (optional) }
+    Sonra ssenarilər custom_rules əvəzinə "custom_profile_id" göndərə bilər.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "JSON body boşdur və ya yanlışdır."}), 400
+
+    try:
+        profile = RULE_PROFILES.save(
+            data.get("id"),
+            data.get("custom_rules"),
+            description=data.get("description")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(profile), 201
+
+
+@app.route('/rule_profiles', methods=['GET'])
+def rule_profile_list():
+    """Saxlanılmış profillərin adları."""
+    return jsonify({"profiles": RULE_PROFILES.list_ids()})
+
+
+@app.route('/rule_profiles/<profile_id>', methods=['GET'])
+def rule_profile_get(profile_id):
+    """Bir profilin tam məzmunu."""
+    profile = RULE_PROFILES.get(profile_id)
+    if profile is None:
+        return jsonify({"error": f"Custom qayda profili tapılmadı: {profile_id}"}), 404
+    return jsonify(profile)
+
+
+# ============== METRİKALAR ==============
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Bütün worker-lərin metrikaları Prometheus mətn formatında."""
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/debug/recent_requests', methods=['GET'])
+@admin_only
+def recent_requests():
+    """
+    Bu worker-in son sorğuları (payload xülasəsi ilə) və loq növbəsinin vəziyyəti.
+    Yalnız admin: admin tokeni təyin olunmayıbsa, 403.
+    """
+    limit = request.args.get("limit", type=int)
+    return jsonify({
+        "pid": os.getpid(),
+        "requests": REQUEST_LOG.recent_requests(limit),
+        "log": REQUEST_LOG.stats()
     })
 
 
+@app.route('/debug/profiles', methods=['GET'])
+@admin_only
+def profile_list():
+    """Bu worker-də saxlanılan son sorğu profilləri (collapsed mətn olmadan)."""
+    return jsonify({"pid": os.getpid(), "profiles": PROFILES.list()})
+
+
+@app.route('/debug/profiles/<profile_id>', methods=['GET'])
+@admin_only
+def profile_get(profile_id):
+    """Bir sorğu profilinin collapsed stack mətni (flamegraph.pl, speedscope və s. üçün)."""
+    entry = PROFILES.get(profile_id)
+    if entry is None:
+        return jsonify({"error": "Profil tapılmadı (başqa worker-də ola bilər)."}), 404
+    return Response(entry["collapsed"], mimetype="text/plain")
+
+
+@app.route('/debug/profile/summary', methods=['GET'])
+@admin_only
+def profile_summary():
+    """
+    Aqreqat profilerin xülasəsi: ən çox vaxt aparan funksiyalar (self və inclusive).
+    ?format=collapsed – toplanmış stack-lər collapsed formatda; ?reset=1 – sayğacları sıfırla.
+    """
+    if request.args.get("format") == "collapsed":
+        body = AGGREGATE_PROFILER.collapsed()
+        if request.args.get("reset") == "1":
+            AGGREGATE_PROFILER.reset()
+        return Response(body, mimetype="text/plain")
+
+    summary = AGGREGATE_PROFILER.summary(top=request.args.get("top", 20, type=int))
+    if request.args.get("reset") == "1":
+        AGGREGATE_PROFILER.reset()
+    return jsonify({"pid": os.getpid(), **summary})
+
+
+# ============== CACHE VƏ MODEL İDARƏETMƏSİ ==============
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Qərar cache-inin hit/miss/eviction sayğacları."""
+    return jsonify(DECISION_CACHE.stats())
+
+
+@app.route('/cache/flush', methods=['POST'])
+@admin_only
+def cache_flush():
+    """Qərar cache-ini təmizləyir (yalnız admin)."""
+    DECISION_CACHE.clear()
+    return jsonify({"flushed": True, "stats": DECISION_CACHE.stats()})
+
+
+@app.route('/model/reload', methods=['POST'])
+@admin_only
+def model_reload():
+    """
+    ML modelini diskdən (reyestrin current versiyası və ya trolley_model_v2.pkl)
+    yenidən yükləyir. Yeni model smoke batch-dən keçmədikdə köhnə model qalır.
+    Yalnız admin: admin tokeni təyin olunmayıbsa, 403.
+    """
+    try:
+        ready = reload_ml_model()
+    except Exception as e:  # yararsız fayl / uğursuz smoke test – köhnə model qalır
+        return jsonify({"reloaded": False, "error": str(e), **model_status()}), 500
+    return jsonify({"reloaded": ready, **model_status()})
+
+
+@app.route('/model/status', methods=['GET'])
+def model_status_view():
+    """Cari model versiyası, mühərrik və reyestr izləyicisinin vəziyyəti."""
+    return jsonify(model_status())
+
+
+@app.route('/model/online', methods=['GET'])
+def model_online_status():
+    """Online learning vəziyyəti (bu worker üzrə): model versiyası, oxunmuş rəy sayı."""
+    return jsonify(online_learning_status())
+
 if __name__ == '__main__':
     # Lokal işlətmək üçün
     app.run(debug=True, port=5000)
@@ -0,0 +1,282 @@
+"""
+Qərar funksiyalarının mikrobenchmark-ları.
+
+Ölçülənlər (hər track ölçüsü üçün – default 1, 10, 1000, 100000 şəxs):
+  compute_track_loss, track_to_features_v2, decide_ml_v2,
+  decide_deontological[<variant>] (hər variant ayrıca),
+  compare[cache=off] və compare[cache=on] – Flask test client ilə tam /compare sorğusu
+
+Ssenarilər generate_trolley_data_v2.sample_persons ilə (datasetlə eyni paylanma)
+sabit toxumdan yaradılır. Hər nümunə bir neçə çağırışın ortalamasıdır – çağırış
+sayı nümunə ən azı ~1 ms çəkəcək qədər seçilir, faizlər (p50/p90/p99) nümunələr
+üzrədir.
+
+CLI:
+  python benchmark.py run --output bench.json
+  python benchmark.py run --sizes 1,10 --filter decide_deontological
+  python benchmark.py compare bench_old.json bench_new.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+import warnings
+
+import numpy as np
+
+try:
+    from . import ai_model
+    from . import generate_trolley_data_v2 as generator
+except ImportError:
+    import ai_model
+    import generate_trolley_data_v2 as generator
+
+DEFAULT_SIZES = (1, 10, 1000, 100_000)
+DEON_VARIANTS = ("non_intervention", "protect_children", "protect_innocent", "protect_vulnerable")
+
+# Bir nümunənin minimum müddəti – çox qısa çağırışlarda taymer xətası üstələməsin
+MIN_SAMPLE_SECONDS = 0.001
+
+# Bir track ölçüsü üçün benchmark-ların adları (build_cases sırası ilə)
+CASE_NAMES = (
+    "compute_track_loss",
+    "track_to_features_v2",
+    "decide_ml_v2",
+    *(f"decide_deontological[{variant}]" for variant in DEON_VARIANTS),
+    "compare[cache=off]",
+    "compare[cache=on]"
+)
+
+
+def make_track(rng: np.random.Generator, size: int) -> list[dict]:
+    """size şəxsdən ibarət track (API formatında: age, role, flags)."""
+    ages, roles, flags = generator.sample_persons(rng, size)
+    return [
+        {
+            "age": generator.AGE_TYPES[age],
+            "role": generator.ROLE_TYPES[role],
+            "flags": [generator.FLAG_TYPES[i] for i in np.flatnonzero(row)]
+        }
+        for age, role, row in zip(ages, roles, flags)
+    ]
+
+
+# ============== ÖLÇMƏ ==============
+
+def _calibrate(fn) -> int:
+    """Bir nümunənin ən azı MIN_SAMPLE_SECONDS çəkməsi üçün çağırış sayı."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_SECONDS:
+            return number
+        number *= 10 if elapsed < MIN_SAMPLE_SECONDS / 10 else 2
+
+
+def measure(fn, min_time: float = 0.5, max_samples: int = 1000) -> dict:
+    """
+    fn-i isidib min_time saniyə (ən azı 5 nümunə) ölçür.
+    Qaytarır: ops/sec, mean və faizlər (mikrosaniyə, bir çağırış üçün).
+    """
+    fn()  # isitmə
+    number = _calibrate(fn)
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_samples and (len(samples) < 5 or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter_ns() - start) / number / 1000)
+
+    per_call = np.array(samples)
+    return {
+        "ops_per_sec": 1e6 / per_call.mean(),
+        "mean_us": float(per_call.mean()),
+        "p50_us": float(np.percentile(per_call, 50)),
+        "p90_us": float(np.percentile(per_call, 90)),
+        "p99_us": float(np.percentile(per_call, 99)),
+        "min_us": float(per_call.min()),
+        "samples": len(samples),
+        "calls_per_sample": number
+    }
+
+
+# ============== BENCHMARK-LAR ==============
+
+def _compare_client():
+    try:
+        from .app import REQUEST_LOG, app
+    except ImportError:
+        from app import REQUEST_LOG, app
+    # Sorğu loqu (fon yazıcısının başladılması, hər çağırışa JSON sətir) ölçməyə düşməsin
+    REQUEST_LOG.enabled = False
+    return app.test_client()
+
+
+def build_cases(size: int, seed: int = 0, names=CASE_NAMES) -> dict:
+    """
+    {ad: funksiya} – bir track ölçüsü üçün names-dəki benchmark-lar.
+    Yalnız seçilmiş benchmark-ların hazırlığı aparılır (məs. Flask client və
+    /compare body-si yalnız compare üçün).
+    """
+    if not names:
+        return {}
+    rng = np.random.default_rng(seed + size)
+    track1 = make_track(rng, size)
+    track2 = make_track(rng, size)
+
+    cases = {
+        "compute_track_loss": lambda: ai_model.compute_track_loss(track1),
+        "track_to_features_v2": lambda: ai_model.track_to_features_v2("t1_", track1),
+        "decide_ml_v2": lambda: ai_model.decide_ml_v2(track1, track2),
+    }
+    if any(name.startswith("decide_deontological") for name in names):
+        t1_loss = ai_model.compute_track_loss(track1)
+        t2_loss = ai_model.compute_track_loss(track2)
+        for variant in DEON_VARIANTS:
+            cases[f"decide_deontological[{variant}]"] = (
+                lambda variant=variant: ai_model.decide_deontological(
+                    track1, track2, variant, t1_loss, t2_loss, len(track1), len(track2)
+                )
+            )
+    if any(name.startswith("compare") for name in names):
+        cases.update(_compare_cases(track1, track2))
+    return {name: cases[name] for name in names}
+
+
+def _compare_cases(track1: list, track2: list) -> dict:
+    client = _compare_client()
+    body = json.dumps({"track1": track1, "track2": track2, "deon_variant": "protect_children"})
+
+    def post_compare():
+        response = client.post("/compare", data=body, content_type="application/json")
+        if response.status_code != 200:
+            raise RuntimeError(f"/compare {response.status_code} qaytardı")
+
+    def compare_without_cache():
+        maxsize = ai_model.DECISION_CACHE.maxsize
+        ai_model.DECISION_CACHE.maxsize = 0
+        try:
+            post_compare()
+        finally:
+            ai_model.DECISION_CACHE.maxsize = maxsize
+
+    return {"compare[cache=off]": compare_without_cache, "compare[cache=on]": post_compare}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, name_filter: str | None = None,
+                   min_time: float = 0.5, seed: int = 0, log=print) -> dict:
+    """Bütün (və ya filter-ə uyğun) benchmark-ları işlədir, JSON-a yazıla bilən nəticə qaytarır."""
+    results = {}
+    with warnings.catch_warnings():
+        # sklearn feature adı xəbərdarlığı hər predict-də çıxır – ölçməni pozmasın
+        warnings.simplefilter("ignore", UserWarning)
+        ai_model.warm_up_ml_model()
+        for size in sizes:
+            # Filter hazırlıqdan əvvəl tətbiq olunur – seçilməyən ölçülər üçün track qurulmur
+            names = [
+                name for name in CASE_NAMES
+                if not name_filter or re.search(name_filter, f"{name}[size={size}]")
+            ]
+            for name, fn in build_cases(size, seed, names).items():
+                key = f"{name}[size={size}]"
+                results[key] = measure(fn, min_time=min_time)
+                log(f"{key:<55} {results[key]['ops_per_sec']:>14,.1f} ops/s  "
+                    f"p50 {results[key]['p50_us']:>12,.1f} us  p99 {results[key]['p99_us']:>12,.1f} us")
+
+    import sklearn
+
+    return {
+        "meta": {
+            "created_at": time.time(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ml_engine": ai_model.ML_ENGINE,
+            "model_version": ai_model.current_model_version(),
+            "sizes": list(sizes),
+            "min_time": min_time,
+            "seed": seed
+        },
+        "results": results
+    }
+
+
+def compare_results(old: dict, new: dict, threshold: float = 0.10,
+                    metric: str = "p50_us") -> list[dict]:
+    """
+    İki nəticə faylının ortaq benchmark-larını müqayisə edir.
+    metric (gecikmə) threshold-dan çox artıbsa, sətir regression sayılır.
+    """
+    rows = []
+    for key in sorted(old["results"].keys() & new["results"].keys()):
+        before = old["results"][key][metric]
+        after = new["results"][key][metric]
+        change = after / before - 1 if before else 0.0
+        rows.append({
+            "benchmark": key,
+            "old": before,
+            "new": after,
+            "change": change,
+            "regression": change > threshold
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qərar funksiyalarının mikrobenchmark-ları")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="benchmark-ları işlət")
+    run.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                     help="track ölçüləri (şəxs sayı), vergüllə")
+    run.add_argument("--filter", default=None, help="benchmark adı üçün regex")
+    run.add_argument("--min-time", type=float, default=0.5, help="hər benchmark üçün saniyə")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output", default=None, help="nəticələrin JSON faylı")
+
+    compare = sub.add_parser("compare", help="iki nəticə faylını müqayisə et")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=0.10,
+                         help="icazə verilən yavaşlama (0.10 = 10%%)")
+    compare.add_argument("--metric", default="p50_us", choices=["p50_us", "p90_us", "p99_us", "mean_us"])
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sizes = [int(size) for size in args.sizes.split(",")]
+        report = run_benchmarks(sizes, args.filter, args.min_time, args.seed)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Nəticələr {args.output} faylına yazıldı.")
+        return
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    rows = compare_results(old, new, args.threshold, args.metric)
+    for row in rows:
+        mark = "REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<55} {row['old']:>12,.1f} -> {row['new']:>12,.1f} us "
+              f"({row['change'] * 100:+6.1f}%) {mark}")
+
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(rows)} benchmark müqayisə edildi, {len(regressions)} regression "
+          f"(hədd: {args.threshold * 100:.0f}%, metrika: {args.metric}).")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Təlim datasetləri üçün kompakt, sütunlu binary format.
+
+Dataset bir qovluqdur:
+  features.npy – (n_rows, n_features) int8 matris, Fortran (sütun) sırası ilə
+  labels.npy   – (n_rows,) int8 hədəf sütunu
+  meta.json    – format versiyası, sütun adları (məs. ML_V2_HEADER), hədəf adı, sətir sayı
+
+.npy faylları np.load(mmap_mode="r") ilə kopyalanmadan (zero-copy) açılır –
+yalnız həqiqətən oxunan səhifələr diskdən yüklənir. CSV-dəki int64 sütunlarla
+müqayisədə disk və yaddaş ~8 dəfə, yükləmə vaxtı isə daha çox azalır.
+
+CLI:
+  python dataset_io.py convert trolley_data_v2.csv trolley_data_v2.npyd
+  python dataset_io.py info trolley_data_v2.npyd
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+FEATURES_FILE = "features.npy"
+LABELS_FILE = "labels.npy"
+META_FILE = "meta.json"
+
+DEFAULT_DTYPE = "int8"
+DEFAULT_LABEL = "chosen_track"
+
+# CSV-ni çevirərkən bir dəfəyə oxunan sətir sayı
+CSV_CHUNK_ROWS = 1_000_000
+
+
+def is_dataset_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def _check_range(values: np.ndarray, dtype: np.dtype, what: str) -> None:
+    info = np.iinfo(dtype)
+    if values.size and (values.min() < info.min or values.max() > info.max):
+        raise ValueError(f"{what} dəyərləri {dtype} diapazonuna sığmır.")
+
+
+class DatasetWriter:
+    """
+    Sətir sayı əvvəlcədən məlum olan dataseti hissə-hissə yazır.
+    features.npy və labels.npy open_memmap ilə yaradılır, write() növbəti
+    sətirləri doldurur, close() isə meta.json-u yazır (meta olmayan qovluq
+    yarımçıq sayılır).
+    """
+
+    def __init__(self, path: str, n_rows: int, header: list, label: str = DEFAULT_LABEL,
+                 dtype: str = DEFAULT_DTYPE):
+        self.path = path
+        self.n_rows = n_rows
+        self.header = list(header)
+        self.label = label
+        self.dtype = np.dtype(dtype)
+        self.offset = 0
+
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        self.features = np.lib.format.open_memmap(
+            os.path.join(path, FEATURES_FILE), mode="w+", dtype=self.dtype,
+            shape=(n_rows, len(self.header)), fortran_order=True
+        )
+        self.labels = np.lib.format.open_memmap(
+            os.path.join(path, LABELS_FILE), mode="w+", dtype=self.dtype, shape=(n_rows,)
+        )
+
+    def write(self, X, y) -> None:
+        X = np.asarray(X)
+        y = np.asarray(y)
+        end = self.offset + len(X)
+        if end > self.n_rows or len(y) != len(X):
+            raise ValueError("Sətir sayı gözləniləndən çoxdur və ya X/y uyğun gəlmir.")
+        _check_range(X, self.dtype, "Feature")
+        _check_range(y, self.dtype, "Hədəf")
+
+        self.features[self.offset:end] = X
+        self.labels[self.offset:end] = y
+        self.offset = end
+
+    def close(self, extra: dict | None = None) -> dict:
+        """meta.json-u yazır; extra (məs. generasiya statistikası) meta-ya əlavə olunur."""
+        if self.offset != self.n_rows:
+            raise ValueError(f"{self.n_rows} sətir gözlənilirdi, {self.offset} yazıldı.")
+
+        self.features.flush()
+        self.labels.flush()
+        del self.features, self.labels
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "n_rows": self.n_rows,
+            "header": self.header,
+            "label": self.label,
+            "dtype": self.dtype.name
+        }
+        if extra:
+            meta.update(extra)
+        tmp_path = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+        return meta
+
+
+def write_dataset(path: str, X, y, header: list, label: str = DEFAULT_LABEL,
+                  dtype: str = DEFAULT_DTYPE) -> dict:
+    """Yaddaşdakı (X, y)-ni dataset qovluğuna yazır."""
+    writer = DatasetWriter(path, len(X), header, label=label, dtype=dtype)
+    writer.write(X, y)
+    return writer.close()
+
+
+def load_dataset(path: str, mmap: bool = True):
+    """
+    Dataset qovluğunu açır. Qaytarır: (X, y, meta).
+    mmap=True olduqda X və y read-only np.memmap-dır (kopyalanmır).
+    """
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Dəstəklənməyən dataset versiyası: {meta.get('format_version')}")
+
+    mode = "r" if mmap else None
+    X = np.load(os.path.join(path, FEATURES_FILE), mmap_mode=mode)
+    y = np.load(os.path.join(path, LABELS_FILE), mmap_mode=mode)
+    if X.shape != (meta["n_rows"], len(meta["header"])) or y.shape != (meta["n_rows"],):
+        raise ValueError("Dataset faylları meta.json ilə uyğun gəlmir.")
+    return X, y, meta
+
+
+def load_training_data(path: str, label: str = DEFAULT_LABEL):
+    """
+    Təlim skriptləri üçün: dataset qovluğu və ya CSV faylı qəbul edir.
+    Qaytarır: (X, y, header). Qovluq üçün X/y memmap-dır, CSV üçün pandas ilə oxunur.
+    """
+    if os.path.isdir(path):
+        X, y, meta = load_dataset(path)
+        return X, y, meta["header"]
+
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    y = df[label].to_numpy()
+    X = df.drop(columns=[label])
+    return X.to_numpy(), y, list(X.columns)
+
+
+def count_csv_rows(csv_path: str) -> int:
+    """Başlıqdan sonrakı boş olmayan sətirlərin sayı (pandas boş sətirləri ötürür)."""
+    with open(csv_path, "rb") as f:
+        next(f, None)
+        return sum(1 for line in f if line.strip())
+
+
+def convert_csv(csv_path: str, out_dir: str, label: str = DEFAULT_LABEL,
+                dtype: str = DEFAULT_DTYPE, chunk_rows: int = CSV_CHUNK_ROWS) -> dict:
+    """
+    CSV faylını (məs. trolley_data_v2.csv) dataset qovluğuna çevirir.
+    CSV hissə-hissə oxunur, ona görə yaddaş faylın ölçüsündən asılı deyil.
+    """
+    import pandas as pd
+
+    n_rows = count_csv_rows(csv_path)
+    writer = None
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        if writer is None:
+            header = [col for col in chunk.columns if col != label]
+            writer = DatasetWriter(out_dir, n_rows, header, label=label, dtype=dtype)
+        writer.write(chunk[header].to_numpy(), chunk[label].to_numpy())
+
+    if writer is None:
+        header = [col for col in pd.read_csv(csv_path, nrows=0).columns if col != label]
+        writer = DatasetWriter(out_dir, 0, header, label=label, dtype=dtype)
+    return writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trolley dataset formatı üçün alətlər")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="CSV-ni dataset qovluğuna çevir")
+    convert.add_argument("csv_path")
+    convert.add_argument("out_dir")
+    convert.add_argument("--label", default=DEFAULT_LABEL)
+    convert.add_argument("--dtype", default=DEFAULT_DTYPE)
+
+    info = sub.add_parser("info", help="dataset qovluğu haqqında məlumat")
+    info.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        meta = convert_csv(args.csv_path, args.out_dir, label=args.label, dtype=args.dtype)
+        print(f"{meta['n_rows']} sətir {args.out_dir} qovluğuna yazıldı.")
+    else:
+        X, y, meta = load_dataset(args.path)
+        size = sum(
+            os.path.getsize(os.path.join(args.path, name))
+            for name in (FEATURES_FILE, LABELS_FILE, META_FILE)
+        )
+        print(f"Sətir: {meta['n_rows']}, feature: {len(meta['header'])}, "
+              f"dtype: {meta['dtype']}, ölçü: {size / 1e6:.1f} MB")
+        print(f"Hədəf ({meta['label']}) paylanması: "
+              f"{dict(zip(*[a.tolist() for a in np.unique(y, return_counts=True)]))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+decide_scenario_v2 nəticələri üçün məhdud ölçülü LRU/TTL cache.
+
+Açar ssenarinin kanonik formasıdır: hər track şəxslərin multiset-i kimi
+(age, role, sıralanmış flag-lar) götürülür, ona görə şəxslərin sırası açara
+təsir etmir. Mod, deon_variant və custom qaydaların hash-i də açara daxildir.
+Simmetrik modlarda track-ləri yerini dəyişmiş ssenari saxlanmış nəticəni
+güzgüləməklə (mirror_result) cavablandırıla bilər.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Track-lərin yeri dəyişdikdə nəticəsi (reason mətni daxil) güzgülənə bilən
+# deontoloji variantlar. protect_innocent qərar baxımından simmetrikdir, amma
+# Track 1 və Track 2 üçün reason mətnləri fərqli yazılıb, ona görə daxil deyil.
+SYMMETRIC_DEON_VARIANTS = ("protect_children", "protect_vulnerable")
+
+_TRACK_LABEL_RE = re.compile(r"Track ([12])")
+
+
+class DecisionCache:
+    """
+    Thread-safe LRU cache, hər yazının yaşama müddəti (ttl, saniyə) var.
+    maxsize <= 0 olduqda cache söndürülmüş sayılır.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.mirrored_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key):
+        """Açar üzrə dəyəri qaytarır (yoxdursa və ya vaxtı keçibsə None). Sayğacları dəyişmir."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at < self._clock():
+                del self._data[key]
+                self.expirations += 1
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def record(self, hit: bool, mirrored: bool = False) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+                if mirrored:
+                    self.mirrored_hits += 1
+            else:
+                self.misses += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def discard_where(self, predicate) -> int:
+        """predicate(key) True olan yazıları silir; silinənlərin sayını qaytarır."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "mirrored_hits": self.mirrored_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else None
+            }
+
+
+def _person_key(person: dict) -> tuple:
+    flags = person.get("flags") or ()
+    try:
+        flags = tuple(sorted(flags))
+    except TypeError:
+        # Qarışıq tipli flag-lar – sabit sıra üçün repr ilə sıralayırıq
+        flags = tuple(sorted(flags, key=repr))
+    return (person.get("age"), person.get("role"), flags)
+
+
+def canonical_track(track: list) -> frozenset:
+    """Track-i şəxslərin sırasından asılı olmayan multiset-ə çevirir: {(şəxs açarı, say)}."""
+    return frozenset(Counter(_person_key(p) for p in track).items())
+
+
+def rules_hash(custom_rules) -> str:
+    """Custom qaydaların məzmun hash-i (açarların sırası nəzərə alınmır)."""
+    payload = json.dumps(custom_rules, sort_keys=True, default=repr)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def mode_key(scenario: dict) -> tuple:
+    """
+    Ssenarinin qərara təsir edən mod parametrləri (custom və ml modlarının
+    açarını çağıran qurur – birləşdirilmiş qaydaların hash-i, model versiyası).
+    """
+    mode = scenario.get("mode", "utilitarian")
+    if mode == "deontological":
+        return (mode, scenario.get("deon_variant", "non_intervention"))
+    return (mode,)
+
+
+def is_symmetric_mode(key: tuple) -> bool:
+    """Track-lərin yeri dəyişdikdə qərarın da güzgülənən olduğu modlar."""
+    mode = key[0]
+    if mode in ("utilitarian", "custom"):
+        return True
+    return mode == "deontological" and key[1] in SYMMETRIC_DEON_VARIANTS
+
+
+def is_mirror_safe(key: tuple, result: dict) -> bool:
+    """
+    Nəticə güzgülənə bilərmi? Simmetrik modlarda yalnız hər şey bərabər olanda
+    "default olaraq Track 1" seçilir – belə nəticələri güzgüləmək olmaz.
+    """
+    if not is_symmetric_mode(key):
+        return False
+    losses_differ = result["track1_loss"] != result["track2_loss"]
+    if key[0] == "deontological":
+        return losses_differ
+    return losses_differ or result["track1_count"] != result["track2_count"]
+
+
+def mirror_result(result: dict) -> dict:
+    """Track 1 və Track 2-nin yerini dəyişmiş ssenari üçün nəticəni güzgüləyir."""
+    mirrored = dict(result)
+    mirrored["chosen_track"] = 3 - result["chosen_track"]
+    mirrored["track1_count"] = result["track2_count"]
+    mirrored["track2_count"] = result["track1_count"]
+    mirrored["track1_loss"] = result["track2_loss"]
+    mirrored["track2_loss"] = result["track1_loss"]
+    mirrored["reason"] = _TRACK_LABEL_RE.sub(
+        lambda m: "Track 2" if m.group(1) == "1" else "Track 1",
+        result["reason"]
+    )
+    return mirrored
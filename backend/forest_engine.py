@@ -0,0 +1,163 @@
+"""
+RandomForest modelini sklearn-dən asılı olmayan, düz NumPy massivlərinə
+çevirən "compiled" inference mühərriki.
+
+export_forest(model) fit olunmuş meşəni (RandomForestClassifier,
+ExtraTreesClassifier və ya tək DecisionTreeClassifier) bir neçə düz
+massivə yığır:
+  feature, threshold, left, right – bütün ağacların node-ları ardıcıl
+  value – hər node üçün sinif ehtimalları (yalnız leaf-lər istifadə olunur)
+  roots – hər ağacın kök node-unun indeksi
+
+CompiledForest.predict isə bütün ağacları bir sətir və ya batch üçün
+vektorlaşdırılmış şəkildə gəzir. Nəticələr model.predict ilə eynidir:
+- giriş sklearn kimi float32-yə çevrilir (müqayisə X <= threshold)
+- ağacların ehtimalları estimators_ sırası ilə ardıcıl toplanır
+- ən böyük ehtimal bərabər olduqda ilk sinif seçilir (np.argmax)
+"""
+import numpy as np
+
+# Bir dəfəyə gəzilən maksimum sətir sayı – (N, n_trees) massivləri üçün yaddaşı məhdudlaşdırır
+DEFAULT_CHUNK_ROWS = 2048
+
+
+class CompiledForest:
+    """
+    Düz node massivləri üzərində işləyən meşə qiymətləndiricisi.
+    sklearn modeli ilə eyni predict / predict_proba interfeysini verir.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.n_trees = len(roots)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Hər sətir və hər ağac üçün çatılan leaf node-un indeksini qaytarır: (N, n_trees)."""
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+
+        # Leaf-lər özünə istinad edir, ona görə max_depth addımdan sonra hamı leaf-dədir
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _proba_chunk(self, X: np.ndarray) -> np.ndarray:
+        leaf_values = self.value[self._leaves(X)]  # (N, n_trees, n_classes)
+        # cumsum ardıcıl toplayır – sklearn-in ağac-ağac "+=" toplaması ilə eyni yuvarlaqlaşdırma
+        proba = np.cumsum(leaf_values, axis=1)[:, -1, :]
+        proba /= self.n_trees
+        return proba
+
+    def predict_proba(self, X, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X {X.shape[1]} feature-ə malikdir, model isə {self.n_features_in_} gözləyir."
+            )
+
+        if X.shape[0] <= chunk_rows:
+            return self._proba_chunk(X)
+        return np.concatenate([
+            self._proba_chunk(X[start:start + chunk_rows])
+            for start in range(0, X.shape[0], chunk_rows)
+        ])
+
+    def predict(self, X, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        proba = self.predict_proba(X, chunk_rows=chunk_rows)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+
+def export_forest(model) -> CompiledForest:
+    """
+    Fit olunmuş ağac modelini CompiledForest-ə çevirir.
+    Yalnız tək çıxışlı (n_outputs_ == 1) təsnifat modelləri dəstəklənir.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        estimators = [model]
+
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Yalnız tək çıxışlı modellər dəstəklənir.")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+
+    for est in estimators:
+        tree = est.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(offset, offset + n_nodes, dtype=np.intp)
+        is_leaf = tree.children_left == -1
+
+        # Leaf-lər özünə istinad edir (left = right = özü), feature 0 isə sadəcə yer tutandır
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+        # DecisionTreeClassifier.predict_proba ilə eyni: value[:, 0, :n_classes], sonra
+        # həmişə cəmə bölünür (sklearn < 1.4 value-da say saxlayır; >= 1.4-də də bölmə
+        # cəmi dəqiq 1 olmayan sətirləri dəyişə bilər – nəticə bit-bit eyni qalmalıdır)
+        value = tree.value[:, 0, :est.n_classes_].astype(np.float64)
+        sums = value.sum(axis=1, keepdims=True)
+        sums[sums == 0.0] = 1.0
+        values.append(value / sums)
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.intp),
+        max_depth=max_depth,
+        classes=np.asarray(model.classes_),
+        n_features=model.n_features_in_
+    )
+
+
+def count_mismatches(model, compiled: CompiledForest, X) -> int:
+    """sklearn modeli ilə compiled mühərrikin fərqli proqnoz verdiyi sətirlərin sayı."""
+    X = np.asarray(X)
+    return int(np.sum(model.predict(X) != compiled.predict(X)))
+
+
+def main():
+    import os
+    import joblib
+    import pandas as pd
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    model = joblib.load(os.path.join(base_dir, "trolley_model_v2.pkl"))
+    compiled = export_forest(model)
+
+    df = pd.read_csv(os.path.join(base_dir, "trolley_data_v2.csv"))
+    X = df.drop(columns=["chosen_track"]).to_numpy()
+
+    rng = np.random.default_rng(0)
+    X_random = rng.integers(0, 6, size=(20000, X.shape[1]))
+
+    print(f"Ağac sayı: {compiled.n_trees}, node sayı: {len(compiled.feature)}, "
+          f"maksimum dərinlik: {compiled.max_depth}")
+    print(f"Dataset üzrə fərqlər: {count_mismatches(model, compiled, X)} / {len(X)}")
+    print(f"Random sətirlər üzrə fərqlər: {count_mismatches(model, compiled, X_random)} / {len(X_random)}")
+
+
+if __name__ == "__main__":
+    main()
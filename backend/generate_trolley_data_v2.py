@@ -1,8 +1,21 @@
+import argparse
 import csv
+import hashlib
+import io
+import json
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 
-# Eyni nəticələri almaq üçün sabit toxum
-random.seed(42)
+import numpy as np
+
+try:
+    from .dataset_io import DatasetWriter
+except ImportError:
+    from dataset_io import DatasetWriter
+
+# Eyni nəticələri almaq üçün default toxum (main-də tətbiq olunur)
+DEFAULT_SEED = 42
 
 # Yaş, rol və flag tipləri
 AGE_TYPES = ["child", "teen", "adult", "elder"]
@@ -292,10 +305,491 @@ def generate_scenario_row():
     return row
 
 
-def main():
-    num_rows = 200  # istəsən 100, 300 və s. edə bilərsən
+# ============== VEKTORLAŞDIRILMIŞ GENERASİYA (numpy.random.Generator) ==============
+#
+# random_person / generate_scenario_row ilə eyni paylanma, amma milyonlarla şəxs
+# bir dəfəyə massivlər kimi seçilir. Ardıcıllıq (random modulu) fərqli olduğu üçün
+# sətirlər eyni deyil, paylanma isə eynidir.
+
+AGE_PROBS = np.array([2, 2, 4, 2], dtype=np.float64) / 10
+ROLE_PROBS = np.array([2, 1, 2, 1, 2, 2, 1, 1, 1, 1, 1], dtype=np.float64) / 15
+
+AGE_W = np.array([AGE_WEIGHTS[a] for a in AGE_TYPES], dtype=np.int64)
+ROLE_W = np.array([ROLE_WEIGHTS[r] for r in ROLE_TYPES], dtype=np.int64)
+FLAG_W = np.array([FLAG_WEIGHTS[f] for f in FLAG_TYPES], dtype=np.int64)
+
+ROLE_IDX = {r: i for i, r in enumerate(ROLE_TYPES)}
+FLAG_IDX = {f: i for i, f in enumerate(FLAG_TYPES)}
+
+# Bir track-in 25 sütunu: 4 yaş, 11 rol, 10 flag (HEADER sırası ilə)
+TRACK_COLS = len(AGE_TYPES) + len(ROLE_TYPES) + len(FLAG_TYPES)
+ROLE_OFFSET = len(AGE_TYPES)
+FLAG_OFFSET = ROLE_OFFSET + len(ROLE_TYPES)
+
+# Bir dəfəyə yaradılan sətir sayı – yaddaşı məhdudlaşdırır
+DEFAULT_CHUNK_ROWS = 200_000
+
+
+def sample_persons(rng: np.random.Generator, n: int):
+    """
+    n şəxs üçün (ages, roles, flags) massivlərini qaytarır:
+    ages, roles – indekslər (AGE_TYPES / ROLE_TYPES), flags – (n, 10) bool matris.
+    Qaydalar random_person ilə eynidir.
+    """
+    ages = rng.choice(len(AGE_TYPES), size=n, p=AGE_PROBS)
+    roles = rng.choice(len(ROLE_TYPES), size=n, p=ROLE_PROBS)
+    u_innocent, u_disabled, u_relation = rng.random((3, n))
+
+    pregnant_role = roles == ROLE_IDX["pregnant_role"]
+    saves_lives = (roles == ROLE_IDX["doctor"]) | (roles == ROLE_IDX["nurse"])
+    guilty = roles == ROLE_IDX["criminal"]
+    disabled = u_disabled < 0.15
+
+    flags = np.zeros((n, len(FLAG_TYPES)), dtype=bool)
+    flags[:, FLAG_IDX["pregnant"]] = pregnant_role
+    flags[:, FLAG_IDX["vulnerable"]] = pregnant_role | disabled
+    flags[:, FLAG_IDX["saves_lives"]] = saves_lives
+    # Rola görə günahsız + günahkar olmayanların 70%-i
+    flags[:, FLAG_IDX["innocent"]] = (
+        saves_lives | (roles == ROLE_IDX["teacher"]) | (~guilty & (u_innocent < 0.7))
+    )
+    flags[:, FLAG_IDX["guilty"]] = guilty
+    flags[:, FLAG_IDX["law_breaker"]] = guilty | (roles == ROLE_IDX["thief"])
+    flags[:, FLAG_IDX["disabled"]] = disabled
+    flags[:, FLAG_IDX["relative"]] = u_relation < 0.1
+    flags[:, FLAG_IDX["friend"]] = (u_relation >= 0.1) & (u_relation < 0.2)
+    flags[:, FLAG_IDX["stranger"]] = u_relation >= 0.2
+
+    return ages, roles, flags
+
+
+# int8 feature sütununa sığan maksimum say (bir track-dəki şəxs sayı)
+INT8_MAX = np.iinfo(np.int8).max
+
+
+def generate_rows_vectorized(rng: np.random.Generator, num_rows: int,
+                             min_people: int = 1, max_people: int = 5):
+    """
+    num_rows ssenari yaradır. Qaytarır: (X, y)
+    X – (num_rows, 50) int8 feature matrisi (HEADER sırası ilə), y – chosen_track (int8).
+    Bir sütunun sayı max_people-dan böyük ola bilməz, ona görə max_people int8-ə sığmalıdır.
+    """
+    if not 0 <= min_people <= max_people <= INT8_MAX:
+        raise ValueError(
+            f"0 <= min_people <= max_people <= {INT8_MAX} olmalıdır "
+            f"(feature-lər int8 saxlanılır): {min_people}, {max_people}"
+        )
+    sizes = rng.integers(min_people, max_people + 1, size=(num_rows, 2))
+    track_ids = np.repeat(np.arange(num_rows * 2), sizes.ravel())
+    ages, roles, flags = sample_persons(rng, len(track_ids))
+
+    # Hər şəxsin dəyəri: yaş + rol + flag-lar (compute_person_value)
+    values = AGE_W[ages] + ROLE_W[roles] + flags.astype(np.int64) @ FLAG_W
+    losses = np.bincount(track_ids, weights=values, minlength=num_rows * 2)
+    losses = np.rint(losses).astype(np.int64).reshape(num_rows, 2)
+
+    # Feature-lər: (track, sütun) cütlərinin sayı
+    flag_person, flag_col = np.nonzero(flags)
+    cells = np.concatenate([
+        track_ids * TRACK_COLS + ages,
+        track_ids * TRACK_COLS + ROLE_OFFSET + roles,
+        track_ids[flag_person] * TRACK_COLS + FLAG_OFFSET + flag_col
+    ])
+    X = np.bincount(cells, minlength=num_rows * 2 * TRACK_COLS)
+    X = X.astype(np.int8).reshape(num_rows, 2 * TRACK_COLS)
+
+    # Qərar: az itki qurban verilir, bərabərdirsə az adam, o da bərabərdirsə random
+    t1_loss, t2_loss = losses[:, 0], losses[:, 1]
+    n1, n2 = sizes[:, 0], sizes[:, 1]
+    coin = rng.integers(1, 3, size=num_rows)
+    y = np.where(
+        t1_loss != t2_loss,
+        np.where(t1_loss < t2_loss, 1, 2),
+        np.where(n1 != n2, np.where(n1 < n2, 1, 2), coin)
+    ).astype(np.int8)
+
+    return X, y
+
+
+def format_csv_rows(X: np.ndarray, y: np.ndarray) -> bytes:
+    """
+    (X, y) sətirlərini CSV baytlarına çevirir. Bütün dəyərlər 0–9 olduqda
+    (bu generatorda həmişə belədir) baytlar birbaşa massivdən yığılır –
+    np.savetxt-dən on dəfələrlə sürətli, nəticə isə eynidir.
+    """
+    rows = np.column_stack([X, y])
+    if rows.size and (rows.min() < 0 or rows.max() > 9):
+        buffer = io.BytesIO()
+        np.savetxt(buffer, rows, fmt="%d", delimiter=",")
+        return buffer.getvalue()
+
+    out = np.empty((rows.shape[0], 2 * rows.shape[1]), dtype=np.uint8)
+    out[:, 0::2] = rows + ord("0")
+    out[:, 1::2] = ord(",")
+    out[:, -1] = ord("\n")
+    return out.tobytes()
+
+
+# ============== DEDUP VƏ SİMMETRİK AUGMENTASİYA ==============
+#
+# Ssenari sətirləri 64 bitlik hash ilə müqayisə olunur:
+#   exact     – eyni feature vektoru təkrar yazılmır
+#   canonical – track-ların yeri dəyişdirilmiş (güzgü) ssenari də eyni sayılır
+# Görülmüş hash-lar çeşidlənmiş uint64 "run"-larda saxlanılır (LSM kimi birləşdirilir):
+# hər unikal ssenari üçün 8 bayt, yoxlama searchsorted ilə.
+#
+# Güzgü sətri: t1/t2 sütun blokları yer dəyişir, hədəf 3 - y olur. Hər iki track-i
+# eyni olan ssenarinin güzgüsü özüdür (hədəfi isə əksi) – belə sətrin güzgüsü yazılmır.
+
+DEDUP_MODES = ("none", "exact", "canonical")
+
+# Güzgü sətrinin sütun sırası: əvvəl t2 bloku, sonra t1 bloku
+MIRROR_COLUMNS = np.r_[TRACK_COLS:2 * TRACK_COLS, 0:TRACK_COLS]
+
+_HASH_MULT = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MIX = np.uint64(0xBF58476D1CE4E5B9)
+
+
+def mirror_rows(X: np.ndarray, y: np.ndarray):
+    """Track-ların yeri dəyişdirilmiş sətirlər: (X[:, MIRROR_COLUMNS], 3 - y)."""
+    return X[:, MIRROR_COLUMNS], (3 - y).astype(y.dtype)
+
+
+def augment_mirrored(X: np.ndarray, y: np.ndarray, dedup: "ScenarioDeduplicator | None" = None):
+    """
+    Sətirlərə güzgülərini əlavə edir (simmetrik ssenarilər xaric).
+    dedup verilibsə, güzgülər də onun görülmüş dəstindən keçir – təkrar sətir yazılmır.
+    """
+    X_mirror, y_mirror = mirror_rows(X, y)
+    asymmetric = np.any(X_mirror != X, axis=1)
+    X_mirror, y_mirror = X_mirror[asymmetric], y_mirror[asymmetric]
+    if dedup is not None:
+        X_mirror, y_mirror = dedup.filter_augmented(X_mirror, y_mirror)
+    return np.concatenate([X, X_mirror]), np.concatenate([y, y_mirror])
+
+
+def scenario_hashes(X: np.ndarray) -> np.ndarray:
+    """Hər sətrin baytlarından 64 bitlik hash (uint64)."""
+    X = np.ascontiguousarray(X, dtype=np.int8)
+    pad = -X.shape[1] % 8
+    if pad:
+        X = np.pad(X, ((0, 0), (0, pad)))
+    words = X.view(np.uint64)
+
+    h = np.zeros(len(X), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(words.shape[1]):
+            h = (h ^ words[:, i]) * _HASH_MULT
+            h ^= h >> np.uint64(29)
+        h = (h ^ (h >> np.uint64(32))) * _HASH_MIX
+    return h ^ (h >> np.uint64(31))
+
+
+def canonical_hashes(X: np.ndarray) -> np.ndarray:
+    """Ssenari və onun güzgüsü üçün eyni olan hash: min(hash(X), hash(güzgü))."""
+    return np.minimum(scenario_hashes(X), scenario_hashes(X[:, MIRROR_COLUMNS]))
+
+
+class ScenarioDeduplicator:
+    """
+    Generasiya boyunca görülmüş ssenariləri yadda saxlayır və filter() ilə
+    yalnız yenilərini (hissə daxilində ilk rast gəlinəni) buraxır.
+    """
+
+    def __init__(self, mode: str = "none"):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Naməlum dedup rejimi: {mode}")
+        self.mode = mode
+        self.generated = 0
+        self.unique = 0
+        self._runs = []  # çeşidlənmiş, kəsişməyən uint64 massivləri
+
+    def _seen(self, keys: np.ndarray) -> np.ndarray:
+        seen = np.zeros(len(keys), dtype=bool)
+        for run in self._runs:
+            pos = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            seen |= run[pos] == keys
+        return seen
+
+    def _add(self, keys: np.ndarray) -> None:
+        self._runs.append(np.sort(keys))
+        # Kiçik run-lar böyüklərə birləşdirilir – run sayı loqarifmik qalır
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            last = self._runs.pop()
+            self._runs[-1] = np.sort(np.concatenate([self._runs[-1], last]))
+
+    def _new_rows(self, X: np.ndarray) -> np.ndarray:
+        """Görülməmiş sətirlərin indeksləri (hissə daxilində ilk rast gəlinən); dəstə əlavə edir."""
+        keys = canonical_hashes(X) if self.mode == "canonical" else scenario_hashes(X)
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        new = first[~self._seen(keys[first])]
+        if len(new):
+            self._add(keys[new])
+        return new
+
+    def filter(self, X: np.ndarray, y: np.ndarray):
+        self.generated += len(y)
+        if self.mode == "none":
+            self.unique += len(y)
+            return X, y
+
+        new = self._new_rows(X)
+        self.unique += len(new)
+        return X[new], y[new]
+
+    def filter_augmented(self, X: np.ndarray, y: np.ndarray):
+        """
+        Augmentasiya sətirlərini (güzgüləri) də görülmüş dəstə salır: exact rejimdə
+        güzgü əvvəl yaradılmış sətirlə üst-üstə düşə bilər. Statistikaya daxil deyil.
+        canonical rejimdə güzgü öz orijinalının sinfindədir – ayrıca yoxlanılmır.
+        """
+        if self.mode != "exact":
+            return X, y
+        new = self._new_rows(X)
+        return X[new], y[new]
+
+    def stats(self) -> dict:
+        return {
+            "dedup": self.mode,
+            "generated_rows": self.generated,
+            "unique_rows": self.unique if self.mode != "none" else None,
+            "unique_ratio": (
+                self.unique / self.generated if self.mode != "none" and self.generated else None
+            )
+        }
+
+
+def iter_rows_vectorized(rng: np.random.Generator, num_rows: int,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                         dedup: ScenarioDeduplicator | None = None, augment: bool = False):
+    """
+    Cəmi düz num_rows sətir verən (X, y) hissələri. Dedup olduqda təkrarlar atılır
+    və çatışmayan sətirlər yenidən yaradılır; augment=True olduqda hər hissəyə
+    güzgü sətirləri əlavə olunur (dedup-dan sonra, ona görə canonical rejimdə də
+    güzgülər qalır; exact rejimdə güzgülər də görülmüş dəstə salınır).
+    """
+    plain = (dedup is None or dedup.mode == "none") and not augment
+    produced = 0
+    while produced < num_rows:
+        remaining = num_rows - produced
+        # Sadə rejimdə hissə ölçüləri əvvəlki kimidir – eyni toxumla eyni fayl alınır
+        X, y = generate_rows_vectorized(rng, min(chunk_rows, remaining) if plain else chunk_rows)
+        if dedup is not None:
+            X, y = dedup.filter(X, y)
+            if not len(y):
+                raise ValueError("Yeni unikal ssenari tapılmadı – ssenari fəzası tükənib.")
+        if augment:
+            X, y = augment_mirrored(X, y, dedup)
+
+        X, y = X[:remaining], y[:remaining]
+        produced += len(y)
+        yield X, y
+
+
+def generation_stats(dedup: ScenarioDeduplicator, augment: bool, num_rows: int) -> dict:
+    stats = dedup.stats()
+    stats["augment"] = "mirror" if augment else None
+    stats["rows"] = num_rows
+    return stats
+
+
+def write_rows_vectorized(f, rng: np.random.Generator, num_rows: int,
+                          chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                          dedup: str = "none", augment: bool = False) -> dict:
+    """
+    Binary rejimdə açılmış fayla başlıq və num_rows sətir yazır (hissə-hissə).
+    Generasiya statistikasını (unikal ssenari nisbəti və s.) qaytarır.
+    """
+    deduplicator = ScenarioDeduplicator(dedup)
+    f.write((",".join(HEADER) + "\n").encode("utf-8"))
+    for X, y in iter_rows_vectorized(rng, num_rows, chunk_rows, deduplicator, augment):
+        f.write(format_csv_rows(X, y))
+    return generation_stats(deduplicator, augment, num_rows)
+
+
+def write_csv_vectorized(path: str, num_rows: int, seed: int = DEFAULT_SEED,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                         dedup: str = "none", augment: bool = False) -> dict:
+    """Vektorlaşdırılmış rejimdə CSV yazır (hissə-hissə, yaddaş sabit qalır)."""
+    with open(path, "wb") as f:
+        return write_rows_vectorized(
+            f, np.random.default_rng(seed), num_rows, chunk_rows, dedup=dedup, augment=augment
+        )
+
+
+def write_dataset_vectorized(path: str, num_rows: int, seed: int = DEFAULT_SEED,
+                             chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                             rng: np.random.Generator | None = None,
+                             dedup: str = "none", augment: bool = False) -> dict:
+    """
+    Vektorlaşdırılmış rejimdə sütunlu binary dataset qovluğu yazır (dataset_io formatı).
+    Eyni toxumla CSV rejimi ilə eyni sətirlər alınır. Generasiya statistikası
+    meta.json-un "generation" sahəsinə yazılır.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
+    deduplicator = ScenarioDeduplicator(dedup)
+    writer = DatasetWriter(path, num_rows, HEADER[:-1], label=HEADER[-1])
+    for X, y in iter_rows_vectorized(rng, num_rows, chunk_rows, deduplicator, augment):
+        writer.write(X, y)
+    return writer.close(extra={"generation": generation_stats(deduplicator, augment, num_rows)})
+
+
+def measure_unique_ratio(num_rows: int, seed: int = DEFAULT_SEED,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS) -> list[dict]:
+    """
+    num_rows ssenari yaradır (heç nə yazmadan) və exact / canonical unikal
+    nisbətini 10-un qüvvətlərində və sonda qaytarır – dataset ölçüsünü seçmək üçün.
+    """
+    rng = np.random.default_rng(seed)
+    exact = ScenarioDeduplicator("exact")
+    canonical = ScenarioDeduplicator("canonical")
+    checkpoints = [10 ** k for k in range(3, 13) if 10 ** k < num_rows] + [num_rows]
+    report = []
+
+    for checkpoint in checkpoints:
+        while exact.generated < checkpoint:
+            X, y = generate_rows_vectorized(rng, min(chunk_rows, checkpoint - exact.generated))
+            exact.filter(X, y)
+            canonical.filter(X, y)
+        report.append({
+            "rows": checkpoint,
+            "exact_unique_ratio": exact.stats()["unique_ratio"],
+            "canonical_unique_ratio": canonical.stats()["unique_ratio"]
+        })
+    return report
+
+
+# ============== PARALEL SHARD-LI GENERASİYA ==============
+#
+# Sətirlər shard-lara bölünür, hər shard ayrıca prosesdə öz faylına yazılır.
+# Shard-ın toxumu master toxumdan SeedSequence.spawn ilə alınır, ona görə
+# nəticə yalnız (master toxum, shard sayı, sətir sayı)-dan asılıdır – worker
+# sayından və prosesslərin bitmə sırasından asılı deyil (bit-bit təkrarlanır).
+
+MANIFEST_NAME = "manifest.json"
+
+
+def shard_row_counts(num_rows: int, num_shards: int) -> list[int]:
+    """Sətirləri shard-lara mümkün qədər bərabər bölür (ilk shard-lar 1 artıq ala bilər)."""
+    base, extra = divmod(num_rows, num_shards)
+    return [base + (1 if i < extra else 0) for i in range(num_shards)]
+
+
+def _shard_files(path: str) -> list[str]:
+    """Shard-ın faylları: CSV üçün özü, dataset qovluğu üçün içindəki fayllar (sabit sıra ilə)."""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    return [path]
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    for file_path in _shard_files(path):
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_shard(task) -> dict:
+    """Bir shard-ı yazır (worker prosesində işləyir) və manifest qeydini qaytarır."""
+    index, path, num_rows, seed_seq, chunk_rows, fmt, dedup, augment = task
+    rng = np.random.default_rng(seed_seq)
+    if fmt == "npy":
+        meta = write_dataset_vectorized(
+            path, num_rows, chunk_rows=chunk_rows, rng=rng, dedup=dedup, augment=augment
+        )
+        stats = meta["generation"]
+    else:
+        with open(path, "wb") as f:
+            stats = write_rows_vectorized(f, rng, num_rows, chunk_rows, dedup=dedup, augment=augment)
+
+    return {
+        "index": index,
+        "file": os.path.basename(path),
+        "rows": num_rows,
+        "bytes": sum(os.path.getsize(p) for p in _shard_files(path)),
+        "sha256": _sha256_file(path),
+        "spawn_key": list(seed_seq.spawn_key),
+        "generation": stats
+    }
 
-    with open("trolley_data_v2.csv", "w", newline="", encoding="utf-8") as f:
+
+def write_sharded(output_dir: str, num_rows: int, num_shards: int,
+                  seed: int = DEFAULT_SEED, workers: int | None = None,
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS, fmt: str = "csv",
+                  dedup: str = "none", augment: bool = False) -> dict:
+    """
+    num_rows sətri num_shards fayla bölərək proses pool-unda yaradır.
+    output_dir-ə shard-NNNNN.csv faylları (fmt="npy" olduqda shard-NNNNN dataset
+    qovluqları) və manifest.json yazılır; manifest qaytarılır.
+    Dedup hər shard daxilində aparılır – shard-lar arası təkrarlar qala bilər.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    suffix = ".csv" if fmt == "csv" else ""
+    seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    tasks = [
+        (i, os.path.join(output_dir, f"shard-{i:05d}{suffix}"), rows, seeds[i], chunk_rows, fmt,
+         dedup, augment)
+        for i, rows in enumerate(shard_row_counts(num_rows, num_shards))
+    ]
+
+    workers = min(workers or os.cpu_count() or 1, num_shards)
+    if workers == 1:
+        shards = [_write_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_write_shard, tasks))
+
+    manifest = {
+        "format": fmt,
+        "header": HEADER,
+        "master_seed": seed,
+        "num_shards": num_shards,
+        "total_rows": sum(s["rows"] for s in shards),
+        "dedup": dedup,
+        "augment": "mirror" if augment else None,
+        "unique_ratio": _overall_unique_ratio(shards),
+        "shards": shards
+    }
+
+    # Manifest sonda, atomik yazılır – o varsa, bütün shard-lar tamdır
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def _overall_unique_ratio(shards: list[dict]) -> float | None:
+    generated = sum(shard["generation"]["generated_rows"] for shard in shards)
+    unique = [shard["generation"]["unique_rows"] for shard in shards]
+    if not generated or None in unique:
+        return None
+    return sum(unique) / generated
+
+
+def verify_sharded(output_dir: str) -> list[str]:
+    """Manifestə görə shard fayllarını yoxlayır; uyğun gəlməyən faylların adlarını qaytarır."""
+    with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    return [
+        shard["file"]
+        for shard in manifest["shards"]
+        if _sha256_file(os.path.join(output_dir, shard["file"])) != shard["sha256"]
+    ]
+
+
+def write_csv(path: str, num_rows: int, seed: int = DEFAULT_SEED) -> None:
+    """Köhnə (sətir-sətir, random modulu ilə) rejimdə CSV yazır."""
+    random.seed(seed)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(HEADER)
 
@@ -303,7 +797,102 @@ def main():
             row = generate_scenario_row()
             writer.writerow(row)
 
-    print(f"{num_rows} sətirlik trolley_data_v2.csv yaradıldı.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Trolley v2 dataset generatoru")
+    parser.add_argument("--rows", type=int, default=200, help="sətir sayı")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="random toxum")
+    parser.add_argument(
+        "--output", default=None,
+        help="çıxış yolu (default: trolley_data_v2.csv və ya npy üçün trolley_data_v2.npyd)"
+    )
+    parser.add_argument(
+        "--vectorized", action="store_true",
+        help="numpy.random.Generator ilə vektorlaşdırılmış generasiya (böyük datasetlər üçün)"
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+        help="vektorlaşdırılmış rejimdə bir dəfəyə yaradılan sətir sayı"
+    )
+    parser.add_argument(
+        "--format", choices=["csv", "npy"], default="csv",
+        help="çıxış formatı: csv və ya sütunlu binary dataset qovluğu (vektorlaşdırılmış rejim)"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=0,
+        help="sətirləri bu qədər shard fayla bölüb paralel yarat (vektorlaşdırılmış rejim)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="shard rejimində proses sayı (default: CPU sayı)"
+    )
+    parser.add_argument(
+        "--output-dir", default="trolley_data_v2_shards",
+        help="shard rejimində faylların qovluğu"
+    )
+    parser.add_argument(
+        "--dedup", choices=list(DEDUP_MODES), default="none",
+        help="təkrar ssenariləri at: exact – eyni sətir, canonical – güzgüsü də eyni sayılır"
+    )
+    parser.add_argument(
+        "--augment-mirror", action="store_true",
+        help="hər ssenarinin güzgüsünü (t1/t2 yer dəyişir, hədəf 3 - y) də yaz"
+    )
+    parser.add_argument(
+        "--unique-report", action="store_true",
+        help="--rows ssenari üzrə unikal nisbəti ölç və çıx (fayl yazılmır)"
+    )
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="--output-dir-dəki shard-ları manifestə görə yoxla və çıx"
+    )
+    args = parser.parse_args()
+
+    if args.verify:
+        bad = verify_sharded(args.output_dir)
+        print("Bütün shard-lar manifestə uyğundur." if not bad else f"Uyğun gəlməyən shard-lar: {bad}")
+        return
+
+    if args.unique_report:
+        for point in measure_unique_ratio(args.rows, seed=args.seed, chunk_rows=args.chunk_rows):
+            print(f"{point['rows']:>14} sətir: exact {point['exact_unique_ratio'] * 100:6.2f}%, "
+                  f"canonical {point['canonical_unique_ratio'] * 100:6.2f}%")
+        return
+
+    if args.shards > 0:
+        manifest = write_sharded(
+            args.output_dir, args.rows, args.shards,
+            seed=args.seed, workers=args.workers, chunk_rows=args.chunk_rows,
+            fmt=args.format, dedup=args.dedup, augment=args.augment_mirror
+        )
+        print(f"{manifest['total_rows']} sətir {args.shards} shard-a yazıldı: {args.output_dir}")
+        if manifest["unique_ratio"] is not None:
+            print(f"Unikal ssenari nisbəti: {manifest['unique_ratio'] * 100:.2f}%")
+        return
+
+    if args.output is None:
+        args.output = "trolley_data_v2.npyd" if args.format == "npy" else "trolley_data_v2.csv"
+
+    stats = None
+    options = {"dedup": args.dedup, "augment": args.augment_mirror}
+    if args.format == "npy":
+        # Binary format yalnız vektorlaşdırılmış rejimdə yazılır
+        meta = write_dataset_vectorized(
+            args.output, args.rows, seed=args.seed, chunk_rows=args.chunk_rows, **options
+        )
+        stats = meta["generation"]
+    elif args.vectorized or args.dedup != "none" or args.augment_mirror:
+        # Dedup və augmentasiya yalnız vektorlaşdırılmış rejimdə mövcuddur
+        stats = write_csv_vectorized(
+            args.output, args.rows, seed=args.seed, chunk_rows=args.chunk_rows, **options
+        )
+    else:
+        write_csv(args.output, args.rows, seed=args.seed)
+
+    print(f"{args.rows} sətirlik {args.output} yaradıldı.")
+    if stats and stats["unique_ratio"] is not None:
+        print(f"Unikal ssenari nisbəti: {stats['unique_ratio'] * 100:.2f}% "
+              f"({stats['unique_rows']} / {stats['generated_rows']} yaradılmış ssenari)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+ML v2 modu üçün dəqiq, qapalı formalı xətti qiymətləndirici ("linear" mühərrik).
+
+generate_trolley_data_v2 etiketləri belə qoyur: hər track-in itkisi
+(yaş + rol + flag ağırlıqlarının cəmi) ML_V2_HEADER-dəki saylar üzrə xəttidir,
+az itkili track qurban verilir, bərabərlikdə az adamlı track, tam bərabərlikdə
+isə təsadüfi seçim. Bu qayda bir tam ədəd skalyar hasili ilə ifadə olunur:
+
+  score = K * (loss1 - loss2) + (n1 - n2)
+  score < 0 -> Track 1,  score > 0 -> Track 2,  score == 0 -> Track 1
+
+(n – track-dəki adam sayı = yaş sütunlarının cəmi; K adam sayı fərqindən
+böyük olmalıdır). Meşə bu funksiyanı yalnız təxmini öyrənir, burada isə
+proqnoz bir np.dot-dur.
+
+CLI – generatorla və meşə ilə böyük nümunədə müqayisə:
+  python linear_engine.py --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+try:
+    from . import generate_trolley_data_v2 as generator
+except ImportError:
+    import generate_trolley_data_v2 as generator
+
+# Adam sayı fərqinin maksimumu – itki fərqi onu həmişə üstələyir
+TIE_BREAK_SCALE = 1 << 24
+
+_AGE_KEYS = set(generator.AGE_TYPES)
+_ROLE_KEYS = set(generator.ROLE_TYPES)
+
+
+def _column_terms(name: str) -> tuple[int, int]:
+    """Bir track sütunu üçün (itki ağırlığı, adam sayına töhfə)."""
+    if name.endswith("_flag"):
+        return generator.FLAG_WEIGHTS.get(name[:-len("_flag")], 0), 0
+    if name in _AGE_KEYS:
+        # Hər şəxs tam bir yaş sütununda sayılır – adam sayı yaş sütunlarının cəmidir
+        return generator.AGE_WEIGHTS[name], 1
+    if name in _ROLE_KEYS:
+        return generator.ROLE_WEIGHTS[name], 0
+    raise ValueError(f"Naməlum sütun: {name}")
+
+
+class LinearScorer:
+    """
+    score = X @ coef; score > 0 olduqda Track 2, əks halda Track 1.
+    sklearn modeli kimi predict / classes_ / n_features_in_ interfeysi verir.
+    """
+
+    def __init__(self, coef: np.ndarray):
+        self.coef = coef
+        self.classes_ = np.array([1, 2])
+        self.n_features_in_ = len(coef)
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.int64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        return X @ self.coef
+
+    def predict(self, X) -> np.ndarray:
+        return np.where(self.decision_function(X) > 0, 2, 1)
+
+
+def derive_linear_scorer(header: list[str], scale: int = TIE_BREAK_SCALE) -> LinearScorer:
+    """
+    Generatorun ağırlıq cədvəllərindən header (ML_V2_HEADER) üçün tam ədəd əmsalları qurur:
+    t1_ sütunları +, t2_ sütunları − işarəsi ilə.
+    """
+    coef = np.zeros(len(header), dtype=np.int64)
+    for i, column in enumerate(header):
+        if column.startswith("t1_"):
+            sign = 1
+        elif column.startswith("t2_"):
+            sign = -1
+        else:
+            raise ValueError(f"Sütun t1_/t2_ ilə başlamalıdır: {column}")
+        weight, person = _column_terms(column[3:])
+        coef[i] = sign * (scale * weight + person)
+    return LinearScorer(coef)
+
+
+def count_disagreements(scorer: LinearScorer, model, X) -> int:
+    """Xətti qiymətləndirici ilə model (məs. meşə) arasındakı fərqli proqnozların sayı."""
+    return int(np.sum(scorer.predict(X) != np.asarray(model.predict(X))))
+
+
+def main():
+    import os
+    import warnings
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Xətti mühərriki generator və meşə ilə yoxla")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    header = generator.HEADER[:-1]
+    scorer = derive_linear_scorer(header)
+    X, y = generator.generate_rows_vectorized(np.random.default_rng(args.seed), args.rows)
+    X = X.astype(np.int64)
+
+    start = time.perf_counter()
+    pred = scorer.predict(X)
+    linear_seconds = time.perf_counter() - start
+
+    # Generatorla fərq yalnız tam bərabərlikdə (təsadüfi seçim) ola bilər
+    ties = scorer.decision_function(X) == 0
+    mismatch = pred != y
+    print(f"Sətir: {args.rows}, xətti predict: {linear_seconds * 1000:.1f} ms")
+    print(f"Generatorla fərq: {mismatch.sum()} (hamısı tam bərabərlikdə: "
+          f"{bool(np.all(ties[mismatch]))}, bərabərlik sayı: {ties.sum()})")
+
+    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trolley_model_v2.pkl")
+    if os.path.exists(model_path):
+        model = joblib.load(model_path)
+        sample = X[:min(len(X), 200_000)]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            start = time.perf_counter()
+            forest_pred = model.predict(sample)
+            forest_seconds = time.perf_counter() - start
+        disagreements = int(np.sum(forest_pred != pred[:len(sample)]))
+        forest_errors = int(np.sum(forest_pred != y[:len(sample)]))
+        print(f"Meşə ilə fərq: {disagreements} / {len(sample)} "
+              f"({disagreements / len(sample) * 100:.2f}%), "
+              f"meşənin generatordan fərqi: {forest_errors}, "
+              f"meşə predict: {forest_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Prometheus mətn formatında metrikalar (/metrics).
+
+Bütün sayğaclar və histogram bucket-ləri shared_stats.SharedCounters üzərindədir:
+hər gunicorn worker-i paylaşılan fayldakı öz slotuna yazır, /metrics isə
+bütün slotların cəmini göstərir – hansı worker cavab versə də nəticə eynidir.
+Yazma proseslərarası kilidsizdir (yalnız prosesin lokal kilidi), histogram
+müşahidəsi bir bisect və üç int64 artımıdır.
+
+Histogramlar bucket-ləri kumulyativ olmayan sayğaclar kimi saxlayır (+Inf daxil),
+cəmi isə tam ədəd kimi (saniyələr mikrosaniyəyə çevrilir); kumulyativ "le"
+sıraları yalnız render zamanı qurulur.
+
+Etiket dəyərləri əvvəlcədən məlum dəstlərdir (route-lar, modlar, deontoloji
+variantlar) – sayğac cədvəli sabit ölçülüdür; tanınmayan dəyərlər "other"-ə düşür.
+Paylaşılan fayl ilk müşahidədə, statistika sayğacları ilə eyni şəxsi qovluqda
+(shared_stats.stats_directory, 0700) metrics.bin adı ilə açılır və eyni
+yoxlamalardan keçir (O_NOFOLLOW, sahib və 0600 icazələri); server dayananda
+qovluqla birlikdə silinir. TROLLEY_METRICS_FILE ilə sabit yol verilə bilər.
+"""
+import bisect
+import os
+import threading
+from itertools import product
+
+try:
+    from .shared_stats import SharedCounters, default_stats_path
+except ImportError:
+    from shared_stats import SharedCounters, default_stats_path
+
+# Ölçülən route-lar (request.url_rule.rule); qalanları "other"
+ROUTES = (
+    "/decide", "/decide_v2", "/decide_v2/batch", "/decide_v2/stream",
+    "/compare", "/metrics", "other"
+)
+STATUS_CLASSES = ("2xx", "3xx", "4xx", "5xx")
+
+DEON_VARIANTS = ("non_intervention", "protect_children", "protect_innocent", "protect_vulnerable")
+DECISION_LABELS = (
+    [("utilitarian", "")]
+    + [("deontological", variant) for variant in DEON_VARIANTS]
+    + [("deontological", "other"), ("custom", ""), ("ml", ""), ("other", "")]
+)
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+TRACK_LENGTH_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 1000, 10_000, 100_000)
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class _Metric:
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str,
+                 label_names: tuple, label_values: list[tuple]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.label_values = label_values or [()]
+        self.fallback = self.label_values[-1]
+
+    def _labels(self, values: tuple) -> dict:
+        return dict(zip(self.label_names, values))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, registry, name, help_text, label_names=(), label_values=None):
+        super().__init__(registry, name, help_text, label_names, label_values)
+        self.columns = {values: registry.allocate(1) for values in self.label_values}
+
+    def inc(self, labels: tuple = (), n: int = 1) -> None:
+        column = self.columns.get(labels, self.columns[self.fallback])
+        self.registry.add([(column, n)])
+
+    def render(self, totals) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self._labels(values))} {int(totals[column])}"
+            for values, column in self.columns.items()
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Hər etiket dəsti üçün sütunlar: len(buckets) + 1 bucket (+Inf), sum, count.
+    scale – sum-un tam ədəd kimi saxlanması üçün vuruq (saniyə üçün 1e6).
+    """
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, buckets, label_names=(), label_values=None,
+                 scale: float = 1):
+        super().__init__(registry, name, help_text, label_names, label_values)
+        self.buckets = tuple(buckets)
+        self.scale = scale
+        width = len(self.buckets) + 3
+        self.columns = {values: registry.allocate(width) for values in self.label_values}
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        base = self.columns.get(labels, self.columns[self.fallback])
+        n_buckets = len(self.buckets) + 1
+        self.registry.add([
+            (base + bisect.bisect_left(self.buckets, value), 1),
+            (base + n_buckets, int(round(value * self.scale))),
+            (base + n_buckets + 1, 1)
+        ])
+
+    def render(self, totals) -> list[str]:
+        lines = []
+        n_buckets = len(self.buckets) + 1
+        for values, base in self.columns.items():
+            labels = self._labels(values)
+            cumulative = 0
+            for i, bound in enumerate(self.buckets + ("+Inf",)):
+                cumulative += int(totals[base + i])
+                le = bound if bound == "+Inf" else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            total = totals[base + n_buckets] / self.scale
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {int(totals[base + n_buckets + 1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrikaların sütunlarını paylayır və ortaq SharedCounters cədvəlinə yazır."""
+
+    def __init__(self, path: str | None = None, slots: int = 64):
+        self.path = path
+        self.slots = slots
+        self.metrics = []
+        self.width = 0
+        self._counters = None
+        self._lock = threading.Lock()
+
+    def allocate(self, width: int) -> int:
+        if self._counters is not None:
+            raise RuntimeError("Metrikalar cədvəl açıldıqdan sonra əlavə edilə bilməz.")
+        start = self.width
+        self.width += width
+        return start
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(self, *args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(self, *args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def _table(self) -> SharedCounters:
+        if self._counters is None:
+            with self._lock:
+                if self._counters is None:
+                    # Sütun adları yalnız layout yoxlaması üçündür; fayl /tmp-də
+                    # proqnozlaşdırıla bilən ad ilə deyil, deployment qovluğunda yaranır
+                    names = [f"c{i}" for i in range(self.width)]
+                    self._counters = SharedCounters(
+                        names, path=self.path or default_stats_path("metrics"), slots=self.slots
+                    )
+        return self._counters
+
+    def add(self, updates) -> None:
+        self._table().add_indexed(updates)
+
+    def render(self) -> str:
+        totals = self._table().totals()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(totals))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(slots=int(os.environ.get("TROLLEY_STATS_SLOTS", "64")))
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "trolley_http_requests_total", "HTTP sorğularının sayı (route və status sinfi üzrə).",
+    ("route", "status"), list(product(ROUTES, STATUS_CLASSES))
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "trolley_http_request_duration_seconds", "Sorğunun emal müddəti (route üzrə).",
+    LATENCY_BUCKETS, ("route",), [(route,) for route in ROUTES], scale=1e6
+)
+DECISION_LATENCY = REGISTRY.histogram(
+    "trolley_decision_duration_seconds",
+    "Bir qərarın hesablanma müddəti (mod və deontoloji variant üzrə; cache hit-lər daxil deyil).",
+    LATENCY_BUCKETS, ("mode", "variant"), DECISION_LABELS, scale=1e6
+)
+DECISION_BATCH_SIZE = REGISTRY.histogram(
+    "trolley_decision_batch_size", "decide_scenarios_v2 batch-lərinin ölçüsü (batch və stream).",
+    SIZE_BUCKETS
+)
+TRACK_LENGTH = REGISTRY.histogram(
+    "trolley_track_length", "Qiymətləndirilən track-lərdəki şəxs sayı.", TRACK_LENGTH_BUCKETS
+)
+PREDICT_LATENCY = REGISTRY.histogram(
+    "trolley_model_predict_duration_seconds", "ML modelinin predict çağırışının müddəti.",
+    LATENCY_BUCKETS, scale=1e6
+)
+PREDICT_BATCH_SIZE = REGISTRY.histogram(
+    "trolley_model_predict_batch_size", "Bir predict çağırışındakı sətir sayı.", SIZE_BUCKETS
+)
+MODEL_LOAD = REGISTRY.histogram(
+    "trolley_model_load_duration_seconds", "ML modelinin diskdən yüklənmə (və kompilyasiya) müddəti.",
+    LATENCY_BUCKETS, scale=1e6
+)
+ML_BATCH_SIZE = REGISTRY.histogram(
+    "trolley_ml_batch_size", "MicroBatcher-in bir predict-də birləşdirdiyi sətir sayı.", SIZE_BUCKETS
+)
+ML_BATCH_QUEUE_WAIT = REGISTRY.histogram(
+    "trolley_ml_batch_queue_wait_seconds", "Sətrin MicroBatcher növbəsində predict-ə qədər gözləməsi.",
+    LATENCY_BUCKETS, scale=1e6
+)
+ML_BATCH_FLUSHES = REGISTRY.counter(
+    "trolley_ml_batch_flushes_total", "MicroBatcher flush-larının sayı (batch doldu / deadline keçdi).",
+    ("reason",), [("full",), ("deadline",)]
+)
+
+
+def route_label(rule: str | None) -> str:
+    return rule if rule in ROUTES else "other"
+
+
+_DECISION_MODES = ("utilitarian", "custom", "ml")
+
+
+def decision_labels(scenario: dict) -> tuple:
+    """(mode, variant) etiketləri; tanınmayan (və ya hash olunmayan) dəyərlər "other"."""
+    mode = scenario.get("mode", "utilitarian")
+    if mode == "deontological":
+        variant = scenario.get("deon_variant", "non_intervention")
+        return (mode, variant if isinstance(variant, str) and variant in DEON_VARIANTS else "other")
+    return (mode, "") if isinstance(mode, str) and mode in _DECISION_MODES else ("other", "")
+
+
+def status_class(status_code: int) -> str:
+    return f"{min(max(status_code // 100, 2), 5)}xx"
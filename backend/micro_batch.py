@@ -0,0 +1,116 @@
+"""
+Paralel ML sorğularının sətirlərini bir predict çağırışında birləşdirən dispetçer.
+
+Thread-li gunicorn worker-lərində (--threads) eyni anda gələn /decide_v2 və
+/compare sorğularının hər biri ML modunda bir sətirlik predict çağırır, halbuki
+64 sətirlik predict 1 sətirlikdən demək olar ki, baha deyil. MicroBatcher
+sətirləri növbəyə yığır və batch dolduqda (max_batch) və ya ilk sətirdən
+max_wait saniyə keçdikdə hamısını bir predict ilə hesablayır; hər çağıran
+yalnız öz nəticəsini alır.
+
+Ayrıca dispetçer thread-i yoxdur (fork-dan sonra başlatmaq lazım deyil): boş
+batch-ə ilk düşən çağıran "lider" olur, deadline-a və ya batch dolana qədər
+gözləyir və predict-i öz thread-ində işlədir; qalanları nəticəni gözləyir.
+Batch-lər predict edən funksiyanın açarı (model handle-ı) üzrə ayrılır –
+model dəyişdirilərkən iki versiyanın sətirləri qarışmır.
+
+Metrikalar: batch ölçüsü, sətrin növbədə gözləmə müddəti və flush səbəbi
+(full / deadline) – deadline-ı tənzimləmək üçün.
+"""
+import threading
+import time
+
+import numpy as np
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+
+class _Batch:
+    __slots__ = ("key", "rows", "full", "done", "started", "results", "error")
+
+    def __init__(self, key):
+        self.key = key
+        self.rows = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.started = None
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    predict_fn(key, matrix) -> nəticələr massivi; submit(key, row) bir sətrin nəticəsini qaytarır.
+    max_batch <= 1 və ya max_wait <= 0 olduqda hər sətir dərhal (gözləmədən) hesablanır.
+    """
+
+    def __init__(self, predict_fn, max_batch: int = 64, max_wait: float = 0.002):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.rows = 0
+        self.full_flushes = 0
+
+    def submit(self, key, row: np.ndarray):
+        enqueued = time.perf_counter()
+        with self._lock:
+            batch = self._pending
+            leader = batch is None or batch.key is not key
+            if leader:
+                batch = _Batch(key)
+                self._pending = batch
+            index = len(batch.rows)
+            batch.rows.append(row)
+            if len(batch.rows) >= self.max_batch:
+                self._pending = None
+                batch.full.set()
+
+        if leader:
+            if self.max_wait > 0:
+                batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            self._flush(batch)
+        else:
+            batch.done.wait()
+
+        metrics.ML_BATCH_QUEUE_WAIT.observe(batch.started - enqueued)
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _flush(self, batch: _Batch) -> None:
+        # Lider lock-u buraxıb; gecikən sətirlər artıq yeni batch-ə düşür
+        batch.started = time.perf_counter()
+        reason = "full" if batch.full.is_set() else "deadline"
+        try:
+            batch.results = self.predict_fn(batch.key, np.vstack(batch.rows))
+        except Exception as e:  # xəta batch-dəki bütün çağıranlara ötürülür
+            batch.error = e
+        finally:
+            batch.done.set()
+
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch.rows)
+            self.full_flushes += reason == "full"
+        metrics.ML_BATCH_SIZE.observe(len(batch.rows))
+        metrics.ML_BATCH_FLUSHES.inc((reason,))
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "full_flushes": self.full_flushes
+        }
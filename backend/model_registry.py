@@ -0,0 +1,224 @@
+"""
+Versiyalı ML v2 model reyestri.
+
+Qovluq strukturu:
+  <registry>/manifest.json               – {"current": "<versiya>", "versions": {...}}
+  <registry>/versions/<versiya>/model.pkl
+
+Hər versiya üçün manifestdə sha256, fayl ölçüsü, n_features və yaradılma vaxtı
+saxlanılır. Fayllar əvvəlcə müvəqqəti adla yazılır, sonra os.replace ilə yerinə
+qoyulur, manifest də eyni qayda ilə – yarımçıq yazılmış fayl heç vaxt "current"
+olmur, yükləmə zamanı isə sha256 yoxlanılır. Manifesti dəyişən əməliyyatlar
+(publish, activate, prune) <registry>/manifest.lock üzərində flock altında
+oxu-dəyiş-yaz edir – online learning lideri və CLI eyni anda işləsə də
+yeniləmələr itmir.
+
+CLI:
+  python model_registry.py publish trolley_model_v2.pkl --activate
+  python model_registry.py activate <versiya>
+  python model_registry.py list
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:  # Windows – manifest kilidsiz yenilənir
+    fcntl = None
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "manifest.lock"
+MODEL_FILE = "model.pkl"
+
+# Versiya adı qovluq adı kimi istifadə olunur: yalnız hərf, rəqəm, ".", "_", "-",
+# nöqtə ilə başlamır (".." və gizli fayllar keçmir)
+_VERSION_RE = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+
+
+def default_registry_dir() -> str:
+    return os.environ.get(
+        "TROLLEY_MODEL_REGISTRY",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_registry")
+    )
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versiyalı model artefaktları və manifest üzərində əməliyyatlar."""
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory or default_registry_dir()
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        self.lock_path = os.path.join(self.directory, LOCK_NAME)
+
+    @contextmanager
+    def _locked(self):
+        """Manifestin oxu-dəyiş-yaz əməliyyatları üçün eksklüziv kilid (proseslər arası)."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # kilid deskriptorla birlikdə azad olur
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.manifest_path)
+
+    def manifest(self) -> dict:
+        if not self.exists():
+            return {"current": None, "versions": {}}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def manifest_mtime(self) -> int | None:
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def current_version(self) -> str | None:
+        return self.manifest().get("current")
+
+    def model_path(self, version: str) -> str:
+        return os.path.join(self.directory, "versions", version, MODEL_FILE)
+
+    def publish(self, source_path: str, version: str | None = None,
+                activate: bool = False) -> str:
+        """
+        Model faylını reyestrə yeni versiya kimi köçürür (atomik) və versiyanı qaytarır.
+        activate=True olduqda versiya dərhal "current" edilir.
+        """
+        model = joblib.load(source_path)  # yararsız faylı reyestrə buraxmırıq
+
+        if version is None:
+            version = time.strftime("%Y%m%d-%H%M%S") + "-" + _sha256_file(source_path)[:8]
+        if not _VERSION_RE.fullmatch(version):
+            raise ValueError(f"Yanlış versiya adı: {version}")
+
+        target = self.model_path(version)
+        with self._locked():
+            if os.path.exists(target):
+                raise ValueError(f"Versiya artıq mövcuddur: {version}")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            shutil.copyfile(source_path, tmp_path)
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+
+            manifest = self.manifest()
+            manifest["versions"][version] = {
+                "file": os.path.relpath(target, self.directory),
+                "sha256": _sha256_file(target),
+                "bytes": os.path.getsize(target),
+                "n_features": int(getattr(model, "n_features_in_", 0)),
+                "model_type": type(model).__name__,
+                "created_at": time.time()
+            }
+            if activate or manifest.get("current") is None:
+                manifest["current"] = version
+            _write_json_atomic(self.manifest_path, manifest)
+        return version
+
+    def activate(self, version: str) -> None:
+        with self._locked():
+            manifest = self.manifest()
+            if version not in manifest["versions"]:
+                raise ValueError(f"Versiya tapılmadı: {version}")
+            manifest["current"] = version
+            _write_json_atomic(self.manifest_path, manifest)
+
+    def prune(self, keep: int, prefix: str = "") -> list[str]:
+        """
+        prefix ilə başlayan versiyalardan ən yeni keep dənəsini saxlayır, qalanlarını
+        (current xaric) manifestdən və diskdən silir. Silinən versiyaları qaytarır.
+        """
+        with self._locked():
+            manifest = self.manifest()
+            candidates = sorted(
+                (v for v in manifest["versions"] if v.startswith(prefix) and v != manifest.get("current")),
+                key=lambda v: manifest["versions"][v]["created_at"]
+            )
+            removed = candidates[:max(len(candidates) - keep, 0)]
+            if not removed:
+                return []
+
+            for version in removed:
+                del manifest["versions"][version]
+            _write_json_atomic(self.manifest_path, manifest)
+            for version in removed:
+                shutil.rmtree(os.path.dirname(self.model_path(version)), ignore_errors=True)
+        return removed
+
+    def load(self, version: str):
+        """Versiyanı yükləyir; sha256 manifestə uyğun gəlmədikdə ValueError."""
+        entry = self.manifest()["versions"].get(version)
+        if entry is None:
+            raise ValueError(f"Versiya tapılmadı: {version}")
+
+        path = os.path.join(self.directory, entry["file"])
+        if _sha256_file(path) != entry["sha256"]:
+            raise ValueError(f"{version} versiyasının sha256-sı manifestə uyğun gəlmir.")
+        return joblib.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ML v2 model reyestri")
+    parser.add_argument("--registry", default=None, help="reyestr qovluğu")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    publish = sub.add_parser("publish", help="model faylını yeni versiya kimi əlavə et")
+    publish.add_argument("path")
+    publish.add_argument("--version", default=None)
+    publish.add_argument("--activate", action="store_true")
+
+    activate = sub.add_parser("activate", help="versiyanı current et")
+    activate.add_argument("version")
+
+    sub.add_parser("list", help="versiyaları göstər")
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.registry)
+
+    if args.command == "publish":
+        version = registry.publish(args.path, version=args.version, activate=args.activate)
+        print(f"Versiya əlavə olundu: {version} (current: {registry.current_version()})")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Current versiya: {args.version}")
+    else:
+        manifest = registry.manifest()
+        for version, entry in sorted(manifest["versions"].items()):
+            mark = "*" if version == manifest.get("current") else " "
+            print(f"{mark} {version}  {entry['model_type']}  {entry['bytes'] / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
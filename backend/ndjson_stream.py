@@ -0,0 +1,145 @@
+"""
+Böyük ssenari fayllarını NDJSON (hər sətirdə bir JSON obyekt) kimi axınla
+emal etmək üçün köməkçilər.
+
+Giriş request.stream-dən hissə-hissə oxunur, sətirlər kiçik batch-lərə
+yığılıb decide_scenarios_v2 ilə qiymətləndirilir və nəticələr dərhal
+NDJSON sətirləri kimi geri yazılır. Yaddaşda eyni anda ən çox bir oxuma
+hissəsi və bir batch saxlanılır – faylın ölçüsündən asılı deyil.
+
+Hər çıxış sətri giriş sətrinin nömrəsini (1-dən başlayaraq) daşıyır:
+  {"line": 1, "result": {...}}
+  {"line": 2, "error": "..."}
+Boş sətirlər ötürülür, xətalı sətirlər axını dayandırmır.
+"""
+import json
+
+# request.stream-dən bir dəfəyə oxunan bayt sayı
+DEFAULT_CHUNK_BYTES = 64 * 1024
+
+# Bir sətrin maksimum uzunluğu (bayt) – daha uzun sətir xəta kimi qaytarılır
+DEFAULT_MAX_LINE_BYTES = 1024 * 1024
+
+# decide_scenarios_v2-yə bir dəfəyə ötürülən ssenari sayı
+DEFAULT_BATCH_SIZE = 256
+
+
+def iter_lines(stream, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+               max_line_bytes: int = DEFAULT_MAX_LINE_BYTES):
+    """
+    Axından (line_no, bytes | None) cütləri qaytarır. max_line_bytes-dan uzun
+    sətir üçün bytes əvəzinə None gəlir və sətrin qalanı oxunub atılır.
+    """
+    buffer = b""
+    line_no = 0
+    skipping = False
+
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            break
+        buffer += chunk
+
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line_no += 1
+            if skipping:
+                skipping = False
+                yield line_no, None
+            else:
+                yield line_no, buffer[start:end]
+            start = end + 1
+        buffer = buffer[start:]
+
+        # Sətir sonu hələ gəlməyib, amma limit keçilib – qalanını atırıq
+        if len(buffer) > max_line_bytes:
+            skipping = True
+            buffer = b""
+        elif skipping:
+            buffer = b""
+
+    if skipping:
+        yield line_no + 1, None
+    elif buffer.strip():
+        yield line_no + 1, buffer
+
+
+def _parse_line(raw: bytes):
+    """Sətri ssenari dict-inə çevirir; xəta olduqda (None, mesaj)."""
+    try:
+        scenario = json.loads(raw)
+    except (UnicodeDecodeError, ValueError):
+        return None, "Sətir düzgün JSON deyil."
+    if not isinstance(scenario, dict):
+        return None, "Hər sətir JSON obyekt olmalıdır."
+    return scenario, None
+
+
+def _decide_batch(batch: list, decide_many, decide_one) -> list:
+    """
+    Batch-i bir dəfəyə qiymətləndirir. Hansısa ssenari xəta verərsə,
+    xətalı sətri tapmaq üçün batch ssenari-ssenari yenidən hesablanır.
+    """
+    scenarios = [scenario for _, scenario in batch]
+    try:
+        return [
+            {"line": line_no, "result": result}
+            for (line_no, _), result in zip(batch, decide_many(scenarios))
+        ]
+    except Exception:
+        pass
+
+    out = []
+    for line_no, scenario in batch:
+        try:
+            out.append({"line": line_no, "result": decide_one(scenario)})
+        except ValueError as e:
+            out.append({"line": line_no, "error": str(e)})
+        except Exception:
+            out.append({"line": line_no, "error": "Ssenari emal oluna bilmədi."})
+    return out
+
+
+def decide_ndjson(stream, decide_many, decide_one,
+                  batch_size: int = DEFAULT_BATCH_SIZE,
+                  chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                  max_line_bytes: int = DEFAULT_MAX_LINE_BYTES):
+    """
+    NDJSON axınını oxuyur və nəticə sətirlərini (sətir sonu daxil str) qaytaran generator.
+    decide_many: ssenari listi -> nəticə listi (məsələn, decide_scenarios_v2)
+    decide_one: tək ssenari -> nəticə (məsələn, decide_scenario_v2)
+    Çıxış sətirləri giriş sırası ilədir.
+    """
+    batch = []
+    pending_errors = []
+
+    def flush():
+        rows = pending_errors + (_decide_batch(batch, decide_many, decide_one) if batch else [])
+        rows.sort(key=lambda row: row["line"])
+        batch.clear()
+        pending_errors.clear()
+        return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+    for line_no, raw in iter_lines(stream, chunk_bytes, max_line_bytes):
+        if raw is None:
+            pending_errors.append({
+                "line": line_no,
+                "error": f"Sətir {max_line_bytes} baytdan uzundur."
+            })
+        elif raw.strip():
+            scenario, error = _parse_line(raw)
+            if error is None:
+                batch.append((line_no, scenario))
+            else:
+                pending_errors.append({"line": line_no, "error": error})
+        else:
+            continue
+
+        if len(batch) + len(pending_errors) >= batch_size:
+            yield flush()
+
+    if batch or pending_errors:
+        yield flush()
@@ -0,0 +1,314 @@
+"""
+/compare-dəki manual_choice rəylərindən ML v2 modelinin inkremental təlimi.
+
+FeedbackBuffer – bütün worker-lərin yazdığı sabit enli binary fayl: 16 baytlıq
+başlıq (magic, format versiyası, n_features), sonra hər qeyd track_to_features_v2
+ilə eyni sırada n_features int32 feature + 1 int32 hədəfdir (chosen_track =
+istifadəçinin seçdiyi track). int32 – böyük track-lərdə saylar kəsilmir.
+Qeydlər O_APPEND ilə bir write çağırışında yazılır, ona görə worker-lər
+bir-birini pozmur. Fayl 0600 icazələri ilə yaradılır.
+
+Ölçü həddi: fayl max_bytes-a çatanda öyrənən proses onu <path>.1-ə çevirir
+(əvvəlki .1 silinir) və yeni fayla keçir; yazanlar inode dəyişikliyini görüb
+yeni faylı açır. Öyrənən dayanıbsa, fayl 2 × max_bytes-dan böyük olduqda yeni
+rəylər atılır (dropped) – disk limitsiz dolmur. Çevrilmə anında köhnə inode-a
+yazılan bir neçə qeyd yalnız .1 faylında qala bilər.
+
+OnlineLearner – hər worker-də fon thread-i, amma təlim yalnız bir prosesdə
+gedir: <path>.lock faylına flock ilə lider seçilir, qalanları hər interval
+saniyədə yenidən cəhd edir (lider ölsə, kilid avtomatik azad olur). Lider
+əvvəlcə əsas datasetlə (bootstrap) SGDClassifier qurur, sonra hər interval
+saniyədən bir buferdəki yeni qeydlərlə partial_fit edir və modelin surətini
+hold-out ilə birlikdə publish callback-inə verir (ai_model: model reyestrinə
+yeni versiya; hold-out dəqiqliyi cari modelinkindən pis deyilsə, current
+edilir və lokal atomik dəyişdirilir). Hold-out əsas datasetin holdout_fraction
+hissəsi və hər 1/holdout_fraction-cı rəydir – bunlarla təlim aparılmır.
+Sorğular köhnə modellə işləməyə davam edir – heç nə bloklanmır.
+"""
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+try:
+    import fcntl
+except ImportError:  # Windows – hər proses özü öyrənir
+    fcntl = None
+
+try:
+    from .dataset_io import load_training_data
+except ImportError:
+    from dataset_io import load_training_data
+
+CLASSES = np.array([1, 2])
+
+# Buferin başlığı: magic, format versiyası, n_features, ehtiyat (hər biri int32)
+_MAGIC = 0x42465254  # "TRFB"
+_FORMAT_VERSION = 2
+_DTYPE = np.int32
+_HEADER_WORDS = 4
+
+
+class FeedbackBuffer:
+    """Rəy qeydlərinin append-only faylı (proseslər arasında ortaq)."""
+
+    def __init__(self, path: str, n_features: int, max_bytes: int = 64 << 20):
+        self.path = path
+        self.n_features = n_features
+        self.max_bytes = max_bytes
+        self.record_words = n_features + 1
+        self.record_size = self.record_words * np.dtype(_DTYPE).itemsize
+        self.header = np.array([_MAGIC, _FORMAT_VERSION, n_features, 0], dtype=_DTYPE).tobytes()
+        self.dropped = 0
+        self._fd = None
+        self._fd_pid = None
+        self._lock = threading.Lock()
+
+    # ---------- yazma ----------
+
+    def _create(self) -> None:
+        """Başlıqlı boş faylı atomik yaradır (fayl artıq varsa, heç nə etmir)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, self.header)
+        finally:
+            os.close(fd)
+        try:
+            os.link(tmp_path, self.path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    def _check_header(self, data: bytes) -> None:
+        if data != self.header:
+            raise ValueError(
+                f"{self.path} başqa formatdadır (köhnə int8 bufer və ya fərqli n_features) – "
+                "faylı köçürün və ya silin."
+            )
+
+    def _writer_fd(self) -> int:
+        """Yazma deskriptoru: fork-dan və ya fayl çevrildikdən sonra yenidən açılır."""
+        if self._fd is not None and self._fd_pid == os.getpid():
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+                    return self._fd
+            except FileNotFoundError:
+                pass
+            os.close(self._fd)
+
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | getattr(os, "O_NOFOLLOW", 0))
+        except FileNotFoundError:
+            self._create()
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | getattr(os, "O_NOFOLLOW", 0))
+        try:
+            # O_APPEND yazıları həmişə sona gedir – başlığı əvvəldən oxumaq olar
+            os.lseek(fd, 0, os.SEEK_SET)
+            self._check_header(os.read(fd, len(self.header)))
+        except ValueError:
+            os.close(fd)
+            self._fd = None
+            raise
+        self._fd = fd
+        self._fd_pid = os.getpid()
+        return fd
+
+    def append(self, features, label: int) -> bool:
+        """Qeydi əlavə edir; fayl hədd-dən (2 × max_bytes) böyükdürsə, atıb False qaytarır."""
+        record = np.empty(self.record_words, dtype=_DTYPE)
+        record[:-1] = features
+        record[-1] = label
+        data = record.tobytes()
+
+        with self._lock:
+            fd = self._writer_fd()
+            if self.max_bytes and os.fstat(fd).st_size >= 2 * self.max_bytes:
+                self.dropped += 1
+                return False
+            os.write(fd, data)
+        return True
+
+    # ---------- oxuma (öyrənən proses) ----------
+
+    def size(self, path: str | None = None) -> int:
+        try:
+            return os.path.getsize(path or self.path)
+        except FileNotFoundError:
+            return 0
+
+    def count(self, path: str | None = None) -> int:
+        """Tam yazılmış qeydlərin sayı."""
+        return max(self.size(path) - len(self.header), 0) // self.record_size
+
+    def read_from(self, start: int, path: str | None = None):
+        """start-dan sonrakı tam qeydləri (X, y) kimi qaytarır."""
+        path = path or self.path
+        end = self.count(path)
+        if end <= start:
+            return np.empty((0, self.n_features), dtype=_DTYPE), np.empty(0, dtype=_DTYPE)
+
+        with open(path, "rb") as f:
+            self._check_header(f.read(len(self.header)))
+            f.seek(len(self.header) + start * self.record_size)
+            data = f.read((end - start) * self.record_size)
+        records = np.frombuffer(data, dtype=_DTYPE).reshape(end - start, self.record_words)
+        return records[:, :-1], records[:, -1]
+
+    def rotate(self) -> str:
+        """Faylı <path>.1-ə çevirir; yazanlar növbəti qeyddə yeni fayl açır."""
+        rotated = f"{self.path}.1"
+        os.replace(self.path, rotated)
+        return rotated
+
+
+class OnlineLearner:
+    """
+    Əsas dataset + rəy buferi üzərində SGDClassifier (logistic regression).
+    publish(model, version, holdout) yeni modelin surəti, "online-<vaxt>-<n>" versiyası
+    və hold-out (X, y) ilə çağırılır – yalnız lider prosesdə (bax _acquire_leadership);
+    model current edildikdə True qaytarmalıdır.
+    """
+
+    def __init__(self, buffer: FeedbackBuffer, base_data_path: str | None, publish,
+                 interval: float = 30.0, bootstrap_epochs: int = 5,
+                 lock_path: str | None = None, holdout_fraction: float = 0.2,
+                 holdout_max_rows: int = 20000):
+        self.buffer = buffer
+        self.base_data_path = base_data_path
+        self.publish = publish
+        self.interval = interval
+        self.bootstrap_epochs = bootstrap_epochs
+        self.lock_path = lock_path or f"{buffer.path}.lock"
+        self.holdout_fraction = holdout_fraction
+        self.holdout_every = max(int(round(1 / holdout_fraction)), 2)
+        self.holdout_max_rows = holdout_max_rows
+        self.leader = False
+
+        self.model = SGDClassifier(loss="log_loss", shuffle=False, random_state=0)
+        self.offset = 0
+        self.version = 0
+        self.last_update = None
+        self.last_error = None
+        self.last_activated = None
+
+        # Təlimə daxil edilməyən sətirlər: əsas datasetdən və rəylərdən (X, y)
+        empty = (np.empty((0, buffer.n_features), dtype=_DTYPE), np.empty(0, dtype=_DTYPE))
+        self._base_holdout = empty
+        self._feedback_holdout = empty
+
+        self._thread = None
+        self._lock_fd = None
+        self._stop = threading.Event()
+
+    def bootstrap(self) -> None:
+        """Modeli əsas datasetlə qurur (fayl yoxdursa, yalnız rəylərdən öyrənir)."""
+        if self.base_data_path and os.path.exists(self.base_data_path):
+            X, y, _ = load_training_data(self.base_data_path, label="chosen_track")
+            X = np.asarray(X)
+            y = np.asarray(y)
+            held = np.random.default_rng(0).random(len(y)) < self.holdout_fraction
+            self._base_holdout = (X[held], y[held])
+            for _ in range(self.bootstrap_epochs):
+                self.model.partial_fit(X[~held], y[~held], classes=CLASSES)
+
+    def _fit(self, path: str | None = None) -> int:
+        X, y = self.buffer.read_from(self.offset, path)
+        if len(y):
+            held = (self.offset + np.arange(len(y))) % self.holdout_every == 0
+            X_held, y_held = self._feedback_holdout
+            self._feedback_holdout = (
+                np.concatenate([X_held, X[held]])[-self.holdout_max_rows:],
+                np.concatenate([y_held, y[held]])[-self.holdout_max_rows:]
+            )
+            if not held.all():
+                self.model.partial_fit(X[~held], y[~held], classes=CLASSES)
+            self.offset += len(y)
+        return len(y)
+
+    def holdout(self) -> tuple:
+        """Hold-out (X, y): əsas datasetin hissəsi + ən son holdout_max_rows rəy sətri."""
+        return tuple(
+            np.concatenate([base, feedback])
+            for base, feedback in zip(self._base_holdout, self._feedback_holdout)
+        )
+
+    def step(self) -> int:
+        """Buferdəki yeni qeydlərlə modeli yeniləyir; yeni qeyd sayını qaytarır."""
+        n = self._fit()
+        if self.buffer.max_bytes and self.buffer.size() >= self.buffer.max_bytes:
+            # Çevrilmədən əvvəl köhnə fayla düşmüş qeydlər də oxunur
+            n += self._fit(self.buffer.rotate())
+            self.offset = 0
+        return n
+
+    def _publish(self) -> None:
+        if not hasattr(self.model, "coef_"):
+            return  # hələ heç bir məlumat görülməyib
+        self.version += 1
+        self.last_update = time.time()
+        version = f"online-{time.strftime('%Y%m%d-%H%M%S')}-{self.version}"
+        self.last_activated = bool(self.publish(copy.deepcopy(self.model), version, self.holdout()))
+
+    def _acquire_leadership(self) -> bool:
+        """<path>.lock üzərində bloklamayan flock; kilid prosesin ömrü boyu saxlanılır."""
+        if fcntl is None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _run(self) -> None:
+        # Yalnız bir proses öyrənir; digərləri lider ölənə qədər gözləyir
+        while not self.leader:
+            try:
+                self.leader = self._acquire_leadership()
+            except OSError as e:
+                self.last_error = repr(e)
+            if not self.leader and self._stop.wait(self.interval):
+                return
+
+        try:
+            self.bootstrap()
+            self.step()
+            self._publish()
+        except Exception as e:  # fon thread-i sorğuları dayandırmamalıdır
+            self.last_error = repr(e)
+
+        while not self._stop.wait(self.interval):
+            try:
+                if self.step():
+                    self._publish()
+            except Exception as e:
+                self.last_error = repr(e)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {
+            "leader": self.leader,
+            "version": self.version,
+            "feedback_rows_seen": self.offset,
+            "feedback_rows_total": self.buffer.count(),
+            "feedback_rows_dropped": self.buffer.dropped,
+            "last_update": self.last_update,
+            "last_activated": self.last_activated,
+            "holdout_rows": len(self._base_holdout[1]) + len(self._feedback_holdout[1]),
+            "last_error": self.last_error,
+            "interval": self.interval
+        }
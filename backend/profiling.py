@@ -0,0 +1,239 @@
+"""
+Sorğuların stack-sampling profili (flamegraph üçün "collapsed stack" formatı).
+
+StackSampler – bir sorğunun thread-ini ayrıca fon thread-indən hər interval
+saniyədən bir sys._current_frames() ilə oxuyur və stack-ləri sayır. Nəticə
+Brendan Gregg-in collapsed formatındadır (flamegraph.pl, speedscope, inferno):
+
+  app.py:compare_decisions;ai_model.py:decide_modes_v2;ai_model.py:__init__ 17
+
+AggregateProfiler – hər worker-də həmişə işləyən, aşağı tezlikli sampler:
+yalnız hal-hazırda sorğu emal edən thread-ləri (register/unregister) oxuyur və
+stack-ləri, eləcə də "self" və "inclusive" funksiya saylarını toplayır.
+Sorğular heç vaxt dayandırılmır – kod yalnız sampler thread-ində işləyir.
+
+Qeyd: GIL səbəbindən CPU-bound kodda faktiki sampling addımı
+sys.getswitchinterval()-dan (default 5 ms) kiçik olmur.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse_stack(frame) -> tuple[str, ...]:
+    """Frame-dən kökdən yarpağa doğru funksiya adları (profiling modulunun öz frame-ləri xaric)."""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename != _THIS_FILE:
+            labels.append(frame_label(code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Counter({stack: say}) -> collapsed stack mətni (ən çox sayılan əvvəl)."""
+    return "".join(
+        f"{';'.join(stack)} {count}\n"
+        for stack, count in stacks.most_common()
+        if stack
+    )
+
+
+class StackSampler:
+    """Bir thread-in stack-lərini interval ilə sayır (start() ... stop())."""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[collapse_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self) -> "StackSampler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self.stacks
+
+    def collapsed(self) -> str:
+        return format_collapsed(self.stacks)
+
+
+class ProfileStore:
+    """
+    Son profillər (yaddaşda, ən çox maxlen); directory verilibsə <id>.collapsed
+    faylları da yazılır və yaddaşdan çıxan profillərin faylları silinir.
+    """
+
+    def __init__(self, maxlen: int = 20, directory: str | None = None):
+        self.maxlen = maxlen
+        self.directory = directory
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, sampler: StackSampler, meta: dict) -> str:
+        profile_id = uuid.uuid4().hex[:12]
+        entry = dict(meta, samples=sampler.samples, elapsed_ms=sampler.elapsed * 1000,
+                     collapsed=sampler.collapsed())
+        with self._lock:
+            self._profiles[profile_id] = entry
+            evicted = []
+            while len(self._profiles) > self.maxlen:
+                evicted.append(self._profiles.popitem(last=False)[0])
+
+        if self.directory:
+            # Qovluqda da yalnız yaddaşdakı son maxlen profil qalır
+            for old_id in evicted:
+                try:
+                    os.remove(self._path(old_id))
+                except FileNotFoundError:
+                    pass
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile_id), "w", encoding="utf-8") as f:
+                f.write(entry["collapsed"])
+        return profile_id
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.collapsed")
+
+    def get(self, profile_id: str) -> dict | None:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [
+                {key: value for key, value in entry.items() if key != "collapsed"} | {"id": profile_id}
+                for profile_id, entry in self._profiles.items()
+            ]
+
+
+class AggregateProfiler:
+    """
+    Aşağı tezlikli, həmişə aktiv sampler: sorğu emal edən thread-lərin
+    stack-lərini toplayır. Fərqli stack sayı max_stacks ilə məhdudlaşır
+    (sonrakı yeni stack-lər yalnız funksiya saylarına düşür).
+    """
+
+    def __init__(self, interval: float = 0.05, max_stacks: int = 5000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks = Counter()
+        self.self_counts = Counter()
+        self.inclusive_counts = Counter()
+        self.samples = 0
+        self.dropped_stacks = 0
+        self.started_at = None
+
+        self._active = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def register(self, thread_id: int) -> None:
+        self._active.add(thread_id)
+
+    def unregister(self, thread_id: int) -> None:
+        self._active.discard(thread_id)
+
+    def _sample(self) -> None:
+        if not self._active:
+            return
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id in list(self._active):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = collapse_stack(frame)
+                if not stack:
+                    continue
+                self.samples += 1
+                self.self_counts[stack[-1]] += 1
+                self.inclusive_counts.update(set(stack))
+                if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                    self.stacks[stack] += 1
+                else:
+                    self.dropped_stacks += 1
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self._sample()
+
+    def start(self) -> bool:
+        """Sampler thread-ini bu prosesdə başladır (fork-dan sonra worker-də yenidən)."""
+        if not self.enabled or self._pid == os.getpid():
+            return False
+        with self._lock:
+            if self._pid == os.getpid():
+                return False
+            self._active.clear()
+            self._pid = os.getpid()
+            self.started_at = time.time()
+        threading.Thread(target=self._run, name="aggregate-profiler", daemon=True).start()
+        return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.self_counts.clear()
+            self.inclusive_counts.clear()
+            self.samples = 0
+            self.dropped_stacks = 0
+
+    def summary(self, top: int = 20) -> dict:
+        with self._lock:
+            samples = self.samples
+
+            def ranked(counts: Counter) -> list[dict]:
+                return [
+                    {"function": name, "samples": count, "ratio": count / samples}
+                    for name, count in counts.most_common(top)
+                ]
+
+            return {
+                "enabled": self.enabled,
+                "interval": self.interval,
+                "started_at": self.started_at,
+                "samples": samples,
+                "distinct_stacks": len(self.stacks),
+                "dropped_stacks": self.dropped_stacks,
+                "self": ranked(self.self_counts),
+                "inclusive": ranked(self.inclusive_counts)
+            }
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return format_collapsed(self.stacks)
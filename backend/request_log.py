@@ -0,0 +1,213 @@
+"""
+Sorğuların strukturlaşdırılmış (JSON sətir) loqu – sorğu thread-ini bloklamadan.
+
+Sorğu bitəndə record() qısa bir qeyd qurur (route, status, müddət, payload-ın
+xülasəsi – tam body yox) və:
+  1) onu prosesin yaddaşındakı ring buffer-ə əlavə edir (/debug/recent_requests);
+  2) route-un sampling nisbətinə görə seçilibsə, logging.QueueHandler ilə
+     növbəyə qoyur. Yazmanı (JSON-a çevirmə və stdout) fon thread-indəki
+     QueueListener edir.
+
+Növbə doludursa (loq borusu tıxanıb), qeyd atılır və dropped sayğacı artır –
+sorğu heç vaxt gözləmir. Fon thread-i hər worker-də ilk sorğuda başladılır
+(thread-lər fork-dan keçmir).
+
+Sampling: TROLLEY_LOG_SAMPLE_RATES="/decide_v2=0.1,/compare=1,*=0.5" – route
+üzrə 0..1 nisbəti, "*" qalan route-lar üçündür (default 1). Nisbəti 0 olan
+route-lar heç qeyd olunmur (ring buffer daxil). DEFAULT_SAMPLE_RATES – köhnə
+print-lər kimi yalnız qərar route-larını loqa yazır.
+
+Xülasəyə klientin göndərdiyi dəyərlər yalnız qısa str/int kimi düşür
+(MAX_VALUE_CHARS simvola qədər kəsilir), tanınmayan modlar "other" sayılır –
+böyük və ya iç-içə dəyərlər loqa və ring buffer-ə köçürülmür.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+# Xülasədə saxlanılan str dəyərin maksimum uzunluğu
+MAX_VALUE_CHARS = 64
+
+KNOWN_MODES = ("utilitarian", "deontological", "custom", "ml")
+
+# Qərar route-ları tam, qalanları (/metrics, /ready, statik fayllar) heç loqa yazılmır
+DEFAULT_SAMPLE_RATES = (
+    "/decide=1,/decide_v2=1,/decide_v2/batch=1,/decide_v2/stream=1,/compare=1,*=0"
+)
+
+
+def parse_sample_rates(spec: str | None) -> dict:
+    """ "route=nisbət,..." sətrini {route: nisbət} lüğətinə çevirir."""
+    rates = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        route, _, rate = part.rpartition("=")
+        if not route:
+            raise ValueError(f"Yanlış sampling ifadəsi: {part}")
+        rates[route.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def _track_size(track):
+    if isinstance(track, (list, dict)):
+        return len(track)
+    return None
+
+
+def _short_value(value):
+    """Klient dəyəri: qısa str/int olduğu kimi, uzun str kəsilir, qalanları yalnız tipi ilə."""
+    if isinstance(value, str):
+        return value[:MAX_VALUE_CHARS]
+    if isinstance(value, int) or value is None:
+        return value
+    return f"<{type(value).__name__}>"
+
+
+def _mode_label(mode) -> str:
+    return mode if isinstance(mode, str) and mode in KNOWN_MODES else "other"
+
+
+def summarize_payload(data) -> dict | None:
+    """Sorğu body-sinin xülasəsi: tam ssenari əvəzinə mod və track ölçüləri."""
+    if isinstance(data, dict):
+        summary = {
+            "mode": _mode_label(data["mode"]) if "mode" in data else None,
+            "track1_size": _track_size(data.get("track1")),
+            "track2_size": _track_size(data.get("track2"))
+        }
+        for key in ("deon_variant", "custom_profile_id", "manual_choice"):
+            if key in data:
+                summary[key] = _short_value(data[key])
+        if data.get("custom_rules"):
+            summary["custom_rules"] = True
+        if isinstance(data.get("scenarios"), list):
+            summary.update(summarize_payload(data["scenarios"]))
+        return summary
+
+    if isinstance(data, list):
+        modes = {}
+        for item in data:
+            mode = _mode_label(item.get("mode", "utilitarian")) if isinstance(item, dict) else "other"
+            modes[mode] = modes.get(mode, 0) + 1
+        return {"scenarios": len(data), "modes": modes}
+    return None
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler: qeyd formatlanmadan növbəyə qoyulur, növbə doludursa atılır."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatlama fon thread-ində (JsonLineFormatter) aparılır
+        return record
+
+    def enqueue(self, record) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        return json.dumps(getattr(record, "fields", {"message": record.getMessage()}),
+                          ensure_ascii=False, default=str)
+
+
+class RequestLogger:
+    """Sampling, ring buffer və fon yazıcısı olan sorğu loqu (hər worker-də bir nüsxə)."""
+
+    def __init__(self, enabled: bool = True, sample_rates: dict | None = None,
+                 queue_size: int = 10000, recent_size: int = 200, stream=None):
+        self.enabled = enabled
+        self.sample_rates = sample_rates or {}
+        self.default_rate = self.sample_rates.get("*", 1.0)
+        self.recent = deque(maxlen=recent_size)
+        self.stream = stream
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = _NonBlockingQueueHandler(self.queue)
+        # Qlobal logging konfiqurasiyasından asılı olmayan (root-a ötürməyən) ayrıca logger
+        self.logger = logging.Logger("trolley.requests", logging.INFO)
+        self.logger.addHandler(self.handler)
+
+        self.sampled_out = 0
+        self._listener = None
+        self._listener_pid = None
+        self._lock = threading.Lock()
+
+    def start(self) -> bool:
+        """Fon yazıcısını bu prosesdə başladır (artıq işləyirsə, heç nə etmir)."""
+        if not self.enabled or self._listener_pid == os.getpid():
+            return False
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return False
+            output = logging.StreamHandler(self.stream or sys.stdout)
+            output.setFormatter(JsonLineFormatter())
+            self._listener = logging.handlers.QueueListener(self.queue, output)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+        return True
+
+    def stop(self) -> None:
+        """Növbədəki qeydləri yazıb fon thread-ini dayandırır."""
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+
+    def rate(self, route: str) -> float:
+        return self.sample_rates.get(route, self.default_rate)
+
+    def is_logged(self, route: str) -> bool:
+        """Route ümumiyyətlə qeyd olunurmu (nisbəti 0-dan böyükdür)?"""
+        return self.enabled and self.rate(route) > 0
+
+    def record(self, route: str, method: str, status: int, duration_ms: float,
+               payload_summary: dict | None = None) -> None:
+        rate = self.rate(route)
+        if not self.enabled or rate <= 0:
+            return
+
+        fields = {
+            "ts": time.time(),
+            "route": route,
+            "method": method,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "pid": os.getpid()
+        }
+        if payload_summary is not None:
+            fields["payload"] = payload_summary
+        self.recent.append(fields)
+
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return
+        self.logger.info("request", extra={"fields": fields})
+
+    def recent_requests(self, limit: int | None = None) -> list[dict]:
+        items = list(self.recent)
+        return items[-limit:] if limit else items
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampled_out,
+            "sample_rates": self.sample_rates,
+            "writer_running": self._listener_pid == os.getpid()
+        }
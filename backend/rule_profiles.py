@@ -0,0 +1,135 @@
+"""
+Serverdə saxlanılan custom qayda profilləri.
+
+Profil bir dəfə POST ilə göndərilir, yoxlanılır və diskdə JSON kimi saxlanılır
+(bütün gunicorn worker-ləri eyni qovluqdan oxuyur). Sonra ssenarilər tam
+custom_rules əvəzinə yalnız custom_profile_id göndərə bilər.
+Profilin kompilyasiyası (birləşdirilmiş cədvəllər + kernel vektorları)
+ai_model.compile_custom_rules-dadır və rules_hash üzrə cache-lənir.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+
+try:
+    from .decision_cache import rules_hash
+except ImportError:
+    from decision_cache import rules_hash
+
+RULE_TABLES = ("age_weights", "role_weights", "flag_weights")
+
+# Profil adı fayl adı kimi də istifadə olunur
+PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Bir cədvəldə icazə verilən maksimum açar sayı
+MAX_TABLE_SIZE = 256
+
+
+def validate_custom_rules(custom_rules, ignore_unknown: bool = False) -> dict:
+    """
+    custom_rules strukturunu yoxlayır və təmiz surətini qaytarır.
+    Xəta olduqda ValueError atır. ignore_unknown=True olduqda (inline qaydalar –
+    köhnə klientlər əlavə açarlar göndərə bilər) naməlum cədvəllər atılır.
+    """
+    if not isinstance(custom_rules, dict):
+        raise ValueError("custom_rules JSON obyekt olmalıdır.")
+
+    unknown = [name for name in custom_rules if name not in RULE_TABLES]
+    if unknown and not ignore_unknown:
+        raise ValueError(f"Naməlum cədvəl(lər): {', '.join(map(str, unknown))}.")
+
+    cleaned = {}
+    for name in RULE_TABLES:
+        table = custom_rules.get(name)
+        if table is None:
+            continue
+        if not isinstance(table, dict):
+            raise ValueError(f"{name} JSON obyekt olmalıdır.")
+        if len(table) > MAX_TABLE_SIZE:
+            raise ValueError(f"{name} ən çox {MAX_TABLE_SIZE} açar ola bilər.")
+
+        for key, value in table.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{name}.{key} ədəd olmalıdır.")
+            if isinstance(value, float) and not math.isfinite(value):
+                raise ValueError(f"{name}.{key} sonlu ədəd olmalıdır.")
+        cleaned[name] = dict(table)
+
+    return cleaned
+
+
+class RuleProfileRegistry:
+    """
+    Adlandırılmış qayda profillərinin fayl əsaslı reyestri.
+    Hər profil directory/<id>.json faylındadır; yaddaşdakı surət faylın
+    mtime-ı dəyişdikdə (başqa worker yeniləyibsə) yenidən oxunur.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile_id, custom_rules, description: str | None = None) -> dict:
+        """Profili yoxlayır və atomik şəkildə diskə yazır. Xəta olduqda ValueError."""
+        if not isinstance(profile_id, str) or not PROFILE_ID_RE.match(profile_id):
+            raise ValueError("Profil adı 1-64 simvol olmalıdır: hərflər, rəqəmlər, '_' və '-'.")
+
+        cleaned = validate_custom_rules(custom_rules)
+        profile = {
+            "id": profile_id,
+            "description": description,
+            "custom_rules": cleaned,
+            "rules_hash": rules_hash(cleaned),
+            "updated_at": time.time()
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._profiles[profile_id] = (os.stat(path).st_mtime_ns, profile)
+        return profile
+
+    def get(self, profile_id) -> dict | None:
+        """Profili qaytarır (tapılmadıqda None)."""
+        if not isinstance(profile_id, str) or not PROFILE_ID_RE.match(profile_id):
+            return None
+
+        path = self._path(profile_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._profiles.pop(profile_id, None)
+            return None
+
+        with self._lock:
+            cached = self._profiles.get(profile_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+        with self._lock:
+            self._profiles[profile_id] = (mtime, profile)
+        return profile
+
+    def list_ids(self) -> list[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(".json")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        )
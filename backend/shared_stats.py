@@ -0,0 +1,242 @@
+"""
+Bütün gunicorn worker-lərinin gördüyü, paylaşılan yaddaşda saxlanılan sayğaclar.
+
+Sayğaclar mmap olunmuş bir faylda (int64 massiv) saxlanılır. Hər proses öz
+"slot"una (sətrinə) yazır, oxuyanda isə bütün slotlar toplanır – ona görə
+artırma zamanı proseslərarası kilid lazım deyil, yalnız prosesin daxilindəki
+thread-lər üçün lokal kilid istifadə olunur.
+
+Slot yalnız ilk artırmada, fayl kilidi (fcntl.lockf – proses səviyyəli,
+fork-dan sonra da worker-lər arasında işləyir) altında götürülür. Prosesi
+ölmüş slot yenidən istifadə olunur və sayları saxlanılır, ona görə worker
+yenidən başladıqda ümumi saylar itmir.
+
+Fayl default olaraq deployment-in şəxsi qovluğunda (TROLLEY_STATS_DIR) yaradılır:
+gunicorn master start zamanı tempfile.mkdtemp() ilə 0700 qovluq açır, yolu
+mühit dəyişəni ilə worker-lərə ötürür və dayananda qovluğu silir
+(gunicorn.conf.py). Master olmadan (flask run) qovluq prosesin özündə
+yaradılır və çıxışda silinir. Yəni server yenidən başladıqda sayğaclar
+sıfırdan başlayır. TROLLEY_STATS_FILE ilə sabit yol verilərsə, saylar
+server restartları arasında da qalır (fayl silinmir).
+
+Fayl O_NOFOLLOW ilə açılır və yalnız bu istifadəçiyə məxsus, başqalarına
+bağlı (0600) adi fayldırsa istifadə olunur – əks halda PermissionError.
+
+fcntl olmayan platformalarda (Windows) sayğaclar sadəcə prosesin yaddaşında saxlanılır.
+"""
+import atexit
+import mmap
+import os
+import shutil
+import stat
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Faylın başlığı: magic, slot sayı, sayğac sayı, layout hash-i (hər biri int64)
+_MAGIC = 0x54524F4C4C455931  # "TROLLEY1"
+_HEADER_WORDS = 8
+
+# Deployment-in şəxsi qovluğu (gunicorn master-i və ya ilk istifadə edən proses yaradır)
+_STATS_DIR_ENV = "TROLLEY_STATS_DIR"
+_stats_dir_lock = threading.Lock()
+
+
+def _remove_stats_directory(path: str, owner_pid: int) -> None:
+    # Fork olunmuş worker-lər çıxanda qovluğu silməsin – yalnız onu yaradan proses
+    if os.getpid() == owner_pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def stats_directory() -> str:
+    """TROLLEY_STATS_DIR; təyin olunmayıbsa, bu proses üçün yaradılır və çıxışda silinir."""
+    path = os.environ.get(_STATS_DIR_ENV)
+    if path:
+        return path
+    with _stats_dir_lock:
+        path = os.environ.get(_STATS_DIR_ENV)
+        if not path:
+            # Fork olunan worker-lər eyni qovluğu mühit dəyişənindən görür
+            path = tempfile.mkdtemp(prefix="trolley_stats_")
+            os.environ[_STATS_DIR_ENV] = path
+            atexit.register(_remove_stats_directory, path, os.getpid())
+    return path
+
+
+def default_stats_path(name: str = "stats") -> str:
+    """Fayl yolu: TROLLEY_<NAME>_FILE və ya deployment-in şəxsi qovluğunda <name>.bin."""
+    path = os.environ.get(f"TROLLEY_{name.upper()}_FILE")
+    if path:
+        return path
+    return os.path.join(stats_directory(), f"{name}.bin")
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _layout_hash(names) -> int:
+    # Sayğac adları dəyişibsə (köhnə fayl), fayl yenidən yaradılır
+    h = 0
+    for name in names:
+        for ch in name.encode("utf-8"):
+            h = (h * 131 + ch) % (2**61 - 1)
+    return h
+
+
+def _check_private_file(fd: int, path: str) -> None:
+    """Fayl adi fayl olmalı, bu istifadəçiyə məxsus və başqalarına bağlı olmalıdır."""
+    info = os.fstat(fd)
+    if not stat.S_ISREG(info.st_mode):
+        raise PermissionError(f"Sayğac faylı adi fayl deyil: {path}")
+    if hasattr(os, "geteuid") and info.st_uid != os.geteuid():
+        raise PermissionError(f"Sayğac faylı başqa istifadəçiyə məxsusdur: {path}")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"Sayğac faylı başqalarına açıqdır (icazələr 0600 olmalıdır): {path}")
+
+
+class SharedCounters:
+    """
+    Adlandırılmış int64 sayğaclar. add() proses slotunu artırır,
+    snapshot() bütün slotların cəmini qaytarır.
+    """
+
+    def __init__(self, names, path: str | None = None, slots: int = 64):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.slots = slots
+        self.path = path or (default_stats_path() if fcntl is not None else None)
+
+        self._local_lock = threading.Lock()
+        self._slot_pid = None
+        self._slot = None
+        self._fd = None
+        self._mmap = None
+
+        # Slot-un birinci sütunu pid-dir, qalanları sayğaclardır
+        width = len(self.names) + 1
+        if fcntl is None:
+            self._table = np.zeros((1, width), dtype=np.int64)
+        else:
+            self._table = self._open_shared(width)
+
+        # Artırma üçün düz int64 görünüşü – numpy skalyar indeksləməsindən xeyli ucuzdur
+        self._width = width
+        self._words = memoryview(self._table).cast("B").cast("q")
+
+    # ---------- fayl ----------
+
+    def _open_shared(self, width: int) -> np.ndarray:
+        size = (_HEADER_WORDS + self.slots * width) * 8
+        header = np.array(
+            [_MAGIC, self.slots, len(self.names), _layout_hash(self.names)],
+            dtype=np.int64
+        )
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        try:
+            _check_private_file(fd, self.path)
+        except OSError:
+            os.close(fd)
+            raise
+
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            current = os.read(fd, header.nbytes)
+            if (os.fstat(fd).st_size != size
+                    or np.frombuffer(current.ljust(header.nbytes, b"\0"), dtype=np.int64).tolist()
+                    != header.tolist()):
+                # Yeni və ya başqa layout-lu fayl – sıfırdan yaradırıq
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header.tobytes(), 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+
+        self._fd = fd
+        self._mmap = mmap.mmap(fd, size)
+        data = np.frombuffer(self._mmap, dtype=np.int64)
+        return data[_HEADER_WORDS:].reshape(self.slots, width)
+
+    def _claim_slot(self) -> int:
+        """
+        Bu proses üçün slot seçir: boş və ya prosesi ölmüş slot (fayl kilidi altında).
+        Slot 0 heç kimə verilmir – boş slot qalmadıqda ora kilid altında yazılır.
+        """
+        pid = os.getpid()
+        if fcntl is None:
+            return 0
+
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            pids = self._table[1:, 0].tolist()
+            for i, slot_pid in enumerate(pids, start=1):
+                if slot_pid == pid:
+                    return i
+            for i, slot_pid in enumerate(pids, start=1):
+                # Ölmüş prosesin slotu sayları ilə birlikdə götürülür
+                if not _pid_alive(slot_pid):
+                    self._table[i, 0] = pid
+                    return i
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        return -1
+
+    # ---------- API ----------
+
+    def add(self, updates: dict) -> None:
+        """{ad: artım} sayğaclarını bu prosesin slotunda artırır."""
+        self.add_indexed([(self.index[name], n) for name, n in updates.items()])
+
+    def add_indexed(self, updates) -> None:
+        """add()-in ad axtarışı olmayan variantı: [(sayğac indeksi, artım), ...]."""
+        columns = [(i + 1, n) for i, n in updates]
+        with self._local_lock:
+            pid = os.getpid()
+            if self._slot_pid != pid:
+                # İlk artırma və ya fork-dan sonra yeni proses
+                self._slot = self._claim_slot()
+                self._slot_pid = pid
+
+            words = self._words
+            if self._slot >= 0:
+                base = self._slot * self._width
+                for col, n in columns:
+                    words[base + col] += n
+                return
+
+            # Bütün slotlar canlı proseslərdədir – nadir hal, ortaq slot 0-a fayl kilidi altında yazırıq
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                for col, n in columns:
+                    words[col] += n
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.add({name: n})
+
+    def snapshot(self) -> dict:
+        """Bütün proseslərin slotlarının cəmi."""
+        return dict(zip(self.names, self.totals().tolist()))
+
+    def totals(self) -> np.ndarray:
+        """snapshot()-un massiv forması (sayğacların sırası ilə)."""
+        return self._table[:, 1:].sum(axis=0)
+
+    def __getitem__(self, name: str) -> int:
+        return int(self._table[:, self.index[name] + 1].sum())
@@ -0,0 +1,327 @@
+"""
+Yaddaşdan böyük datasetlər üçün axınla (out-of-core) təlim.
+
+Dataset sabit ölçülü hissələrlə oxunur (dataset qovluğu – np.memmap dilimləri,
+shard manifesti – shard-lar ardıcıl, CSV – pandas chunksize, int8). Hold-out
+dəsti reservoir sampling (Algorithm R) ilə seçilir: bütün axından bərabər
+ehtimallı k sətir. Reservoir-dan çıxarılan sətir təlimə qaytarılır, ona görə
+hold-out-dakı sətirlər heç vaxt təlimdə iştirak etmir, qalan hamısı edir.
+
+Öyrənənlər:
+  sgd    – SGDClassifier.partial_fit, hər hissə bir addım (bir neçə epoch mümkündür)
+  forest – hər hissədə kiçik RandomForest (sub-ensemble), sonda ağaclar bir
+           RandomForestClassifier-də birləşdirilir
+
+Hissə ölçüsü yaddaş büdcəsindən hesablanır (--memory-mb): hold-out, bir hissə
+və onun sklearn-in float kopyaları büdcəyə sığmalıdır. Meşədə bura həm də hər
+paralel işin hissə surəti və yaddaşda toplanan bütün ağaclar daxildir: ağacın
+düyün sayı həm dərinliklə (2^(max_depth+1) − 1), həm də hissənin sətirləri ilə
+(2 × sətir − 1) məhduddur. Büdcə çatmırsa, ValueError – daha az ağac, kiçik
+dərinlik və ya az paralel iş lazımdır.
+"""
+import json
+import math
+import os
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import effective_n_jobs
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+
+try:
+    from .dataset_io import count_csv_rows, is_dataset_dir, load_dataset
+except ImportError:
+    from dataset_io import count_csv_rows, is_dataset_dir, load_dataset
+
+CLASSES = np.array([1, 2])
+
+# Bir sətrin hissə daxilində təxmini yaddaş "qiyməti" (bayt / feature):
+# int8 oxunuş + sklearn-in float64 (sgd) və ya float32 (forest) kopyası + ehtiyat
+BYTES_PER_FEATURE = {"sgd": 24, "forest": 16}
+
+# Meşədə hər paralel işin hissədən götürdüyü surət (float32) və bootstrap massivləri
+JOB_BYTES_PER_FEATURE = 4
+JOB_BYTES_PER_ROW = 16
+
+# sklearn Tree düyünü (Node strukturu, 64 bayt) + iki sinfin value-su (float64)
+TREE_NODE_BYTES = 80
+
+
+# ============== MƏNBƏLƏR ==============
+
+def _manifest_path(path: str) -> str:
+    return os.path.join(path, "manifest.json")
+
+
+def describe_source(path: str, label: str = "chosen_track") -> dict:
+    """Mənbənin növü, sətir sayı və sütun adları."""
+    if os.path.isdir(path) and is_dataset_dir(path):
+        X, _, meta = load_dataset(path)
+        return {"kind": "dataset", "rows": meta["n_rows"], "header": meta["header"]}
+
+    if os.path.isdir(path) and os.path.isfile(_manifest_path(path)):
+        with open(_manifest_path(path), encoding="utf-8") as f:
+            manifest = json.load(f)
+        header = [col for col in manifest["header"] if col != label]
+        return {"kind": "shards", "rows": manifest["total_rows"], "header": header,
+                "manifest": manifest}
+
+    header = [col for col in pd.read_csv(path, nrows=0).columns if col != label]
+    return {"kind": "csv", "rows": count_csv_rows(path), "header": header}
+
+
+def _iter_dataset(path: str, chunk_rows: int):
+    X, y, _ = load_dataset(path)
+    for start in range(0, len(y), chunk_rows):
+        # memmap dilimi kopyalanır – yalnız bu hissə yaddaşdadır
+        yield np.array(X[start:start + chunk_rows]), np.array(y[start:start + chunk_rows])
+
+
+def _iter_csv(path: str, chunk_rows: int, label: str):
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=np.int8):
+        yield chunk.drop(columns=[label]).to_numpy(), chunk[label].to_numpy()
+
+
+def iter_chunks(path: str, chunk_rows: int, label: str = "chosen_track"):
+    """Mənbəni (X, y) hissələri ilə oxuyur; hissələr chunk_rows-dan böyük olmur."""
+    source = describe_source(path, label)
+    if source["kind"] == "dataset":
+        yield from _iter_dataset(path, chunk_rows)
+    elif source["kind"] == "csv":
+        yield from _iter_csv(path, chunk_rows, label)
+    else:
+        for shard in source["manifest"]["shards"]:
+            shard_path = os.path.join(path, shard["file"])
+            if source["manifest"].get("format") == "npy":
+                yield from _iter_dataset(shard_path, chunk_rows)
+            else:
+                yield from _iter_csv(shard_path, chunk_rows, label)
+
+
+# ============== RESERVOIR HOLD-OUT ==============
+
+class Reservoir:
+    """
+    Axından k sətirlik bərabər ehtimallı nümunə (Algorithm R, hissə-hissə vektorlaşdırılmış).
+    offer() hissəni qəbul edir və təlimə gedəcək sətirləri qaytarır:
+    reservoir-a düşməyənlər + reservoir-dan çıxarılanlar.
+    """
+
+    def __init__(self, k: int, n_features: int, seed: int = 0):
+        self.k = k
+        self.X = np.zeros((k, n_features), dtype=np.int8)
+        self.y = np.zeros(k, dtype=np.int8)
+        self.index = np.full(k, -1, dtype=np.int64)  # sətrin axındakı qlobal nömrəsi
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def offer(self, X: np.ndarray, y: np.ndarray):
+        n = len(y)
+        start = self.seen
+        self.seen += n
+        train_parts = []
+
+        # 1) Reservoir hələ dolmayıbsa, ilk sətirlər birbaşa ora düşür
+        fill = min(max(self.k - start, 0), n)
+        if fill:
+            self.X[start:start + fill] = X[:fill]
+            self.y[start:start + fill] = y[:fill]
+            self.index[start:start + fill] = np.arange(start, start + fill)
+        if fill == n:
+            return X[:0], y[:0]
+
+        # 2) Qalanlar: t-ci sətir ehtimal k/(t+1) ilə təsadüfi slotu əvəz edir
+        rest = np.arange(fill, n)
+        slots = self.rng.integers(0, start + rest + 1)
+        accepted = slots < self.k
+        train_parts.append(rest[~accepted])
+
+        acc_rows = rest[accepted]
+        acc_slots = slots[accepted]
+        if len(acc_rows):
+            # Eyni slota bir neçə sətir düşübsə, sonuncu qalır, əvvəlkilər təlimə gedir
+            rev_slots = acc_slots[::-1]
+            _, last_pos = np.unique(rev_slots, return_index=True)
+            winners = np.zeros(len(acc_rows), dtype=bool)
+            winners[len(acc_rows) - 1 - last_pos] = True
+            train_parts.append(acc_rows[~winners])
+
+            win_rows = acc_rows[winners]
+            win_slots = acc_slots[winners]
+            evicted_X = self.X[win_slots].copy()
+            evicted_y = self.y[win_slots].copy()
+            self.X[win_slots] = X[win_rows]
+            self.y[win_slots] = y[win_rows]
+            self.index[win_slots] = start + win_rows
+        else:
+            evicted_X = X[:0]
+            evicted_y = y[:0]
+
+        train_rows = np.sort(np.concatenate(train_parts))
+        return (
+            np.concatenate([X[train_rows], evicted_X]),
+            np.concatenate([y[train_rows], evicted_y])
+        )
+
+    def holdout(self):
+        size = min(self.k, self.seen)
+        return self.X[:size], self.y[:size], self.index[:size]
+
+
+# ============== ÖYRƏNƏNLƏR ==============
+
+class SGDLearner:
+    def __init__(self, seed: int = 0):
+        self.model = SGDClassifier(loss="log_loss", random_state=seed)
+
+    def partial_fit(self, X, y, chunk_no: int) -> None:
+        if len(y):
+            self.model.partial_fit(X, y, classes=CLASSES)
+
+    def finalize(self, header):
+        return self.model
+
+
+class ForestLearner:
+    """Hər seçilmiş hissədə trees_per_chunk ağac; sonda vahid RandomForestClassifier."""
+
+    def __init__(self, trees_per_chunk: int, chunk_stride: int, max_depth, seed: int = 0,
+                 n_jobs: int = 1):
+        self.trees_per_chunk = trees_per_chunk
+        self.chunk_stride = chunk_stride
+        self.max_depth = max_depth
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.estimators = []
+
+    def partial_fit(self, X, y, chunk_no: int) -> None:
+        # Ağac sayı məhdud olduqda yalnız hər chunk_stride-cı hissədə ağac qurulur
+        if chunk_no % self.chunk_stride or len(np.unique(y)) < len(CLASSES):
+            return
+        sub = RandomForestClassifier(
+            n_estimators=self.trees_per_chunk, max_depth=self.max_depth,
+            random_state=self.seed + chunk_no, n_jobs=self.n_jobs
+        )
+        sub.fit(X, y)
+        self.estimators.extend(sub.estimators_)
+
+    def finalize(self, header):
+        if not self.estimators:
+            raise ValueError("Heç bir hissədə ağac qurulmadı (dataset çox kiçikdir?).")
+        forest = RandomForestClassifier(n_estimators=len(self.estimators), max_depth=self.max_depth)
+        forest.estimators_ = self.estimators
+        forest.estimator_ = self.estimators[0]
+        forest.classes_ = CLASSES
+        forest.n_classes_ = len(CLASSES)
+        forest.n_outputs_ = 1
+        forest.n_features_in_ = len(header)
+        forest.feature_names_in_ = np.asarray(header, dtype=object)
+        return forest
+
+
+# ============== TƏLİM ==============
+
+def plan_chunks(n_features: int, memory_mb: float, holdout_rows: int, learner: str,
+                max_trees: int = 300, max_depth=16, n_jobs: int = 1) -> int:
+    """
+    Büdcəyə sığan hissə ölçüsü (sətir): büdcə − hold-out, qalanı hissəyə.
+    Meşədə hissə sətri həm də n_jobs surətə və ağacların düyünlərinə "baha" başa gəlir:
+    max_trees × TREE_NODE_BYTES × min(2^(max_depth+1) − 1, 2 × chunk_rows − 1).
+    Büdcə yalnız məlumat və model üçündür – interpretator və kitabxanaların öz yaddaşı xaric.
+    """
+    available = memory_mb * 1024 * 1024 - holdout_rows * (n_features + 1) * 2
+    per_row = n_features * BYTES_PER_FEATURE[learner]
+    if learner != "forest":
+        chunk_rows = int(available // per_row)
+    else:
+        per_row += n_jobs * (n_features * JOB_BYTES_PER_FEATURE + JOB_BYTES_PER_ROW)
+        tree_bytes = max_trees * TREE_NODE_BYTES
+        # Ağaclar hissənin sətirləri ilə məhduddur: düyün sayı ≤ 2 × chunk_rows − 1
+        chunk_rows = int((available + tree_bytes) // (per_row + 2 * tree_bytes))
+        if max_depth is not None and 2 * chunk_rows - 1 > 2 ** (max_depth + 1) - 1:
+            # Hissə böyükdür – ağaclar dərinliklə məhduddur, qalan büdcə hissəyə
+            chunk_rows = int((available - tree_bytes * (2 ** (max_depth + 1) - 1)) // per_row)
+    if chunk_rows < 1000:
+        raise ValueError(
+            "Yaddaş büdcəsi hold-out, minimal hissə və ağaclar üçün kifayət deyil "
+            "(--memory-mb-ni artırın və ya --max-trees, --holdout-rows, --jobs-u azaldın)."
+        )
+    return chunk_rows
+
+
+def train_streaming(data_path: str, output: str = "trolley_model_v2.pkl",
+                    learner: str = "sgd", memory_mb: float = 2048,
+                    holdout_rows: int = 100_000, epochs: int = 1,
+                    max_trees: int = 300, max_depth=16, seed: int = 42, n_jobs: int = 1) -> dict:
+    """
+    data_path-i hissə-hissə oxuyaraq modeli öyrədir, reservoir hold-out üzərində
+    dəqiqliyi ölçür, modeli output-a, hesabatı <output>.report.json-a yazır.
+    n_jobs – meşə ağaclarını paralel quran işlər (joblib qaydası: -1 – bütün CPU-lar).
+    """
+    import joblib
+
+    source = describe_source(data_path)
+    header = source["header"]
+    n_jobs = effective_n_jobs(n_jobs)
+    chunk_rows = plan_chunks(
+        len(header), memory_mb, holdout_rows, learner,
+        max_trees=max_trees, max_depth=max_depth, n_jobs=n_jobs
+    )
+    n_chunks = max(1, math.ceil(source["rows"] / chunk_rows))
+
+    if learner == "forest":
+        stride = max(1, math.ceil(n_chunks / max_trees))
+        trees_per_chunk = max(1, max_trees // math.ceil(n_chunks / stride))
+        model = ForestLearner(trees_per_chunk, stride, max_depth, seed=seed, n_jobs=n_jobs)
+        epochs = 1  # meşə hissələri bir dəfə görür
+    else:
+        model = SGDLearner(seed=seed)
+
+    reservoir = Reservoir(holdout_rows, len(header), seed=seed)
+    started = time.perf_counter()
+
+    # 1-ci epoch: reservoir qurulur, təlim sətirləri dərhal öyrədilir
+    for chunk_no, (X, y) in enumerate(iter_chunks(data_path, chunk_rows)):
+        X_train, y_train = reservoir.offer(X, y)
+        model.partial_fit(X_train, y_train, chunk_no)
+
+    # Sonrakı epoch-lar: hold-out sətirləri qlobal nömrəyə görə çıxarılır
+    _, _, holdout_index = reservoir.holdout()
+    holdout_index = np.sort(holdout_index)
+    for _ in range(epochs - 1):
+        offset = 0
+        for chunk_no, (X, y) in enumerate(iter_chunks(data_path, chunk_rows)):
+            rows = np.arange(offset, offset + len(y))
+            keep = ~np.isin(rows, holdout_index, assume_unique=True)
+            offset += len(y)
+            model.partial_fit(X[keep], y[keep], chunk_no)
+
+    fitted = model.finalize(header)
+    X_hold, y_hold, _ = reservoir.holdout()
+    holdout_df = pd.DataFrame(X_hold, columns=header) if learner == "forest" else X_hold
+    accuracy = float(fitted.score(holdout_df, y_hold)) if len(y_hold) else None
+
+    joblib.dump(fitted, output)
+    report = {
+        "data": data_path,
+        "learner": learner,
+        "rows_seen": reservoir.seen,
+        "holdout_rows": len(y_hold),
+        "chunk_rows": chunk_rows,
+        "chunks": n_chunks,
+        "epochs": epochs,
+        "memory_budget_mb": memory_mb,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "holdout_accuracy": accuracy,
+        "seconds": time.perf_counter() - started
+    }
+    if learner == "forest":
+        report["trees"] = len(fitted.estimators_)
+        report["n_jobs"] = n_jobs
+
+    with open(os.path.splitext(output)[0] + ".report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testlər backend paketini repo kökündən idxal edir (python -m pytest backend/tests)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
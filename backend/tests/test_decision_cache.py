@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from backend import ai_model
+from backend.decision_cache import DecisionCache
+
+AGES = ["child", "adult", "elder", None]
+ROLES = ["doctor", "thief", None]
+FLAGS = ["guilty", "pregnant", "innocent", "friend"]
+DEON_VARIANTS = ["non_intervention", "protect_children", "protect_innocent", "protect_vulnerable"]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = DecisionCache(maxsize=4096, ttl=300)
+    monkeypatch.setattr(ai_model, "DECISION_CACHE", cache)
+    return cache
+
+
+def _person(rng: random.Random) -> dict:
+    return {"age": rng.choice(AGES), "role": rng.choice(ROLES), "flags": rng.sample(FLAGS, rng.randint(0, 2))}
+
+
+def _scenario(rng: random.Random, track1: list, track2: list) -> dict:
+    mode = rng.choice(["utilitarian", "deontological", "custom"])
+    scenario = {"track1": track1, "track2": track2, "mode": mode}
+    if mode == "deontological":
+        scenario["deon_variant"] = rng.choice(DEON_VARIANTS)
+    elif mode == "custom":
+        scenario["custom_rules"] = rng.choice([{}, {"role_weights": {"doctor": 9}}])
+    return scenario
+
+
+def test_cached_and_mirrored_results_equal_direct(cache):
+    rng = random.Random(5)
+    for _ in range(2000):
+        track1 = [_person(rng) for _ in range(rng.randint(0, 3))]
+        track2 = [_person(rng) for _ in range(rng.randint(0, 3))]
+        scenario = _scenario(rng, track1, track2)
+
+        # Əvvəlcə güzgü ssenari (track-lər yeri dəyişmiş, şəxslər qarışdırılmış) cache-ə düşür
+        mirrored = dict(scenario, track1=rng.sample(track2, len(track2)), track2=track1)
+        ai_model.decide_scenario_v2_cached(mirrored)
+
+        assert ai_model.decide_scenario_v2_cached(scenario) == ai_model.decide_scenario_v2(scenario)
+
+    stats = cache.stats()
+    assert stats["hits"] > 0 and stats["mirrored_hits"] > 0
@@ -0,0 +1,42 @@
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.ai_model import ML_V2_HEADER
+from backend.forest_engine import export_forest
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "trolley_model_v2.pkl")
+
+
+def _rows(seed: int, n: int) -> np.ndarray:
+    """ML v2 formatında kiçik saylar (0-5) – track-lərdəki yaş/rol/flag sayları kimi."""
+    return np.random.default_rng(seed).integers(0, 6, size=(n, len(ML_V2_HEADER)))
+
+
+@pytest.mark.parametrize("n_estimators, max_depth", [(10, 3), (24, None)])
+def test_compiled_forest_matches_predict(n_estimators, max_depth):
+    X = _rows(0, 5000)
+    # Səs-küylü etiketlər – ağaclarda ehtimal bərabərlikləri də yaranır
+    y = np.where(X[:, :25].sum(axis=1) + np.random.default_rng(1).integers(0, 4, 5000) > 30, 2, 1)
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=0
+    ).fit(X, y)
+    compiled = export_forest(model)
+
+    X_test = _rows(1, 20000)
+    np.testing.assert_array_equal(compiled.predict(X_test), model.predict(X_test))
+    np.testing.assert_allclose(compiled.predict_proba(X_test), model.predict_proba(X_test))
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="trolley_model_v2.pkl yoxdur")
+def test_compiled_shipped_model_matches_predict():
+    model = joblib.load(MODEL_PATH)
+    X_test = _rows(2, 20000)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # feature adları
+        expected = model.predict(X_test)
+    np.testing.assert_array_equal(export_forest(model).predict(X_test), expected)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from backend import generate_trolley_data_v2 as generator
+
+
+def _unique_rows(X: np.ndarray, y: np.ndarray) -> int:
+    return len(np.unique(np.column_stack([X, y]), axis=0))
+
+
+@pytest.mark.parametrize("mode", ["exact", "canonical"])
+def test_augmented_output_has_no_duplicates(mode):
+    # Bir nəfərlik track-lər – güzgülər tez-tez əvvəlki sətirlərlə üst-üstə düşür
+    rng = np.random.default_rng(0)
+    dedup = generator.ScenarioDeduplicator(mode)
+    parts = []
+    for _ in range(4):
+        X, y = generator.generate_rows_vectorized(rng, 2000, min_people=1, max_people=1)
+        X, y = dedup.filter(X, y)
+        parts.append(generator.augment_mirrored(X, y, dedup))
+
+    X = np.concatenate([X for X, _ in parts])
+    y = np.concatenate([y for _, y in parts])
+    assert _unique_rows(X, y) == len(y)
+    assert len(np.unique(X, axis=0)) == len(X)
+
+
+def test_iter_rows_exact_dedup_with_mirrors():
+    dedup = generator.ScenarioDeduplicator("exact")
+    chunks = list(generator.iter_rows_vectorized(
+        np.random.default_rng(1), 20000, chunk_rows=3000, dedup=dedup, augment=True
+    ))
+    X = np.concatenate([X for X, _ in chunks])
+    assert len(np.unique(X, axis=0)) == len(X)
+
+
+def test_canonical_mode_keeps_mirror_pairs():
+    X, y = generator.generate_rows_vectorized(np.random.default_rng(2), 3000)
+    dedup = generator.ScenarioDeduplicator("canonical")
+    X, y = dedup.filter(X, y)
+    X_aug, y_aug = generator.augment_mirrored(X, y, dedup)
+
+    X_mirror, y_mirror = generator.mirror_rows(X, y)
+    asymmetric = np.any(X_mirror != X, axis=1)
+    assert len(y_aug) == len(y) + asymmetric.sum()
+    np.testing.assert_array_equal(y_aug[len(y):], y_mirror[asymmetric])
+
+
+def test_max_people_is_bounded_by_int8():
+    rng = np.random.default_rng(0)
+    with pytest.raises(ValueError):
+        generator.generate_rows_vectorized(rng, 10, min_people=1, max_people=200)
+    X, _ = generator.generate_rows_vectorized(rng, 10, min_people=127, max_people=127)
+    assert X.max() <= 127 and X.min() >= 0
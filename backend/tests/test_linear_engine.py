@@ -0,0 +1,15 @@
+import numpy as np
+
+from backend import generate_trolley_data_v2 as generator
+from backend.linear_engine import derive_linear_scorer
+
+
+def test_linear_scorer_matches_generator_outside_ties():
+    X, y = generator.generate_rows_vectorized(np.random.default_rng(3), 200_000)
+    scorer = derive_linear_scorer(generator.HEADER[:-1])
+
+    ties = scorer.decision_function(X) == 0
+    pred = scorer.predict(X)
+    # Generator yalnız tam bərabərlikdə təsadüfi seçir
+    np.testing.assert_array_equal(pred[~ties], y[~ties])
+    assert ties.sum() < len(y)
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from backend import ai_model
+
+AGES = ["child", "teen", "adult", "elder", "baby", None]
+ROLES = ["doctor", "thief", "other", "pilot", None]
+FLAGS = ["innocent", "guilty", "pregnant", "vulnerable", "saves_lives", "hero"]
+
+
+def _person(rng: random.Random) -> dict:
+    person = {}
+    if rng.random() < 0.9:
+        person["age"] = rng.choice(AGES)
+    if rng.random() < 0.9:
+        person["role"] = rng.choice(ROLES)
+    if rng.random() < 0.8:
+        person["flags"] = rng.sample(FLAGS, rng.randint(0, 3)) * rng.randint(1, 2)
+    return person
+
+
+def _tracks(seed: int, count: int = 300):
+    rng = random.Random(seed)
+    return [[_person(rng) for _ in range(rng.randint(0, 40))] for _ in range(count)]
+
+
+def test_track_loss_equals_person_values():
+    for track in _tracks(0):
+        loss = ai_model.compute_track_loss(track)
+        assert loss == sum(ai_model.compute_person_value(p) for p in track)
+        assert type(loss) is int
+
+
+@pytest.mark.parametrize("custom_rules", [
+    {},
+    {"age_weights": {"adult": 7, "baby": 9}, "role_weights": {"thief": -4, "pilot": 3}},
+    {"flag_weights": {"hero": 5, "guilty": -6}},
+    {"age_weights": {"child": 2.5}, "flag_weights": {"hero": 0.1}},
+])
+def test_track_loss_with_rules_equals_person_values(custom_rules):
+    age_w = ai_model.merge_weights(ai_model.AGE_WEIGHTS, custom_rules.get("age_weights"))
+    role_w = ai_model.merge_weights(ai_model.ROLE_WEIGHTS, custom_rules.get("role_weights"))
+    flag_w = ai_model.merge_weights(ai_model.FLAG_WEIGHTS, custom_rules.get("flag_weights"))
+
+    for track in _tracks(1):
+        loss = ai_model.compute_track_loss_with_rules(track, age_w, role_w, flag_w)
+        expected = sum(
+            ai_model.compute_person_value_with_rules(p, age_w, role_w, flag_w) for p in track
+        )
+        assert loss == expected
+        assert type(loss) is type(expected)
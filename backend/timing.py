@@ -0,0 +1,94 @@
+"""
+Sorğu daxilində mərhələlərin müddətini ölçən yüngül qat (Server-Timing).
+
+Recorder contextvars ilə sorğuya bağlanır: app.py sorğunun əvvəlində start()
+çağırır, kod isə "with stage('ml_predict'):" ilə mərhələləri işarələyir.
+Eyni adlı mərhələ bir neçə dəfə işləsə, müddətlər toplanır; mərhələlər iç-içə
+ola bilər (məs. mode_ml daxilində ml_encode və ml_predict). Sonda
+server_timing_header() standart Server-Timing başlığını qurur:
+
+  Server-Timing: parse;dur=0.081, analysis;dur=0.412, mode_ml;dur=12.9, ...
+
+Recorder olmadıqda stage() paylaşılan boş context manager qaytarır – ölçmə
+söndürüləndə qiyməti bir ContextVar oxunuşudur.
+"""
+import re
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+_recorder: ContextVar["TimingRecorder | None"] = ContextVar("trolley_timing", default=None)
+
+_NOOP = nullcontext()
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class _Stage:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder: "TimingRecorder", name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class TimingRecorder:
+    """Bir sorğunun mərhələ müddətləri (nanosaniyə), ilk rast gəlinmə sırası ilə."""
+
+    def __init__(self):
+        self.started = time.perf_counter_ns()
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name: str, duration_ns: int) -> None:
+        self.durations[name] = self.durations.get(name, 0) + duration_ns
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total_ns(self) -> int:
+        return time.perf_counter_ns() - self.started
+
+    def as_dict(self) -> dict:
+        """{mərhələ: millisaniyə} + "total" – JSON-dakı timings sahəsi üçün."""
+        result = {name: ns / 1e6 for name, ns in self.durations.items()}
+        result["total"] = self.total_ns() / 1e6
+        return result
+
+
+def start() -> TimingRecorder:
+    recorder = TimingRecorder()
+    _recorder.set(recorder)
+    return recorder
+
+
+def stop() -> TimingRecorder | None:
+    recorder = _recorder.get()
+    _recorder.set(None)
+    return recorder
+
+
+def current() -> TimingRecorder | None:
+    return _recorder.get()
+
+
+def stage(name: str):
+    """Mərhələni ölçən context manager (recorder yoxdursa, heç nə etmir)."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NOOP
+    return _Stage(recorder, name)
+
+
+def server_timing_header(recorder: TimingRecorder) -> str:
+    """Server-Timing başlığının dəyəri (müddətlər millisaniyə ilə)."""
+    parts = [
+        f"{_TOKEN_RE.sub('_', name)};dur={ms:.3f}"
+        for name, ms in recorder.as_dict().items()
+    ]
+    return ", ".join(parts)
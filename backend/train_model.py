@@ -1,24 +1,31 @@
+import argparse
+
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier
 import joblib
 import os
 
-def train_model():
-    # CSV faylının yolunu təyin edirik
+try:
+    from .dataset_io import load_training_data
+except ImportError:
+    from dataset_io import load_training_data
+
+def train_model(data_path=None):
+    # CSV faylının (və ya dataset qovluğunun) yolunu təyin edirik
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(base_dir, "data", "trolley_data.csv")
+    if data_path is None:
+        data_path = os.path.join(base_dir, "data", "trolley_data.csv")
 
-    # 1. Məlumatı oxu
-    df = pd.read_csv(data_path)
+    # 1. Məlumatı oxu (dataset qovluğu np.memmap ilə kopyalanmadan açılır)
+    X_all, y, header = load_training_data(data_path, label="chosen_track")
 
     # 2. X (xüsusiyyətlər) və y (hədəf) böl
     feature_cols = [
         "t1_children", "t1_adults", "t1_elders",
         "t2_children", "t2_adults", "t2_elders"
     ]
-    X = df[feature_cols]
-    y = df["chosen_track"]
+    X = pd.DataFrame(X_all, columns=header, copy=False)[feature_cols]
 
     # 3. Train/test bölməsi (sadəcə yoxlama üçün)
     X_train, X_test, y_train, y_test = train_test_split(
@@ -39,4 +46,7 @@ def train_model():
     print(f"Model saxlanıldı: {model_path}")
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Köhnə (v1) modelin təlimi")
+    parser.add_argument("--data", default=None, help="CSV faylı və ya dataset qovluğu")
+    args = parser.parse_args()
+    train_model(args.data)
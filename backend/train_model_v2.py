@@ -1,16 +1,62 @@
+import argparse
+import json
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
 import joblib
+from joblib import Parallel, delayed
+
+try:
+    from .dataset_io import load_training_data
+    from .forest_engine import export_forest
+    from .stream_training import train_streaming
+except ImportError:
+    from dataset_io import load_training_data
+    from forest_engine import export_forest
+    from stream_training import train_streaming
 
-def train_trolley_v2():
-    df = pd.read_csv("trolley_data_v2.csv")
+# Model seçimi zamanı yoxlanılan namizədlər: (ad, model) – ağac sayı, dərinlik və sadə modellər
+def candidate_models():
+    candidates = []
+    for n_estimators in (10, 30, 100, 300):
+        for max_depth in (None, 16, 10):
+            candidates.append((
+                f"random_forest(n={n_estimators}, depth={max_depth})",
+                RandomForestClassifier(
+                    n_estimators=n_estimators, max_depth=max_depth, random_state=42, n_jobs=1
+                )
+            ))
+    for n_estimators in (30, 100):
+        candidates.append((
+            f"extra_trees(n={n_estimators}, depth=None)",
+            ExtraTreesClassifier(n_estimators=n_estimators, random_state=42, n_jobs=1)
+        ))
+    for max_depth in (None, 16, 10, 6):
+        candidates.append((
+            f"decision_tree(depth={max_depth})",
+            DecisionTreeClassifier(max_depth=max_depth, random_state=42)
+        ))
+    candidates.append((
+        "logistic_regression",
+        LogisticRegression(max_iter=1000)
+    ))
+    return candidates
 
-    # son sütun hədəfdir
-    y = df["chosen_track"]
+def train_trolley_v2(data_path="trolley_data_v2.csv"):
+    # CSV faylı və ya sütunlu binary dataset qovluğu (dataset_io) –
+    # qovluq np.memmap ilə kopyalanmadan açılır, feature-lər int8-dir
+    X, y, header = load_training_data(data_path, label="chosen_track")
 
-    # son sütundan başqa hamısı feature-dır
-    X = df.drop(columns=["chosen_track"])
+    # Sütun adları modeldə saxlanılsın (feature_names_in_)
+    X = pd.DataFrame(X, columns=header, copy=False)
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
@@ -30,5 +76,172 @@ def train_trolley_v2():
     joblib.dump(model, "trolley_model_v2.pkl")
     print("Yeni ML modeli trolley_model_v2.pkl olaraq saxlanıldı.")
 
+
+def _fit_candidate(name, model, X_train, y_train, X_test, y_test):
+    """Bir namizədi öyrədir və hold-out dəqiqliyini hesablayır (ayrıca prosesdə işləyir)."""
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    return name, model, float(model.score(X_test, y_test)), fit_seconds
+
+
+def _median_ms(fn, repeats: int) -> float:
+    fn()  # isitmə
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def measure_latency(model, X_rows: np.ndarray, single_repeats: int = 200,
+                    batch_repeats: int = 20) -> dict:
+    """
+    Bu maşında predict gecikməsi (median, ms): tək sətir və batch.
+    Serverdəki kimi int64 numpy massivi ilə ölçülür; ağac modelləri üçün
+    compiled mühərrik (forest_engine) də ölçülür.
+    """
+    single = X_rows[:1]
+    latency = {
+        "single_row_ms": _median_ms(lambda: model.predict(single), single_repeats),
+        "batch_ms": _median_ms(lambda: model.predict(X_rows), batch_repeats),
+        "batch_rows": len(X_rows)
+    }
+    if hasattr(model, "estimators_") or hasattr(model, "tree_"):
+        compiled = export_forest(model)
+        latency["compiled_single_row_ms"] = _median_ms(
+            lambda: compiled.predict(single), single_repeats
+        )
+        latency["compiled_batch_ms"] = _median_ms(
+            lambda: compiled.predict(X_rows), batch_repeats
+        )
+    return latency
+
+
+def select_trolley_v2(data_path="trolley_data_v2.csv", output="trolley_model_v2.pkl",
+                      tolerance=0.01, objective="latency", n_jobs=-1, batch_rows=1000):
+    """
+    Namizəd modelləri paralel öyrədir, hər biri üçün hold-out dəqiqliyi,
+    pickle ölçüsü və predict gecikməsini ölçür. Ən yaxşı dəqiqlikdən ən çox
+    tolerance qədər geri qalanlar arasından ən sürətlisini (objective="latency")
+    və ya ən kiçiyini (objective="size") seçir, onu output-a, hesabatı isə
+    yanına (<output>.report.json) yazır.
+    """
+    X, y, header = load_training_data(data_path, label="chosen_track")
+    X = pd.DataFrame(X, columns=header, copy=False)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    # Təlim paralel (hər namizəd bir nüvədə)
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_candidate)(name, model, X_train, y_train, X_test, y_test)
+        for name, model in candidate_models()
+    )
+
+    # Gecikmə ardıcıl ölçülür – paralel ölçmə nəticələri bir-birinə qarışdırar
+    rng = np.random.default_rng(0)
+    X_rows = np.asarray(X_test, dtype=np.int64)
+    X_rows = X_rows[rng.integers(0, len(X_rows), size=batch_rows)]
+
+    results = []
+    for name, model, accuracy, fit_seconds in fitted:
+        with warnings.catch_warnings():
+            # Model sütun adları ilə öyrədilib, serverdə isə numpy massivi verilir
+            warnings.simplefilter("ignore", UserWarning)
+            latency = measure_latency(model, X_rows)
+        results.append({
+            "name": name,
+            "accuracy": accuracy,
+            "fit_seconds": fit_seconds,
+            "pickle_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+            **latency
+        })
+        print(f"{name}: dəqiqlik {accuracy * 100:.2f}%, "
+              f"{results[-1]['pickle_bytes'] / 1024:.0f} KB, "
+              f"tək sətir {results[-1]['single_row_ms']:.2f} ms")
+
+    best_accuracy = max(r["accuracy"] for r in results)
+    eligible = [r for r in results if r["accuracy"] >= best_accuracy - tolerance]
+    if objective == "size":
+        chosen = min(eligible, key=lambda r: (r["pickle_bytes"], r["single_row_ms"]))
+    else:
+        chosen = min(eligible, key=lambda r: (r["single_row_ms"], r["pickle_bytes"]))
+
+    models = {name: model for name, model, _, _ in fitted}
+    joblib.dump(models[chosen["name"]], output)
+
+    report = {
+        "data": data_path,
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "objective": objective,
+        "tolerance": tolerance,
+        "best_accuracy": best_accuracy,
+        "chosen": chosen["name"],
+        "candidates": sorted(results, key=lambda r: -r["accuracy"])
+    }
+    report_path = os.path.splitext(output)[0] + ".report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"Seçilən model: {chosen['name']} (dəqiqlik {chosen['accuracy'] * 100:.2f}%, "
+          f"ən yaxşı {best_accuracy * 100:.2f}%)")
+    print(f"Model {output}, hesabat {report_path} olaraq saxlanıldı.")
+    return report
+
 if __name__ == "__main__":
-    train_trolley_v2()
+    parser = argparse.ArgumentParser(description="ML v2 modelinin təlimi")
+    parser.add_argument(
+        "--data", default="trolley_data_v2.csv",
+        help="CSV faylı və ya dataset qovluğu (generate_trolley_data_v2.py --format npy)"
+    )
+    parser.add_argument(
+        "--select", action="store_true",
+        help="bir neçə model ailəsi/ölçüsü arasından dəqiqlik, ölçü və gecikməyə görə seç"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.01,
+        help="seçim rejimində ən yaxşı dəqiqlikdən icazə verilən geri qalma (0.01 = 1%%)"
+    )
+    parser.add_argument(
+        "--objective", choices=["latency", "size"], default="latency",
+        help="tolerans daxilində ən sürətli (latency) və ya ən kiçik (size) model"
+    )
+    parser.add_argument("--jobs", type=int, default=-1, help="paralel təlim prosesləri")
+    parser.add_argument("--output", default="trolley_model_v2.pkl",
+                        help="seçim və axın rejimlərində model faylı")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="dataseti hissə-hissə oxuyaraq öyrət (yaddaşdan böyük datasetlər üçün)"
+    )
+    parser.add_argument("--learner", choices=["sgd", "forest"], default="forest",
+                        help="axın rejimində öyrənən: SGD və ya hissə-hissə qurulan meşə")
+    parser.add_argument("--memory-mb", type=float, default=2048,
+                        help="axın rejimində yaddaş büdcəsi (hissə ölçüsü bundan hesablanır)")
+    parser.add_argument("--holdout-rows", type=int, default=100_000,
+                        help="reservoir sampling ilə seçilən hold-out sətirləri")
+    parser.add_argument("--epochs", type=int, default=1, help="SGD üçün dataset üzərindən keçid sayı")
+    parser.add_argument("--max-trees", type=int, default=300, help="meşədə ağacların yuxarı həddi")
+    args = parser.parse_args()
+
+    if args.stream:
+        report = train_streaming(
+            args.data, output=args.output, learner=args.learner, memory_mb=args.memory_mb,
+            holdout_rows=args.holdout_rows, epochs=args.epochs, max_trees=args.max_trees,
+            n_jobs=args.jobs
+        )
+        accuracy = report["holdout_accuracy"]
+        print(f"Hold-out dəqiqliyi: {'yoxdur' if accuracy is None else f'{accuracy * 100:.2f}%'} "
+              f"({report['rows_seen']} sətir, {report['chunks']} hissə, "
+              f"pik RSS: {report['peak_rss_mb']:.0f} MB)")
+        print(f"Model {args.output} olaraq saxlanıldı.")
+    elif args.select:
+        select_trolley_v2(
+            args.data, output=args.output, tolerance=args.tolerance,
+            objective=args.objective, n_jobs=args.jobs
+        )
+    else:
+        train_trolley_v2(args.data)
@@ -0,0 +1,37 @@
+import gc
+import os
+import shutil
+import tempfile
+
+# TROLLEY_PRELOAD_MODEL=1 olduqda backend.app master prosesdə import olunur:
+# ML modeli fork-dan əvvəl yüklənib isidilir və worker-lər onu copy-on-write ilə paylaşır.
+preload_app = os.environ.get("TROLLEY_PRELOAD_MODEL") == "1"
+
+
+def pre_fork(server, worker):
+    # Import-dan sonra master-də yaranan obyektləri də daimi nəslə köçürürük
+    if preload_app:
+        gc.freeze()
+
+
+def when_ready(server):
+    if preload_app:
+        server.log.info("ML modeli master prosesdə yükləndi və isidildi.")
+
+
+# Paylaşılan sayğac faylları (statistika, metrikalar) üçün deployment-in şəxsi
+# 0700 qovluğu (shared_stats.py): master yaradır, worker-lər TROLLEY_STATS_DIR-i
+# miras alır, master dayananda qovluq silinir. Əvvəlcədən verilmiş qovluğa toxunulmur.
+_created_stats_dir = None
+
+
+def on_starting(server):
+    global _created_stats_dir
+    if not os.environ.get("TROLLEY_STATS_DIR"):
+        _created_stats_dir = tempfile.mkdtemp(prefix="trolley_stats_")
+        os.environ["TROLLEY_STATS_DIR"] = _created_stats_dir
+
+
+def on_exit(server):
+    if _created_stats_dir:
+        shutil.rmtree(_created_stats_dir, ignore_errors=True)